@@ -0,0 +1,226 @@
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+from .config import admission_settings
+from .logger import log_info
+import asyncio
+import time
+
+# Traffic classes in priority order: freed slots go to the first class with waiters.
+SUBMIT = "submit"
+TOKEN = "token"
+PAGE = "page"
+PRIORITY = (SUBMIT, TOKEN, PAGE)
+
+EXEMPT_PATHS = frozenset({"/live", "/ready", "/metrics"})
+
+def classify(method: str, path: str) -> Optional[str]:
+    """
+    Maps a request to its traffic class, or None if it bypasses admission.
+
+    Single submissions outrank credential issuance, which outranks
+    everything else: page views, QR renders, exports and administrative
+    calls. Loading the attendance form issues the submission credential,
+    so it and the short links leading to it are in the token class.
+    """
+    if path in EXEMPT_PATHS:
+        return None
+    is_form = path.startswith("/qr/attend/") and path.count("/") == 3 and path != "/qr/attend/"
+    if method == "POST":
+        if path == "/qr/api/request-attendance-token":
+            return TOKEN
+        if is_form:
+            return SUBMIT
+    elif method == "GET" and (is_form or path.startswith("/S/")):
+        return TOKEN
+    return PAGE
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted and must be shed."""
+
+class AdmissionController:
+    """
+    Limits how many requests run at once and decides who waits.
+
+    Every class may use only its share of the concurrency limit, so token
+    and page traffic cannot take the slots that submissions need. Requests
+    over their share wait in a short per-class queue; when the queue is full
+    or the wait times out they are shed. The limit itself adapts: it shrinks
+    multiplicatively when the p99 latency of submissions and token requests,
+    or the Redis round-trip time, exceeds its target and grows by one slot
+    per interval otherwise.
+    """
+    def __init__(self, settings=admission_settings):
+        self.settings = settings
+        self.limit = float(settings.INITIAL_LIMIT)
+        self._shares = {SUBMIT: 1.0, TOKEN: settings.TOKEN_SHARE, PAGE: settings.PAGE_SHARE}
+        self._in_flight: Dict[str, int] = {name: 0 for name in PRIORITY}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in PRIORITY}
+        self._admitted: Dict[str, int] = {name: 0 for name in PRIORITY}
+        self._shed: Dict[str, int] = {name: 0 for name in PRIORITY}
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._redis_latency: Optional[float] = None
+        self._p99: Optional[float] = None
+        self._last_adjusted = time.monotonic()
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def _capacity(self, traffic_class: str) -> int:
+        return max(1, int(self.limit * self._shares[traffic_class]))
+
+    def _has_room(self, traffic_class: str) -> bool:
+        return (sum(self._in_flight.values()) < int(self.limit)
+                and self._in_flight[traffic_class] < self._capacity(traffic_class))
+
+    async def acquire(self, traffic_class: str):
+        """
+        Waits for a slot in the given class.
+
+        Raises:
+            Overloaded: If the class queue is full or the wait times out.
+        """
+        if self._has_room(traffic_class) and not self._queues[traffic_class]:
+            self._in_flight[traffic_class] += 1
+            self._admitted[traffic_class] += 1
+            return
+
+        queue = self._queues[traffic_class]
+        if len(queue) >= self.settings.QUEUE_SIZE:
+            self._shed[traffic_class] += 1
+            raise Overloaded(traffic_class)
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.settings.QUEUE_TIMEOUT_MS / 1000)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the wait expired; keep it.
+                return
+            queue.remove(waiter)
+            waiter.cancel()
+            self._shed[traffic_class] += 1
+            raise Overloaded(traffic_class)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(traffic_class, None)
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+
+    def release(self, traffic_class: str, latency: Optional[float]):
+        """Frees a slot, records the request's latency and wakes waiters by priority."""
+        self._in_flight[traffic_class] -= 1
+        # Page traffic includes slow QR renders and exports, so only the
+        # Redis-bound classes feed the latency signal.
+        if latency is not None and traffic_class != PAGE:
+            self._latencies.append(latency)
+        self._adjust()
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hands free slots to queued requests, highest priority first."""
+        for name in PRIORITY:
+            queue = self._queues[name]
+            while queue and self._has_room(name):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self._in_flight[name] += 1
+                self._admitted[name] += 1
+                waiter.set_result(None)
+
+    def observe_redis(self, latency: float):
+        """Records a Redis round-trip time, in seconds."""
+        self._redis_latency = latency
+
+    def _adjust(self):
+        """Applies additive-increase/multiplicative-decrease once per interval."""
+        now = time.monotonic()
+        if now - self._last_adjusted < self.settings.ADJUST_INTERVAL_SECONDS or not self._latencies:
+            return
+        self._last_adjusted = now
+        ordered = sorted(self._latencies)
+        self._p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        self._latencies.clear()
+
+        overloaded = (self._p99 * 1000 > self.settings.TARGET_P99_MS
+                      or (self._redis_latency is not None
+                          and self._redis_latency * 1000 > self.settings.TARGET_REDIS_MS))
+        previous = int(self.limit)
+        if overloaded:
+            self.limit = max(float(self.settings.MIN_LIMIT), self.limit * self.settings.DECREASE_FACTOR)
+        else:
+            self.limit = min(float(self.settings.MAX_LIMIT), self.limit + 1)
+        if int(self.limit) != previous:
+            log_info("admission_limit_changed", {
+                "limit": int(self.limit),
+                "p99_ms": round(self._p99 * 1000, 2),
+                "redis_ms": None if self._redis_latency is None else round(self._redis_latency * 1000, 2)
+            })
+
+    def start(self, probe: Callable[[], Awaitable[bool]]):
+        """Starts measuring Redis round-trip time in the background."""
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_loop(probe))
+
+    async def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    async def _probe_loop(self, probe: Callable[[], Awaitable[bool]]):
+        while True:
+            await asyncio.sleep(self.settings.ADJUST_INTERVAL_SECONDS)
+            started = time.perf_counter()
+            try:
+                await probe()
+            except Exception:
+                # An unreachable Redis is handled by the submission journal, not by shedding.
+                continue
+            self.observe_redis(time.perf_counter() - started)
+
+    def metrics(self) -> Dict:
+        """Returns the current limit, queue depths and admission counters per class."""
+        return {
+            "limit": int(self.limit),
+            "p99_ms": None if self._p99 is None else round(self._p99 * 1000, 2),
+            "redis_ms": None if self._redis_latency is None else round(self._redis_latency * 1000, 2),
+            "classes": {
+                name: {
+                    "capacity": self._capacity(name),
+                    "in_flight": self._in_flight[name],
+                    "queued": len(self._queues[name]),
+                    "admitted_total": self._admitted[name],
+                    "shed_total": self._shed[name]
+                }
+                for name in PRIORITY
+            }
+        }
+
+admission_controller = AdmissionController()
+
+async def admission_control(request: Request, call_next):
+    """Middleware that admits, queues or sheds each request by its traffic class."""
+    traffic_class = classify(request.method, request.url.path)
+    if traffic_class is None or not admission_settings.ENABLED:
+        return await call_next(request)
+
+    try:
+        await admission_controller.acquire(traffic_class)
+    except Overloaded:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "error", "message": "Server is busy, please retry."},
+            headers={"Retry-After": str(admission_settings.RETRY_AFTER_SECONDS)}
+        )
+
+    started = time.perf_counter()
+    latency = None
+    try:
+        response = await call_next(request)
+        latency = time.perf_counter() - started
+        return response
+    finally:
+        admission_controller.release(traffic_class, latency)
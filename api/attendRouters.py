@@ -1,23 +1,38 @@
-from fastapi import APIRouter, Depends, Request, status, Query, HTTPException
-from fastapi.responses import JSONResponse
-from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
-from db import RedisClient
-from .config import app_settings, rate_limit_settings
-from .dependencies import get_redis_client
-from .exceptions import TokenInvalidError, TokenMismatchError, SessionNotFoundOrClosedError, DuplicateAttendanceError, APIServiceError
+from fastapi import APIRouter, Depends, Request, status, Query, Header, HTTPException
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+from typing import Any, Dict, List, Optional
+from db import RedisClient, RecordStatus
+from .config import app_settings, rate_limit_settings, batch_upload_settings, credential_settings, idempotency_settings
+from .credentials import issue_submission_credential, verify_submission_credential, verify_window_code
+from .dependencies import get_redis_client, get_id_generator, verify_api_key, json_body, json_body_openapi
+from .exceptions import TokenInvalidError, TokenMismatchError, SessionNotFoundOrClosedError, DuplicateAttendanceError, APIServiceError, StudentNotOnRosterError, CredentialInvalidError, QRCodeExpiredError, IdempotentReplay
 from .logger import log_error, log_info
+from .ratelimit import client_ip, device_id, ensure_device_id, rate_limit_identities, set_device_cookie
+from .responses import FastJSONResponse
 import logging
+import orjson
+import re
+from functools import lru_cache
 
 class StudentData(BaseModel):
-    name: str
-    surname: str
-    school_no: str
-    faculty: str
-    section: str
+    model_config = ConfigDict(strict=True, str_strip_whitespace=True)
+
+    name: str = Field(min_length=1, max_length=64)
+    surname: str = Field(min_length=1, max_length=64)
+    school_no: str = Field(min_length=1, max_length=32)
+    faculty: str = Field(min_length=1, max_length=64)
+    section: str = Field(min_length=1, max_length=32)
 
 router = APIRouter()
-templates = Jinja2Templates(directory="ui/student")
+
+_IDEMPOTENCY_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+_SUBMITTED_RESPONSE = {"message": "Attendance recorded successfully!"}
+
+@lru_cache
+def get_templates():
+    """Creates the Jinja environment on first use rather than at import time."""
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="ui/student")
 
 async def validate_one_time_token(
     session_id: str, 
@@ -69,46 +84,198 @@ async def validate_session_id(
     Raises:
         SessionNotFoundOrClosedError: If the session does not exist or is no longer active.
     """
-    if not await redis.is_session_valid(session_id):
+    if not get_id_generator().is_valid(session_id) or not await redis.is_session_valid(session_id):
+        raise SessionNotFoundOrClosedError(session_id)
+    return session_id
+
+async def validate_form_access(
+    session_id: str,
+    token: Optional[str] = Query(None),
+    code: Optional[str] = Query(None),
+    redis: RedisClient = Depends(get_redis_client)
+) -> str:
+    """
+    Authorizes a request for the attendance form.
+
+    Scanning clients open the form directly, so the session's status is
+    checked, and for a rotating session the code from the QR link too, in
+    the same read. Links that still carry a one-time token from
+    `/api/request-attendance-token` are validated the legacy way.
+
+    Args:
+        session_id (str): The identifier of the current session.
+        token (Optional[str]): A legacy one-time token, if the link has one.
+        code (Optional[str]): The window code from a rotating session's QR link.
+        redis (RedisClient): The Redis client dependency for database operations.
+
+    Returns:
+        str: The session ID if access is granted.
+
+    Raises:
+        SessionNotFoundOrClosedError: If the session does not exist or is no longer active.
+        QRCodeExpiredError: If the session rotates and the code is missing or no longer current.
+    """
+    if not get_id_generator().is_valid(session_id):
         raise SessionNotFoundOrClosedError(session_id)
+    is_open, rotating = await redis.get_session_access(session_id)
+    if not is_open:
+        raise SessionNotFoundOrClosedError(session_id)
+    if rotating and not verify_window_code(code or "", session_id):
+        raise QRCodeExpiredError()
+    if token is not None:
+        return await validate_one_time_token(session_id, token, redis)
     return session_id
 
+def verify_credential(
+    session_id: str,
+    x_submission_credential: Optional[str] = Header(None)
+) -> str:
+    """
+    Verifies the signed credential that the attendance form was issued with.
+
+    The check is purely local. The credential's nonce is only consumed later,
+    atomically with the attendance record.
+
+    Args:
+        session_id (str): The session the submission is for.
+        x_submission_credential (Optional[str]): The credential from the form.
+
+    Returns:
+        str: The credential's single-use nonce.
+
+    Raises:
+        CredentialInvalidError: If the credential is missing, forged, expired or for another session.
+    """
+    nonce = verify_submission_credential(x_submission_credential or "", session_id)
+    if nonce is None:
+        raise CredentialInvalidError()
+    return nonce
+
+async def replay_idempotent_submission(
+    session_id: str,
+    idempotency_key: Optional[str] = Header(None),
+    redis: RedisClient = Depends(get_redis_client)
+) -> Optional[str]:
+    """
+    Answers a retried submission with the response to its first attempt.
+
+    It runs before every other check, so a retry costs a single read. The
+    response is stored atomically with the record, so a retry either finds it
+    or is answered by the add-record script itself.
+
+    Args:
+        session_id (str): The session the submission is for.
+        idempotency_key (Optional[str]): The client's key for this submission, if any.
+        redis (RedisClient): The Redis client for looking up stored responses.
+
+    Returns:
+        Optional[str]: The idempotency key, if the submission has one that has not been used yet.
+
+    Raises:
+        IdempotentReplay: If the key was already used for a successful submission.
+        APIServiceError: If the key is malformed.
+    """
+    if idempotency_key is None:
+        return None
+    if not _IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+        raise APIServiceError("Idempotency-Key must be 16 to 64 URL-safe characters.", status_code=status.HTTP_400_BAD_REQUEST)
+    stored = await redis.get_idempotent_response(session_id, idempotency_key)
+    if stored is not None:
+        log_info("attendance_submission_replayed", {"session_id": session_id})
+        raise IdempotentReplay(stored)
+    return idempotency_key
+
 async def enforce_rate_limit(
     request: Request,
     redis: RedisClient = Depends(get_redis_client)
 ):
     """
-    Applies a basic rate limit based on the client's IP address.
+    Applies a rate limit to the client's device, its IP within the session,
+    and its IP as a whole.
 
-    This function restricts the number of requests from a single IP to prevent
-    abuse. The rate limit is bypassed for local development environments.
+    Students behind one campus NAT share an IP, so the tight limit applies
+    per device and the IP limits only cap abuse. Requests without a device
+    cookie are assigned a new device id, which the form page stores in a
+    cookie. The rate limit is bypassed for local development environments,
+    and fails open if Redis cannot be reached.
 
     Args:
-        request (Request): The incoming request object, used to identify the client's IP.
+        request (Request): The incoming request object, used to identify the client.
         redis (RedisClient): The Redis client for tracking request counts.
 
     Raises:
-        HTTPException: If the client has exceeded the defined request limit.
+        HTTPException: If the client has exceeded one of the request limits.
     """
-    client_ip = request.client.host
+    ip = client_ip(request)
     # Bypass rate limiting for local development
-    if client_ip == app_settings.CLIENT_IP:
+    if ip == app_settings.CLIENT_IP:
         return
 
+    device = device_id(request)
+    if device is None:
+        ensure_device_id(request)
+    limits = rate_limit_identities(ip, request.path_params.get("session_id"), device)
     try:
-        is_limited = await redis.check_rate_limit(
-            client_id=client_ip,
-            limit=rate_limit_settings.REQUESTS_LIMIT,
-            window=rate_limit_settings.TIME_WINDOW
-        )
-        if is_limited:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many requests. Try again later.",
-                headers={"Retry-After": str(rate_limit_settings.TIME_WINDOW)}
-            )
+        exceeded = await redis.check_rate_limits(limits, window=rate_limit_settings.TIME_WINDOW)
     except Exception as e:
-        logging.error(f"Rate limit check failed for {client_ip}: {e}")
+        logging.error(f"Rate limit check failed for {ip}: {e}")
+        return
+    if exceeded is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Try again later.",
+            headers={"Retry-After": str(rate_limit_settings.TIME_WINDOW)}
+        )
+
+async def read_batch_payload(request: Request) -> List[Any]:
+    """
+    Reads a batch upload body as either a JSON array or an NDJSON stream.
+
+    NDJSON bodies (`application/x-ndjson`) are parsed line by line while they
+    are streamed in. Lines that are not valid JSON are returned as None so
+    they are reported as invalid records instead of failing the whole batch.
+
+    Args:
+        request (Request): The incoming request carrying the batch.
+
+    Returns:
+        List[Any]: The decoded records, in upload order.
+
+    Raises:
+        APIServiceError: If the body is malformed or exceeds the record limit.
+    """
+    limit = batch_upload_settings.MAX_RECORDS
+    content_type = request.headers.get("content-type", "")
+
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records, buffer = [], b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    records.append(_decode_ndjson_line(line))
+            if len(records) > limit:
+                raise APIServiceError(f"Batch exceeds the limit of {limit} records.", status_code=413)
+        if buffer.strip():
+            records.append(_decode_ndjson_line(buffer))
+    else:
+        try:
+            records = orjson.loads(await request.body())
+        except ValueError:
+            raise APIServiceError("Request body is not valid JSON.", status_code=400)
+        if not isinstance(records, list):
+            raise APIServiceError("Request body must be a JSON array of records.", status_code=400)
+
+    if len(records) > limit:
+        raise APIServiceError(f"Batch exceeds the limit of {limit} records.", status_code=413)
+    return records
+
+def _decode_ndjson_line(line: bytes) -> Any:
+    try:
+        return orjson.loads(line)
+    except ValueError:
+        return None
 
 @router.get("/", tags=["Attendance"])
 async def student_dashboard(request: Request):
@@ -121,61 +288,105 @@ async def student_dashboard(request: Request):
     Returns:
         TemplateResponse: The HTML page for the student dashboard.
     """
-    return templates.TemplateResponse("student.html", {"request": request})
+    return get_templates().TemplateResponse("student.html", {"request": request})
 
 @router.get("/{session_id}", dependencies=[Depends(enforce_rate_limit)])
 async def show_attendance_form(
     request: Request,
-    validated_session_id: str = Depends(validate_one_time_token)
+    validated_session_id: str = Depends(validate_form_access)
 ):
     """
-    Displays the attendance form if the session and token are valid.
+    Displays the attendance form for an open session.
+
+    The form embeds a signed, single-use submission credential, so a student
+    goes from scanning to submitting with one page load and one POST.
 
     Args:
         request (Request): The incoming request object.
-        validated_session_id (str): The session ID, validated by `validate_one_time_token`.
+        validated_session_id (str): The session ID, validated by `validate_form_access`.
 
     Returns:
         TemplateResponse: The HTML form for submitting attendance.
     """
-    return templates.TemplateResponse(
+    response = get_templates().TemplateResponse(
         "form.html",
-        {"request": request, "session_id": validated_session_id}
+        {
+            "request": request,
+            "session_id": validated_session_id,
+            "credential": issue_submission_credential(validated_session_id)
+        }
     )
+    return set_device_cookie(request, response)
 
-@router.post("/{session_id}", dependencies=[Depends(enforce_rate_limit)])
+@router.post(
+    "/{session_id}",
+    response_class=FastJSONResponse,
+    openapi_extra=json_body_openapi(StudentData)
+)
 async def submit_attendance(
-    student: StudentData,
+    # Dependencies run in this order: a retry is answered before it is rate limited or validated.
+    idempotency_key: Optional[str] = Depends(replay_idempotent_submission),
+    _: None = Depends(enforce_rate_limit),
+    student: StudentData = Depends(json_body(StudentData)),
     session_id: str = Depends(validate_session_id),
+    nonce: str = Depends(verify_credential),
     redis: RedisClient = Depends(get_redis_client)
 ):
     """
     Handles the submission of the attendance form.
 
-    This endpoint validates the session and checks for duplicate submissions
-    before recording the student's attendance.
+    This endpoint validates the session, the form's submission credential and
+    checks for duplicate submissions before recording the student's
+    attendance. The credential's nonce is consumed with the record itself.
+    With an Idempotency-Key header, the response is stored with the record,
+    and retries are answered with it instead of a duplicate error.
 
     Args:
+        idempotency_key (Optional[str]): The client's unused key for this submission, if any.
         student (StudentData): The attendance data submitted by the student.
         session_id (str): The session ID, validated to ensure the session is active.
+        nonce (str): The single-use nonce of the verified submission credential.
         redis (RedisClient): The Redis client for database interactions.
 
     Returns:
         JSONResponse: A success message if the attendance is recorded.
 
     Raises:
+        StudentNotOnRosterError: If the session's course has a roster that does not include the student.
         DuplicateAttendanceError: If the student has already submitted attendance for this session.
+        CredentialInvalidError: If the submission credential has already been used.
         APIServiceError: If the student record fails to be saved in the database.
     """
-    if await redis.has_student_submitted(session_id, student.school_no):
+    course_id = await redis.get_session_course(session_id)
+    if course_id:
+        on_roster = await redis.check_roster_members(course_id, [student.school_no])
+        if not on_roster[student.school_no]:
+            raise StudentNotOnRosterError()
+
+    # With a key, the script decides: a retry racing its first attempt must
+    # be replayed, not reported as a duplicate by this earlier check.
+    if idempotency_key is None and await redis.has_student_submitted(session_id, student.school_no):
         raise DuplicateAttendanceError()
 
-    success = await redis.add_student_record(
+    # The model's own field dict is passed as is; the db layer encodes it once.
+    result = await redis.add_student_record(
         session_id,
         student.school_no,
-        student.model_dump()
+        vars(student),
+        nonce=nonce,
+        nonce_ttl=credential_settings.EXPIRE_SECONDS,
+        idempotency_key=idempotency_key,
+        idempotency_ttl=idempotency_settings.TTL_SECONDS,
+        response=orjson.dumps(_SUBMITTED_RESPONSE).decode()
     )
-    if not success:
+    if result == RecordStatus.REPLAYED:
+        log_info("attendance_submission_replayed", {"session_id": session_id})
+        raise IdempotentReplay(orjson.dumps(_SUBMITTED_RESPONSE).decode())
+    if result == RecordStatus.EXISTS:
+        raise DuplicateAttendanceError()
+    if result == RecordStatus.NONCE_REUSED:
+        raise CredentialInvalidError()
+    if result is None:
         log_error("redis_record_add_failed", Exception("Failed to add student record"), {
             "session_id": session_id,
             "student_no": student.school_no
@@ -183,7 +394,83 @@ async def submit_attendance(
         raise APIServiceError("Could not save attendance record.")
     
     log_info("attendance_submitted", {"session_id": session_id, "student_no": student.school_no})
-    return JSONResponse(
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=_SUBMITTED_RESPONSE
+    )
+
+@router.post("/{session_id}/batch", dependencies=[Depends(verify_api_key)])
+async def submit_attendance_batch(
+    request: Request,
+    session_id: str = Depends(validate_session_id),
+    redis: RedisClient = Depends(get_redis_client)
+):
+    """
+    Records a batch of attendance submissions collected offline.
+
+    Every record is validated in a single pass, then all valid records are
+    inserted with one pipelined round trip. Existing records are never
+    overwritten, so a batch can safely be uploaded more than once. Students
+    missing from the course roster are reported as invalid.
+
+    Args:
+        request (Request): The request carrying a JSON array or NDJSON stream of student data.
+        session_id (str): The session ID, validated to ensure the session is active.
+        redis (RedisClient): The Redis client for database interactions.
+
+    Returns:
+        JSONResponse: Per-record outcomes (`added`, `duplicate` or `invalid`) and totals.
+
+    Raises:
+        APIServiceError: If the payload is malformed or the records fail to be saved.
+    """
+    raw_records = await read_batch_payload(request)
+
+    outcomes: List[Dict[str, Any]] = []
+    valid_records: Dict[str, Dict] = {}
+    for index, raw in enumerate(raw_records):
+        try:
+            student = StudentData.model_validate(raw)
+        except ValidationError as e:
+            outcomes.append({
+                "index": index,
+                "status": "invalid",
+                "errors": e.errors(include_url=False, include_input=False)
+            })
+            continue
+
+        outcome = {"index": index, "school_no": student.school_no}
+        if student.school_no in valid_records:
+            outcome["status"] = "duplicate"
+        else:
+            valid_records[student.school_no] = vars(student)
+        outcomes.append(outcome)
+
+    course_id = await redis.get_session_course(session_id)
+    if course_id and valid_records:
+        on_roster = await redis.check_roster_members(course_id, list(valid_records))
+        for outcome in outcomes:
+            if "school_no" in outcome and not on_roster[outcome["school_no"]]:
+                outcome["status"] = "invalid"
+                outcome["errors"] = [{"type": "not_on_roster", "loc": ["school_no"], "msg": "School number is not on the course roster"}]
+                valid_records.pop(outcome["school_no"], None)
+
+    results = await redis.add_student_records(session_id, valid_records)
+    if results is None:
+        log_error("redis_batch_add_failed", Exception("Failed to add student records"), {
+            "session_id": session_id,
+            "record_count": len(valid_records)
+        })
+        raise APIServiceError("Could not save attendance records.")
+
+    counts = {"added": 0, "duplicate": 0, "invalid": 0}
+    for outcome in outcomes:
+        if "status" not in outcome:
+            outcome["status"] = "added" if results[outcome["school_no"]] else "duplicate"
+        counts[outcome["status"]] += 1
+
+    log_info("attendance_batch_submitted", {"session_id": session_id, **counts})
+    return FastJSONResponse(
         status_code=status.HTTP_200_OK,
-        content={"message": "Attendance recorded successfully!"}
-    )
\ No newline at end of file
+        content={"session_id": session_id, "counts": counts, "results": outcomes}
+    )
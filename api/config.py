@@ -1,4 +1,6 @@
-from pydantic_settings import BaseSettings
+from pydantic import AliasChoices, Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+import secrets
 
 class AppConfig(BaseSettings):
     """
@@ -6,19 +8,34 @@ class AppConfig(BaseSettings):
     
     These settings control the server's network interface and may include
     IP addresses for special clients (e.g., for testing or development).
+    WORKERS is the number of worker processes serving the app, also read
+    from uvicorn's WEB_CONCURRENCY.
     """
     CLIENT_IP: str = "0.0.0.0"
     PORT: int = 5000
+    WORKERS: int = Field(default=1, validation_alias=AliasChoices("WORKERS", "WEB_CONCURRENCY"))
+    WARM_UP_CONNECTIONS: int = 4
 
 class RateLimitConfig(BaseSettings):
     """
     Configures the settings for the API rate limiter.
 
     This determines how many requests a single client can make within a given
-    period, preventing abuse and ensuring service stability.
+    period, preventing abuse and ensuring service stability. A client is a
+    device, identified by the DEVICE_COOKIE cookie, which may make
+    REQUESTS_LIMIT requests. Since a lecture hall often shares one NAT
+    address, an IP may make SESSION_IP_LIMIT requests per session and
+    IP_LIMIT requests in total. TRUSTED_PROXIES lists the comma-separated
+    addresses or CIDR ranges whose X-Forwarded-For header is believed.
     """
-    REQUESTS_LIMIT: int = 2
-    TIME_WINDOW: int = 60 
+    # One attendance takes two requests, the form and its POST. The rest is
+    # headroom for a reload or a rescan of a rotating code within the window.
+    REQUESTS_LIMIT: int = 5
+    SESSION_IP_LIMIT: int = 1000
+    IP_LIMIT: int = 3000
+    TIME_WINDOW: int = 60
+    TRUSTED_PROXIES: str = ""
+    DEVICE_COOKIE: str = "rc_device"
 
 class AccessTokenConfig(BaseSettings):
     """
@@ -29,6 +46,231 @@ class AccessTokenConfig(BaseSettings):
     """
     EXPIRE_SECONDS: int = 60
 
+class SubmissionCredentialConfig(BaseSettings):
+    """
+    Controls the signed credentials embedded in the attendance form.
+
+    A credential binds one form render to one session and may be used for a
+    single submission before it expires. SECRET_KEY also derives the codes
+    of rotating sessions and their presenter keys, so all workers must share
+    it; the random default only suits a single process, and startup fails
+    with more than one worker unless it is set. Variables are read with the
+    CREDENTIAL_ prefix, e.g. CREDENTIAL_SECRET_KEY.
+    """
+    model_config = SettingsConfigDict(env_prefix="CREDENTIAL_")
+
+    SECRET_KEY: str = Field(default_factory=lambda: secrets.token_hex(32))
+    EXPIRE_SECONDS: int = 600
+
+class IdempotencyConfig(BaseSettings):
+    """
+    Controls how retried attendance submissions are recognised.
+
+    The form sends an Idempotency-Key header with each submission. The
+    response to a successful submission is kept for TTL_SECONDS under that
+    key, and retries with the same key are answered with it. Variables are
+    read with the IDEMPOTENCY_ prefix, e.g. IDEMPOTENCY_TTL_SECONDS.
+    """
+    model_config = SettingsConfigDict(env_prefix="IDEMPOTENCY_")
+
+    TTL_SECONDS: int = 900
+
+class AuthConfig(BaseSettings):
+    """
+    Holds the shared key for privileged, machine-to-machine endpoints.
+
+    Devices such as TA tablets send this key with their requests. When the
+    key is left empty, the protected endpoints reject every request.
+    Variables are read with the AUTH_ prefix, e.g. AUTH_API_KEY.
+    """
+    model_config = SettingsConfigDict(env_prefix="AUTH_")
+
+    API_KEY: str = ""
+
+class BatchUploadConfig(BaseSettings):
+    """
+    Limits the size of offline attendance uploads.
+
+    A single batch request is validated and written in one pass, so its size
+    is capped to keep memory use and Redis pipeline length predictable.
+    Variables are read with the BATCH_ prefix, e.g. BATCH_MAX_RECORDS.
+    """
+    model_config = SettingsConfigDict(env_prefix="BATCH_")
+
+    MAX_RECORDS: int = 5000
+
+class RosterConfig(BaseSettings):
+    """
+    Controls how course rosters are imported.
+
+    Roster CSVs are parsed while they stream in and written to Redis in
+    chunks of this many school numbers.
+    """
+    IMPORT_CHUNK_SIZE: int = 1000
+
+class AdmissionConfig(BaseSettings):
+    """
+    Tunes admission control and load shedding.
+
+    The concurrency limit starts at INITIAL_LIMIT and moves between MIN_LIMIT
+    and MAX_LIMIT depending on observed p99 and Redis latency. Token and page
+    traffic may only use their share of it. Requests wait at most
+    QUEUE_TIMEOUT_MS in a queue of QUEUE_SIZE before being shed with a 503.
+    Variables are read with the ADMISSION_ prefix, e.g. ADMISSION_MAX_LIMIT.
+    """
+    model_config = SettingsConfigDict(env_prefix="ADMISSION_")
+
+    ENABLED: bool = True
+    INITIAL_LIMIT: int = 64
+    MIN_LIMIT: int = 8
+    MAX_LIMIT: int = 256
+    TOKEN_SHARE: float = 0.5
+    PAGE_SHARE: float = 0.25
+    QUEUE_SIZE: int = 64
+    QUEUE_TIMEOUT_MS: int = 200
+    RETRY_AFTER_SECONDS: int = 1
+    TARGET_P99_MS: float = 250
+    TARGET_REDIS_MS: float = 20
+    DECREASE_FACTOR: float = 0.8
+    ADJUST_INTERVAL_SECONDS: float = 1.0
+
+class TracingConfig(BaseSettings):
+    """
+    Configures request tracing.
+
+    EXPORTER is "none", "console" (standard error) or "file" (JSON lines at
+    FILE_PATH). SAMPLE_RATIO is the fraction of new traces that are recorded;
+    requests carrying a sampled `traceparent` header are always recorded.
+    Variables are read with the TRACING_ prefix, e.g. TRACING_SAMPLE_RATIO.
+    """
+    model_config = SettingsConfigDict(env_prefix="TRACING_")
+
+    EXPORTER: str = "none"
+    FILE_PATH: str = "traces.jsonl"
+    SAMPLE_RATIO: float = 0.01
+
+class ProfilingConfig(BaseSettings):
+    """
+    Controls on-demand profiling of live workers.
+
+    Profiling is off by default. When ENABLED, the API-key protected
+    /admin/profile endpoints become available, and event-loop lag is
+    sampled every LOOP_LAG_INTERVAL_MS (0 turns the monitor off).
+    Variables are read with the PROFILING_ prefix, e.g. PROFILING_ENABLED.
+    """
+    model_config = SettingsConfigDict(env_prefix="PROFILING_")
+
+    ENABLED: bool = False
+    LOOP_LAG_INTERVAL_MS: int = 250
+
+class IdConfig(BaseSettings):
+    """
+    Selects the format of session ids and access tokens.
+
+    SCHEME is "hex", "base62" or "base32", carrying BITS random bits, with an
+    optional CHECKSUM character. The default, 128-bit base32 with a
+    checksum, keeps QR codes small and scannable; with COMPACT_QR_URL the QR
+    encodes an uppercase /S/{id} link that fits QR alphanumeric mode.
+    Legacy 64-character hex ids are always accepted.
+    Variables are read with the ID_ prefix, e.g. ID_SCHEME.
+    """
+    model_config = SettingsConfigDict(env_prefix="ID_")
+
+    SCHEME: str = "base32"
+    BITS: int = 128
+    CHECKSUM: bool = True
+    COMPACT_QR_URL: bool = True
+
+class ExecutorConfig(BaseSettings):
+    """
+    Sizes the worker pools for CPU-bound work, kept apart from the default
+    thread pool that serves the Redis calls.
+
+    QR rendering and export formatting each get WORKERS workers and a queue
+    of QUEUE_SIZE jobs; once the queue is full, requests fail fast with a
+    503. MODE is "thread" or "process"; process pools sidestep the GIL at
+    the cost of pickling arguments and results.
+    Variables are read with the EXECUTOR_ prefix, e.g. EXECUTOR_QR_WORKERS.
+    """
+    model_config = SettingsConfigDict(env_prefix="EXECUTOR_")
+
+    QR_WORKERS: int = 2
+    QR_QUEUE_SIZE: int = 32
+    QR_MODE: str = "thread"
+    EXPORT_WORKERS: int = 2
+    EXPORT_QUEUE_SIZE: int = 8
+    EXPORT_MODE: str = "thread"
+    RETRY_AFTER_SECONDS: int = 1
+
+class RecorderConfig(BaseSettings):
+    """
+    Controls the traffic recorder used for capacity planning.
+
+    When ENABLED, the attendance flow's requests are appended to FILE_PATH as
+    JSON lines holding the route, time offset, status and duration. Session,
+    device and student ids are replaced by aliases, so a recording holds no
+    personal data. The aliases are keyed hashes; workers must share
+    ALIAS_KEY for their recordings to be merged, and the random default
+    makes aliases irreversible once the process exits. Recording stops after
+    MAX_EVENTS requests. Replay a recording with `python -m utils.replay`.
+    Variables are read with the RECORDER_ prefix, e.g. RECORDER_ENABLED.
+    """
+    model_config = SettingsConfigDict(env_prefix="RECORDER_")
+
+    ENABLED: bool = False
+    FILE_PATH: str = "traffic.jsonl"
+    ALIAS_KEY: str = Field(default_factory=lambda: secrets.token_hex(32))
+    MAX_EVENTS: int = 1_000_000
+
+class ReportConfig(BaseSettings):
+    """
+    Controls course-level attendance reports.
+
+    A report covers at most MAX_SESSIONS of a course's sessions, the most
+    recent ones if there are more. Students attending less than
+    AT_RISK_THRESHOLD of them are listed as at risk unless a request gives
+    its own threshold. Reports need the optional numpy dependency, and
+    openpyxl for XLSX. Variables are read with the REPORT_ prefix, e.g.
+    REPORT_MAX_SESSIONS.
+    """
+    model_config = SettingsConfigDict(env_prefix="REPORT_")
+
+    MAX_SESSIONS: int = 200
+    AT_RISK_THRESHOLD: float = 0.7
+
+class RotationConfig(BaseSettings):
+    """
+    Controls rotating QR codes.
+
+    A rotating session's QR link carries a code that changes every
+    PERIOD_SECONDS, so a photo of the screen stops working shortly after it
+    is taken. Codes are accepted for GRACE_WINDOWS windows after their own
+    has ended. The frames of the next window are rendered LEAD_SECONDS
+    ahead, BATCH_SIZE per worker job, for at most MAX_SESSIONS sessions being
+    displayed on a worker. Codes are derived from the credential SECRET_KEY.
+    Variables are read with the ROTATION_ prefix, e.g. ROTATION_PERIOD_SECONDS.
+    """
+    model_config = SettingsConfigDict(env_prefix="ROTATION_")
+
+    PERIOD_SECONDS: int = 15
+    GRACE_WINDOWS: int = 1
+    LEAD_SECONDS: float = 5.0
+    BATCH_SIZE: int = 16
+    MAX_SESSIONS: int = 500
+
 app_settings = AppConfig()
 rate_limit_settings = RateLimitConfig()
-access_token_settings = AccessTokenConfig()
\ No newline at end of file
+access_token_settings = AccessTokenConfig()
+credential_settings = SubmissionCredentialConfig()
+idempotency_settings = IdempotencyConfig()
+auth_settings = AuthConfig()
+batch_upload_settings = BatchUploadConfig()
+roster_settings = RosterConfig()
+admission_settings = AdmissionConfig()
+tracing_settings = TracingConfig()
+profiling_settings = ProfilingConfig()
+id_settings = IdConfig()
+executor_settings = ExecutorConfig()
+recorder_settings = RecorderConfig()
+report_settings = ReportConfig()
+rotation_settings = RotationConfig()
@@ -0,0 +1,117 @@
+from typing import Optional
+from .config import app_settings, credential_settings, rotation_settings
+from .logger import log_info
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+
+def check_secret_key():
+    """
+    Refuses to start several workers that would each sign with their own
+    random key, since a credential or window code issued by one worker would
+    then be rejected by the others.
+
+    Raises:
+        RuntimeError: If WORKERS is above 1 and CREDENTIAL_SECRET_KEY is not set.
+    """
+    if "SECRET_KEY" in credential_settings.model_fields_set:
+        return
+    if app_settings.WORKERS > 1:
+        raise RuntimeError(
+            f"CREDENTIAL_SECRET_KEY must be set when running {app_settings.WORKERS} workers; "
+            "otherwise each worker signs credentials and window codes with its own random key."
+        )
+    log_info("credential_key_random", {"message": "CREDENTIAL_SECRET_KEY is not set; using a per-process random key."})
+
+def _sign(session_id: str, nonce: str, expires: int) -> str:
+    """Computes the URL-safe HMAC-SHA256 signature of a credential's contents."""
+    message = f"{session_id}.{nonce}.{expires}".encode()
+    digest = hmac.new(credential_settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+def issue_submission_credential(session_id: str) -> str:
+    """
+    Issues a signed, short-lived credential for submitting one attendance form.
+
+    The credential is verified without any database lookup. Its random nonce
+    is consumed together with the attendance record to keep it single-use.
+
+    Args:
+        session_id (str): The session the credential is bound to.
+
+    Returns:
+        str: The credential in the form `<nonce>.<expires>.<signature>`.
+    """
+    nonce = secrets.token_urlsafe(12)
+    expires = int(time.time()) + credential_settings.EXPIRE_SECONDS
+    return f"{nonce}.{expires}.{_sign(session_id, nonce, expires)}"
+
+def verify_submission_credential(credential: str, session_id: str) -> Optional[str]:
+    """
+    Verifies a credential's signature, session binding and expiry.
+
+    Args:
+        credential (str): The credential sent with the submission.
+        session_id (str): The session the submission is for.
+
+    Returns:
+        Optional[str]: The credential's nonce if it is valid, otherwise None.
+    """
+    try:
+        nonce, expires_str, signature = credential.split(".")
+        expires = int(expires_str)
+    except ValueError:
+        return None
+
+    if expires < time.time():
+        return None
+    if not hmac.compare_digest(signature, _sign(session_id, nonce, expires)):
+        return None
+    return nonce
+
+def current_window(now: Optional[float] = None) -> int:
+    """Returns the index of the rotation window containing `now`, by default the current time."""
+    return int((time.time() if now is None else now) // rotation_settings.PERIOD_SECONDS)
+
+def window_start(window: int) -> float:
+    """Returns the Unix time at which a rotation window starts."""
+    return window * rotation_settings.PERIOD_SECONDS
+
+def window_code(session_id: str, window: int) -> str:
+    """
+    Derives the code that a rotating session's QR carries during one window.
+
+    Codes are computed rather than stored, so every worker derives the same
+    code for a window. They are uppercase base32, which keeps short QR links
+    in alphanumeric mode.
+
+    Args:
+        session_id (str): The rotating session.
+        window (int): The rotation window, see `current_window`.
+
+    Returns:
+        str: An 8-character code.
+    """
+    message = f"window.{session_id}.{window}".encode()
+    digest = hmac.new(credential_settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return base64.b32encode(digest[:5]).decode()
+
+def verify_window_code(code: str, session_id: str, now: Optional[float] = None) -> bool:
+    """
+    Checks that a code belongs to the current window or one of the
+    GRACE_WINDOWS before it, so a scan just before a rotation still works.
+    """
+    code = code.upper()
+    window = current_window(now)
+    return any(
+        hmac.compare_digest(code, window_code(session_id, w))
+        for w in range(window - rotation_settings.GRACE_WINDOWS, window + 1)
+    )
+
+def presenter_key(session_id: str) -> str:
+    """Derives the key that lets the teacher who created a rotating session stream its QR frames."""
+    message = f"presenter.{session_id}".encode()
+    digest = hmac.new(credential_settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
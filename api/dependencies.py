@@ -1,7 +1,16 @@
-from fastapi import Depends
+from fastapi import Depends, Header, Request
+from fastapi.exceptions import RequestValidationError
 from functools import lru_cache
+from pydantic import BaseModel, ValidationError
+from typing import Any, Awaitable, Callable, Dict, Optional, Type, TypeVar
+import secrets
 from db import RedisClient
+from .config import auth_settings, id_settings
+from .exceptions import UnauthorizedError
 from .services import SessionService
+from utils.generate import UniqueIdGenerator
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
 
 @lru_cache(maxsize=1)
 def get_redis_client() -> RedisClient:
@@ -12,11 +21,60 @@ def get_redis_client() -> RedisClient:
     """
     return RedisClient()
 
-def get_session_service(redis: RedisClient = Depends(get_redis_client)) -> SessionService: 
+@lru_cache(maxsize=1)
+def get_id_generator() -> UniqueIdGenerator:
+    """Provides the generator for session ids and access tokens, built from the id settings."""
+    return UniqueIdGenerator(id_settings.SCHEME, id_settings.BITS, id_settings.CHECKSUM)
+
+def get_session_service(
+    redis: RedisClient = Depends(get_redis_client),
+    id_generator: UniqueIdGenerator = Depends(get_id_generator)
+) -> SessionService: 
     """
     Dependency provider for the SessionService.
 
     Initializes the service with required dependencies (like RedisClient)
     for easy use in route handlers.
     """
-    return SessionService(redis)
+    return SessionService(redis, id_generator)
+
+def verify_api_key(x_api_key: Optional[str] = Header(None)) -> None:
+    """
+    Dependency guarding privileged endpoints with the shared API key.
+
+    The key is compared in constant time. If no key is configured, every
+    request is rejected so the endpoints stay closed by default.
+
+    Raises:
+        UnauthorizedError: If the key is missing, wrong, or not configured.
+    """
+    expected = auth_settings.API_KEY
+    if not expected or not x_api_key or not secrets.compare_digest(x_api_key, expected):
+        raise UnauthorizedError()
+
+def json_body(model: Type[ModelT]) -> Callable[[Request], Awaitable[ModelT]]:
+    """
+    Builds a dependency that validates the raw request body against a model.
+
+    The body bytes are handed straight to Pydantic's JSON validator, skipping
+    the intermediate Python dict FastAPI would otherwise build. Validation
+    errors are reported in FastAPI's usual 422 format.
+    """
+    async def dependency(request: Request) -> ModelT:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError([
+                {**error, "loc": ("body", *error["loc"])}
+                for error in e.errors(include_url=False)
+            ])
+    return dependency
+
+def json_body_openapi(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Documents a `json_body` request body in the OpenAPI schema of a route."""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}}
+        }
+    }
@@ -24,6 +24,30 @@ class TokenMismatchError(HTTPException):
             detail="Token does not match the session."
         )
 
+class CredentialInvalidError(HTTPException):
+    """Raised when a submission credential is missing, forged, expired, bound to another session, or already used."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Submission credential is invalid, expired, or has already been used. Please scan the QR code again."
+        )
+
+class QRCodeExpiredError(HTTPException):
+    """Raised when a rotating session's form is opened without a current QR code, e.g. from a forwarded photo."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This QR code has expired. Please scan the code currently shown in class."
+        )
+
+class PresenterKeyInvalidError(HTTPException):
+    """Raised when a rotating session's QR frames are requested without the key issued to its teacher."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Presenter key is invalid for this session."
+        )
+
 class DuplicateAttendanceError(HTTPException):
     """Raised when a student attempts to submit attendance more than once for the same session."""
     def __init__(self):
@@ -32,6 +56,14 @@ class DuplicateAttendanceError(HTTPException):
             detail="Attendance already submitted for this student in this session."
         )
 
+class StudentNotOnRosterError(HTTPException):
+    """Raised when a student who is not on the course roster tries to submit attendance."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="School number is not on the roster for this course."
+        )
+
 class APIServiceError(HTTPException):
     """A generic exception for internal service failures, such as a database operation failing."""
     def __init__(self, detail: str, status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR):
@@ -40,3 +72,27 @@ class APIServiceError(HTTPException):
             detail=detail
         )
 
+
+class UnauthorizedError(HTTPException):
+    """Raised when a privileged endpoint is called without a valid API key."""
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="A valid API key is required for this operation.",
+            headers={"WWW-Authenticate": "ApiKey"}
+        )
+
+class ExecutorBusyError(HTTPException):
+    """Raised when a worker pool's queue is full and the job is refused rather than queued."""
+    def __init__(self, executor: str, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The server is busy ({executor}). Try again shortly.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class IdempotentReplay(Exception):
+    """Raised to answer a retried submission with the response stored for its idempotency key."""
+    def __init__(self, content: str):
+        super().__init__("Submission already processed")
+        self.content = content
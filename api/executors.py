@@ -0,0 +1,118 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from .config import executor_settings
+from .exceptions import ExecutorBusyError
+from .logger import log_info
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import time
+
+def _timed_call(func: Callable, *args) -> Tuple[float, float, Any]:
+    """Runs `func` in a worker and reports when it started and finished.
+
+    time.monotonic is system-wide on the supported platforms, so the
+    timestamps are comparable across processes.
+    """
+    started = time.monotonic()
+    result = func(*args)
+    return started, time.monotonic(), result
+
+class BoundedExecutor:
+    """
+    A named worker pool with a bounded queue.
+
+    At most `workers` jobs run at once and at most `queue_size` more wait;
+    further jobs are refused with ExecutorBusyError instead of piling up
+    behind a burst. In thread mode, jobs run in a copy of the caller's
+    context, so tracing spans nest as usual. In process mode, the function
+    and its arguments must be picklable, and the workers are spawned fresh
+    rather than forked, so they inherit no open files or sockets.
+    """
+    def __init__(self, name: str, workers: int, queue_size: int, mode: str = "thread", window: int = 1024):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.mode = mode
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._runs: Deque[float] = deque(maxlen=window)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.name}-worker")
+            log_info("executor_started", {"executor": self.name, "mode": self.mode, "workers": self.workers})
+        return self._pool
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Runs `func(*args)` on the pool and returns its result.
+
+        Raises:
+            ExecutorBusyError: If the pool's queue is full.
+        """
+        if self._pending >= self.workers + self.queue_size:
+            self._rejected += 1
+            raise ExecutorBusyError(self.name, executor_settings.RETRY_AFTER_SECONDS)
+
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        try:
+            if self.mode == "process":
+                call = functools.partial(_timed_call, func, *args)
+            else:
+                call = functools.partial(contextvars.copy_context().run, _timed_call, func, *args)
+            started, finished, result = await loop.run_in_executor(self._get_pool(), call)
+        finally:
+            self._pending -= 1
+        self._completed += 1
+        self._waits.append(max(0.0, started - submitted))
+        self._runs.append(finished - started)
+        return result
+
+    def shutdown(self):
+        """Stops the workers, dropping jobs that have not started."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+        ordered = sorted(samples)
+        if not ordered:
+            return {"p50": None, "p99": None}
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+        return {"p50": pick(0.5), "p99": pick(0.99)}
+
+    def metrics(self) -> Dict:
+        """Returns the queue depth, job counters and queue-wait and run-time percentiles in milliseconds."""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": min(self._pending, self.workers),
+            "queued": max(0, self._pending - self.workers),
+            "completed_total": self._completed,
+            "rejected_total": self._rejected,
+            "wait_ms": self._percentiles(self._waits),
+            "run_ms": self._percentiles(self._runs)
+        }
+
+qr_executor = BoundedExecutor(
+    "qr", executor_settings.QR_WORKERS, executor_settings.QR_QUEUE_SIZE, executor_settings.QR_MODE
+)
+export_executor = BoundedExecutor(
+    "export", executor_settings.EXPORT_WORKERS, executor_settings.EXPORT_QUEUE_SIZE, executor_settings.EXPORT_MODE
+)
+EXECUTORS = (qr_executor, export_executor)
@@ -5,15 +5,57 @@ from fastapi.responses import RedirectResponse
 from contextlib import asynccontextmanager
 from db import RedisClient
 import redis.exceptions
-import uvicorn
 import redis
-from . import qrRouters, attendRouters
-from .middleware import global_exception_handler, add_process_time_header
-from .config import app_settings
+import time
+from . import qrRouters, attendRouters, profiling
+from .executors import EXECUTORS, export_executor, qr_executor
+from .services import SessionService
+from .middleware import global_exception_handler, add_process_time_header, replay_idempotent_response, trace_request
+from .admission import admission_control, admission_controller
+from .recorder import record_traffic, traffic_recorder
+from .rotation import rotation_scheduler
+from .config import app_settings, tracing_settings
+from .credentials import check_secret_key
+from .exceptions import IdempotentReplay
 from .logger import setup_logging, log_info, log_error
 from .dependencies import get_redis_client 
+from utils import tracing
 
 
+def configure_tracing():
+    """Sets up the span exporter and sampling ratio from the tracing settings."""
+    exporters = {
+        "console": tracing.ConsoleExporter,
+        "file": lambda: tracing.FileExporter(tracing_settings.FILE_PATH)
+    }
+    factory = exporters.get(tracing_settings.EXPORTER)
+    tracing.configure(factory() if factory else None, tracing_settings.SAMPLE_RATIO)
+
+async def warm_up(redis_client: RedisClient) -> bool:
+    """
+    Does the work that would otherwise slow down the first requests: opens
+    Redis pool connections, loads Lua scripts, starts the worker pools with
+    a throwaway QR code and export, and compiles the HTML templates.
+
+    Returns:
+        bool: True if Redis answered and the Lua scripts were loaded.
+    """
+    started = time.perf_counter()
+    redis_ready = await redis_client.warm_up(app_settings.WARM_UP_CONNECTIONS)
+    await qr_executor.run(SessionService.generate_qr_image, "warm-up")
+    await export_executor.run(SessionService.format_export, "csv", None, "", None)
+    for templates, names in [
+        (qrRouters.get_templates(), ["main.html", "teacher/teacher.html"]),
+        (attendRouters.get_templates(), ["student.html", "form.html"]),
+    ]:
+        for name in names:
+            templates.get_template(name)
+    log_info("warm_up_complete", {
+        "redis": redis_ready,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+    return redis_ready
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -21,10 +63,34 @@ async def lifespan(app: FastAPI):
     
     This context manager is used by FastAPI to execute code before the
     application starts receiving requests and right after it finishes.
+    Readiness is reported only once warm-up has finished, and only once
+    Redis has been warmed up; /ready retries that part if it failed.
     """
     setup_logging()
+    check_secret_key()
+    configure_tracing()
+    app.state.ready = False
+    redis_client = get_redis_client()
+    app.state.redis_warm = await warm_up(redis_client)
+    await redis_client.start()
+    admission_controller.start(probe=redis_client.ping)
+    rotation_scheduler.start()
+    if profiling.loop_monitor:
+        profiling.loop_monitor.start()
+    app.state.ready = True
     log_info("startup", details={"message": "Application started"})
     yield
+    app.state.ready = False
+    await admission_controller.stop()
+    await rotation_scheduler.stop()
+    if profiling.loop_monitor:
+        await profiling.loop_monitor.stop()
+    await redis_client.stop()
+    for executor in EXECUTORS:
+        executor.shutdown()
+    if traffic_recorder:
+        traffic_recorder.close()
+    tracing.shutdown()
     log_info("shutdown", details={"message": "Application stopped"})
 
 app = FastAPI(
@@ -34,8 +100,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.middleware("http")(admission_control)
 app.middleware("http")(add_process_time_header)
+app.middleware("http")(record_traffic)
+app.middleware("http")(trace_request)
 app.add_exception_handler(Exception, global_exception_handler)
+app.add_exception_handler(IdempotentReplay, replay_idempotent_response)
 app.mount("/ui", StaticFiles(directory="ui"), name="ui")
 
 app.add_middleware(
@@ -50,8 +120,19 @@ app.add_middleware(
 def root_redirect():
     return RedirectResponse(url="/qr")
 
+@app.get("/S/{session_id}", include_in_schema=False)
+def short_attendance_redirect(session_id: str):
+    """Short alias encoded in compact QR codes; forwards to the attendance form."""
+    return RedirectResponse(url=f"/qr/attend/{session_id}")
+
+@app.get("/S/{session_id}/{code}", include_in_schema=False)
+def short_rotating_attendance_redirect(session_id: str, code: str):
+    """Short alias encoded in the QR codes of rotating sessions; forwards the window code to the form."""
+    return RedirectResponse(url=f"/qr/attend/{session_id}?code={code}")
+
 app.include_router(qrRouters.router, prefix="/qr", tags=["QR Code"])
 app.include_router(attendRouters.router, prefix="/qr/attend", tags=["Attendance"])
+app.include_router(profiling.router, prefix="/admin/profile", tags=["Admin"], include_in_schema=False)
 
 @app.get("/live",tags=["Health"])
 def liveness_check():
@@ -59,6 +140,20 @@ def liveness_check():
 
 @app.get("/ready", tags=["Health"])
 async def readiness_check(redis_client: RedisClient = Depends(get_redis_client)):
+    if not getattr(app.state, "ready", False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"status": "starting", "message": "Warm-up has not finished."}
+        )
+    if not getattr(app.state, "redis_warm", False):
+        # Redis was down at startup, so the Lua scripts were never loaded.
+        app.state.redis_warm = await redis_client.warm_up(1)
+        if not app.state.redis_warm:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail={"status": "starting", "message": "Redis warm-up has not succeeded."}
+            )
+
     try: 
         if not await redis_client.ping():
             raise ConnectionError("Redis server did not respond to PING command.")
@@ -79,10 +174,22 @@ async def readiness_check(redis_client: RedisClient = Depends(get_redis_client))
             detail={"status": "error", "message": "An unexpected error occurred during readiness check."}
         )
 
+@app.get("/metrics", tags=["Health"])
+def metrics(redis_client: RedisClient = Depends(get_redis_client)):
+    return {
+        "journal": redis_client.journal_metrics(),
+        "admission": admission_controller.metrics(),
+        "event_loop": profiling.loop_monitor.metrics() if profiling.loop_monitor else None,
+        "executors": {executor.name: executor.metrics() for executor in EXECUTORS},
+        "rotation": rotation_scheduler.metrics()
+    }
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(
         "api.main:app",
         host=app_settings.CLIENT_IP,
         port=app_settings.PORT,
+        workers=app_settings.WORKERS,
         reload=False
     )
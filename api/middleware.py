@@ -1,7 +1,9 @@
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi import status
+from .exceptions import IdempotentReplay
 from .logger import log_info, log_error
+from utils.tracing import start_span
 import traceback
 import time
 
@@ -24,6 +26,15 @@ async def global_exception_handler(request: Request, exc: Exception) -> JSONResp
         }
     )
 
+async def replay_idempotent_response(request: Request, exc: IdempotentReplay) -> Response:
+    """Answers a retried submission with the stored response of its first attempt."""
+    return Response(
+        content=exc.content,
+        status_code=status.HTTP_200_OK,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
 async def add_process_time_header(request: Request, call_next):
     """Middleware to add a custom header with the request processing time."""
     start_time = time.time()
@@ -42,3 +53,24 @@ async def add_process_time_header(request: Request, call_next):
     
     response.headers["X-Process-Time-Ms"] = str(["process_time_ms"])
     return response
+
+async def trace_request(request: Request, call_next):
+    """
+    Middleware that runs each request inside a root span.
+
+    An incoming W3C `traceparent` header is continued. Spans are tagged with
+    the route template rather than the raw path, which may contain a
+    student's school number.
+    """
+    with start_span(
+        "http.request",
+        {"http.method": request.method},
+        traceparent=request.headers.get("traceparent")
+    ) as span:
+        response = await call_next(request)
+        route = request.scope.get("route")
+        span.set_attribute("http.route", getattr(route, "path", None))
+        span.set_attribute("http.status_code", response.status_code)
+        if span.sampled:
+            response.headers["traceparent"] = span.traceparent
+        return response
@@ -0,0 +1,168 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse, Response
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+from .config import profiling_settings
+from .dependencies import verify_api_key
+from .logger import log_info
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+def sample_stacks(duration: float, interval: float) -> Counter:
+    """
+    Samples the stacks of every thread but the caller's for `duration` seconds.
+
+    Returns:
+        Counter: Collapsed stacks ("thread;outer;...;inner") with their sample
+        counts, the input format of flamegraph.pl and speedscope.
+    """
+    me = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(thread_id, str(thread_id)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a callback scheduled `interval`
+    seconds ahead. Sustained lag means something is blocking the loop.
+    """
+    def __init__(self, interval: float, window: int = 240):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._samples.append(lag)
+            self._max = max(self._max, lag)
+
+    def metrics(self) -> Dict:
+        """Returns the last, p99 and maximum lag in milliseconds."""
+        ordered = sorted(self._samples)
+        return {
+            "interval_ms": self.interval * 1000,
+            "lag_ms_last": round(self._samples[-1] * 1000, 3) if self._samples else None,
+            "lag_ms_p99": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3) if ordered else None,
+            "lag_ms_max": round(self._max * 1000, 3)
+        }
+
+loop_monitor: Optional[LoopLagMonitor] = (
+    LoopLagMonitor(profiling_settings.LOOP_LAG_INTERVAL_MS / 1000)
+    if profiling_settings.ENABLED and profiling_settings.LOOP_LAG_INTERVAL_MS > 0 else None
+)
+
+def require_profiling_enabled():
+    """Hides the profiling endpoints unless profiling is enabled."""
+    if not profiling_settings.ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+router = APIRouter(dependencies=[Depends(require_profiling_enabled), Depends(verify_api_key)])
+
+_profile_lock = asyncio.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+@router.get("/cpu", response_class=PlainTextResponse)
+async def cpu_profile(
+    seconds: float = Query(10, gt=0, le=60, description="How long to sample for."),
+    interval_ms: float = Query(10, ge=1, le=1000, description="Time between samples."),
+):
+    """Samples all threads of this worker and returns collapsed stacks.
+
+    Sampling runs in a separate thread, so the event loop itself is
+    profiled while it keeps serving requests. Only one profile runs at a
+    time per worker.
+
+    Args:
+        seconds (float): How long to sample for.
+        interval_ms (float): Time between samples in milliseconds.
+
+    Returns:
+        PlainTextResponse: One "stack count" line per distinct stack, ready
+                           for flamegraph.pl or speedscope.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running.")
+    async with _profile_lock:
+        log_info("cpu_profile_started", {"seconds": seconds, "interval_ms": interval_ms})
+        counts = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+@router.post("/memory")
+async def memory_snapshot(
+    top: int = Query(25, ge=1, le=500, description="Number of allocation sites to return."),
+    frames: int = Query(10, ge=1, le=100, description="Stack depth recorded per allocation when tracing starts."),
+):
+    """Takes a tracemalloc snapshot and diffs it against the previous one.
+
+    The first call starts tracing. Each later call returns the allocation
+    sites whose memory grew the most since the previous call.
+
+    Args:
+        top (int): Number of allocation sites to return.
+        frames (int): Stack depth recorded per allocation when tracing starts.
+
+    Returns:
+        dict: The traced memory totals and the top growing allocation sites.
+    """
+    global _last_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _last_snapshot = None
+        log_info("tracemalloc_started", {"frames": frames})
+
+    snapshot = await asyncio.to_thread(
+        lambda: tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    )
+    previous, _last_snapshot = _last_snapshot, snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    if previous is None:
+        stats = snapshot.statistics("lineno")[:top]
+        sites = [{"site": str(stat.traceback), "size_bytes": stat.size, "count": stat.count} for stat in stats]
+    else:
+        stats = snapshot.compare_to(previous, "lineno")[:top]
+        sites = [
+            {"site": str(stat.traceback), "size_bytes": stat.size, "size_diff_bytes": stat.size_diff,
+             "count": stat.count, "count_diff": stat.count_diff}
+            for stat in stats
+        ]
+    return {"traced_bytes": current, "peak_bytes": peak, "compared_to_previous": previous is not None, "sites": sites}
+
+@router.delete("/memory", status_code=204)
+async def stop_memory_tracing():
+    """Stops tracemalloc and discards the stored snapshot."""
+    global _last_snapshot
+    tracemalloc.stop()
+    _last_snapshot = None
+    return Response(status_code=204)
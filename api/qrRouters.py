@@ -1,26 +1,54 @@
-from fastapi import APIRouter, Request, Query, Depends
+from fastapi import APIRouter, Request, Query, Depends, status
 from fastapi.responses import StreamingResponse, Response
-from fastapi.templating import Jinja2Templates
-from .dependencies import get_session_service
-from .config import app_settings, access_token_settings
-from pydantic import BaseModel
+from .dependencies import get_session_service, get_redis_client, verify_api_key, json_body, json_body_openapi
+from .config import rotation_settings
+from .credentials import presenter_key
+from .exceptions import APIServiceError, PresenterKeyInvalidError, SessionNotFoundOrClosedError
+from .rotation import rotation_scheduler
+from pydantic import BaseModel, ConfigDict, Field
 from .services import SessionService 
 from .logger import log_error 
+from .responses import FastJSONResponse
 from enum import Enum
+from typing import Optional
+from functools import lru_cache
+from db import RedisClient
+import secrets
 
 router = APIRouter()
-templates = Jinja2Templates(directory="ui")
+
+@lru_cache
+def get_templates():
+    """Creates the Jinja environment on first use rather than at import time."""
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory="ui")
 
 class ExportFormat(str, Enum):
     TXT = "txt"
     CSV = "csv"
 
+class ReportFormat(str, Enum):
+    JSON = "json"
+    CSV = "csv"
+    XLSX = "xlsx"
+
+class ArrivalOrder(str, Enum):
+    OLDEST_FIRST = "asc"
+    NEWEST_FIRST = "desc"
+
 class TokenRequest(BaseModel):
-    session_id: str
+    model_config = ConfigDict(strict=True)
+
+    session_id: str = Field(min_length=1, max_length=128)
 
-@router.post("/api/request-attendance-token", tags=["Attendance Token"])
+@router.post(
+    "/api/request-attendance-token",
+    tags=["Attendance Token"],
+    response_class=FastJSONResponse,
+    openapi_extra=json_body_openapi(TokenRequest)
+)
 async def request_attendance_token(
-    token_request: TokenRequest,
+    token_request: TokenRequest = Depends(json_body(TokenRequest)),
     service: SessionService = Depends(get_session_service) 
 ):
     """Generates and returns a one-time access token for a given session.
@@ -30,11 +58,11 @@ async def request_attendance_token(
         service (SessionService): The dependency-injected session service.
 
     Returns:
-        dict: A dictionary containing the generated one-time access token.
-              Example: {"access_token": "your_generated_token"}
+        FastJSONResponse: A JSON object containing the generated one-time access token.
+                          Example: {"access_token": "your_generated_token"}
     """
     access_token = await service.get_one_time_token(token_request.session_id)
-    return {"access_token": access_token}
+    return FastJSONResponse(content={"access_token": access_token})
 
 @router.get("/", tags=["QR Code"])
 async def qr_base_page(request: Request):
@@ -46,7 +74,7 @@ async def qr_base_page(request: Request):
     Returns:
         TemplateResponse: An HTML response rendering the main.html template.
     """
-    return templates.TemplateResponse("main.html", {"request": request})
+    return get_templates().TemplateResponse("main.html", {"request": request})
 
 @router.get("/teacher", tags=["QR Code"])
 async def teacher_dashboard(request: Request):
@@ -58,22 +86,28 @@ async def teacher_dashboard(request: Request):
     Returns:
         TemplateResponse: An HTML response rendering the teacher.html template.
     """
-    return templates.TemplateResponse("teacher/teacher.html", {"request": request})
+    return get_templates().TemplateResponse("teacher/teacher.html", {"request": request})
 
 @router.post("/generate-qr-code", tags=["QR Code"])
 async def generate_qr_code(
     request: Request, 
+    course_id: Optional[str] = Query(None, description="Course whose roster submissions are checked against."),
+    rotate: bool = Query(False, description="Change the QR code every rotation period."),
     service: SessionService = Depends(get_session_service) 
 ):
     """Creates a new attendance session and returns a QR code image stream.
 
     Args:
         request (Request): The incoming FastAPI request object.
+        course_id (Optional[str]): The course the session belongs to, if any.
+        rotate (bool): Whether the session's QR code rotates.
         service (SessionService): The dependency-injected session service.
 
     Returns:
         StreamingResponse: A response streaming the generated QR code as a PNG image.
                            The custom 'X-Session-ID' header contains the new session ID.
+                           For a rotating session, 'X-Presenter-Key' holds the key for
+                           streaming the following frames and 'X-Rotation-Period' the period.
 
     Raises:
         Exception: Propagates any exception that occurs during the QR code
@@ -81,11 +115,15 @@ async def generate_qr_code(
     """
     try:
         base_url = str(request.base_url)
-        session_id, stream = await service.create_qr_session(base_url)
+        session_id, stream = await service.create_qr_session(base_url, course_id, rotate)
         
         response = StreamingResponse(stream, media_type="image/png")
         response.headers["X-Session-ID"] = session_id
         response.headers["Access-Control-Expose-Headers"] = "X-Session-ID"
+        if rotate:
+            response.headers["X-Presenter-Key"] = presenter_key(session_id)
+            response.headers["X-Rotation-Period"] = str(rotation_settings.PERIOD_SECONDS)
+            response.headers["Access-Control-Expose-Headers"] = "X-Session-ID, X-Presenter-Key, X-Rotation-Period"
         return response
     except Exception as e:
         log_error("qr_generation_endpoint_error", e, {})
@@ -116,4 +154,245 @@ async def export_session_data(
         content=content,
         media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{filename}"'}
-    )
\ No newline at end of file
+    )
+
+@router.get("/session/{session_id}/frames", tags=["QR Code"])
+async def session_qr_frames(
+    session_id: str,
+    request: Request,
+    key: str = Query(..., description="The X-Presenter-Key returned when the session was created."),
+    redis: RedisClient = Depends(get_redis_client)
+):
+    """Streams a rotating session's QR codes to the teacher page as server-sent events.
+
+    Each `frame` event carries the window number and code, the Unix time the
+    code stops being current and the base64-encoded PNG. Frames are rendered
+    ahead of time by the rotation scheduler and shared by every page showing
+    the session. A `closed` event ends the stream when the session closes.
+
+    Args:
+        session_id (str): The unique identifier of the rotating session.
+        request (Request): The incoming request, whose base URL the codes link to.
+        key (str): The presenter key of the session.
+        redis (RedisClient): The Redis client for checking the session's status.
+
+    Returns:
+        StreamingResponse: A `text/event-stream` of QR frames.
+    """
+    if not secrets.compare_digest(key, presenter_key(session_id)):
+        raise PresenterKeyInvalidError()
+    is_open, rotating = await redis.get_session_access(session_id)
+    if not is_open:
+        raise SessionNotFoundOrClosedError(session_id)
+    if not rotating:
+        raise APIServiceError("Session does not rotate its QR code.", status_code=status.HTTP_400_BAD_REQUEST)
+    if not rotation_scheduler.watch(session_id, str(request.base_url)):
+        raise APIServiceError("Too many rotating sessions are being shown.", status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return StreamingResponse(
+        rotation_scheduler.stream(session_id, lambda: redis.is_session_valid(session_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/session/{session_id}/summary", tags=["QR Code"])
+async def session_summary(
+    session_id: str,
+    service: SessionService = Depends(get_session_service)
+):
+    """Returns attendance counts for a session without reading its records.
+
+    Args:
+        session_id (str): The unique identifier of the session.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: The total number of attendees and counts per faculty and section.
+              Example: {"session_id": "...", "total": 2, "faculty": {"Eng": 2}, "section": {"A": 1, "B": 1}}
+    """
+    return await service.get_session_summary(session_id)
+
+@router.get("/session/{session_id}/arrivals", tags=["QR Code"], dependencies=[Depends(verify_api_key)])
+async def session_arrivals(
+    session_id: str,
+    after: Optional[float] = Query(None, description="Only arrivals at or after this Unix timestamp."),
+    before: Optional[float] = Query(None, description="Only arrivals at or before this Unix timestamp."),
+    from_minute: Optional[float] = Query(None, ge=0, description="Only arrivals this many minutes or more after the session started."),
+    to_minute: Optional[float] = Query(None, ge=0, description="Only arrivals up to this many minutes after the session started."),
+    order: ArrivalOrder = Query(ArrivalOrder.OLDEST_FIRST, description="asc for oldest first, desc for newest first."),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of arrivals to return."),
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page."),
+    service: SessionService = Depends(get_session_service)
+):
+    """Lists a session's arrivals and their records in time order, one page at a time.
+
+    Pages are read by range queries on a time-indexed set, so the cost
+    depends on the page size rather than the session size. For example,
+    `?from_minute=10` lists students who arrived after minute 10 and
+    `?order=desc&limit=50` lists the last 50 arrivals.
+
+    Args:
+        session_id (str): The unique identifier of the session.
+        after (Optional[float]): Only arrivals at or after this Unix timestamp.
+        before (Optional[float]): Only arrivals at or before this Unix timestamp.
+        from_minute (Optional[float]): Only arrivals at least this many minutes after the session started.
+        to_minute (Optional[float]): Only arrivals up to this many minutes after the session started.
+        order (ArrivalOrder): Oldest or newest first.
+        limit (int): Maximum number of arrivals to return.
+        cursor (Optional[str]): The `next_cursor` returned with the previous page.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: One page of arrivals and the cursor of the next page, if any.
+              Example: {"session_id": "...", "arrivals": [{"school_no": "...", "arrived_at": 1700000000.0, "record": {...}}], "next_cursor": "..."}
+    """
+    return await service.list_session_arrivals(
+        session_id, after, before, from_minute, to_minute, limit, cursor,
+        newest_first=order == ArrivalOrder.NEWEST_FIRST
+    )
+
+@router.get("/session/{session_id}/arrivals/histogram", tags=["QR Code"])
+async def session_arrival_histogram(
+    session_id: str,
+    bucket_seconds: int = Query(60, ge=1, le=3600, description="Width of each bucket in seconds."),
+    service: SessionService = Depends(get_session_service)
+):
+    """Counts a session's arrivals per time bucket.
+
+    Buckets start when the session was created and each is counted with a
+    single range query.
+
+    Args:
+        session_id (str): The unique identifier of the session.
+        bucket_seconds (int): Width of each bucket in seconds.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: The start of the first bucket and the number of arrivals in each bucket.
+              Example: {"session_id": "...", "bucket_seconds": 60, "start": 1700000000.0, "counts": [12, 30, 4]}
+    """
+    return await service.get_arrival_histogram(session_id, bucket_seconds)
+
+@router.delete("/session/{session_id}", tags=["QR Code"], status_code=204, dependencies=[Depends(verify_api_key)])
+async def delete_session_attendance(
+    session_id: str,
+    service: SessionService = Depends(get_session_service)
+):
+    """Closes a session and deletes its attendance data.
+
+    The session is also removed from the attendance history of every
+    student who attended it and from its course's reports.
+
+    Args:
+        session_id (str): The unique identifier of the session.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        Response: An empty 204 response.
+    """
+    await service.delete_session_attendance(session_id)
+    return Response(status_code=204)
+
+@router.get("/student/{school_no}/sessions", tags=["QR Code"], dependencies=[Depends(verify_api_key)])
+async def student_attendance_history(
+    school_no: str,
+    offset: int = Query(0, ge=0, description="Number of most recent sessions to skip."),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of sessions to return."),
+    service: SessionService = Depends(get_session_service)
+):
+    """Lists the sessions a student attended, newest first.
+
+    Args:
+        school_no (str): The student's school number.
+        offset (int): Number of most recent sessions to skip.
+        limit (int): Maximum number of sessions to return.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: The total number of sessions attended, one page of sessions with
+              their submission timestamps, and the offset of the next page.
+              Example: {"school_no": "...", "total": 12, "sessions": [...], "next_offset": 50}
+    """
+    return await service.get_student_history(school_no, offset, limit)
+
+@router.post("/roster/{course_id}", tags=["QR Code"], dependencies=[Depends(verify_api_key)])
+async def import_course_roster(
+    course_id: str,
+    request: Request,
+    service: SessionService = Depends(get_session_service)
+):
+    """Replaces a course roster with the school numbers from an uploaded CSV.
+
+    The CSV is streamed and parsed in chunks. It either has a `school_no`
+    header column or lists one school number per row in its first column.
+    A file with another header, or without school numbers, is rejected
+    with 400 and the current roster is kept.
+
+    Args:
+        course_id (str): The unique identifier of the course.
+        request (Request): The request whose body is the CSV file.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: The course ID and the number of students on the new roster.
+              Example: {"course_id": "CS101", "count": 300}
+    """
+    count = await service.import_roster(course_id, request.stream())
+    return {"course_id": course_id, "count": count}
+
+@router.get("/session/{session_id}/absentees", tags=["QR Code"], dependencies=[Depends(verify_api_key)])
+async def session_absentees(
+    session_id: str,
+    service: SessionService = Depends(get_session_service)
+):
+    """Lists the roster students who have not attended a session.
+
+    Args:
+        session_id (str): The unique identifier of the session.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        dict: The session ID, its course ID and the sorted school numbers of absentees.
+    """
+    return await service.get_session_absentees(session_id)
+
+@router.get("/course/{course_id}/report", tags=["QR Code"], dependencies=[Depends(verify_api_key)])
+async def course_report(
+    course_id: str,
+    format: ReportFormat = Query(ReportFormat.JSON, description="json for rates, csv or xlsx for the full matrix."),
+    threshold: Optional[float] = Query(None, ge=0, le=1, description="Attendance rate below which a student is at risk."),
+    after: Optional[float] = Query(None, description="Only sessions created at or after this Unix timestamp."),
+    before: Optional[float] = Query(None, description="Only sessions created at or before this Unix timestamp."),
+    service: SessionService = Depends(get_session_service)
+):
+    """Reports a course's attendance across its sessions, e.g. for a semester.
+
+    The report is a students x sessions matrix covering the roster and
+    everyone who attended, with attendance rates per student, session and
+    section and the students below the at-risk threshold.
+
+    Args:
+        course_id (str): The unique identifier of the course.
+        format (ReportFormat): json for the rates, csv or xlsx for the matrix as a file.
+        threshold (Optional[float]): The at-risk attendance rate, between 0 and 1.
+        after (Optional[float]): Only sessions created at or after this Unix timestamp.
+        before (Optional[float]): Only sessions created at or before this Unix timestamp.
+        service (SessionService): The dependency-injected session service.
+
+    Returns:
+        FastJSONResponse | Response: The rates as JSON, or the matrix as a file attachment.
+              Example: {"course_id": "CS101", "sessions": [...], "students": [...], "sections": {...}, "at_risk": [...]}
+    """
+    report = await service.get_course_report(course_id, format.value, threshold, after, before)
+    if format == ReportFormat.JSON:
+        return FastJSONResponse(content=report)
+
+    media_types = {
+        ReportFormat.CSV: "text/csv",
+        ReportFormat.XLSX: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    }
+    return Response(
+        content=report,
+        media_type=media_types[format],
+        headers={"Content-Disposition": f'attachment; filename="rollcall_{course_id}_report.{format.value}"'}
+    )
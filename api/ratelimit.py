@@ -0,0 +1,99 @@
+from fastapi import Request, Response
+from typing import List, Optional, Tuple
+from .config import rate_limit_settings
+from .logger import log_error
+import ipaddress
+import re
+import secrets
+
+_DEVICE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{22}$")
+_DEVICE_COOKIE_MAX_AGE = 180 * 24 * 3600
+
+def _parse_networks(value: str) -> List[ipaddress._BaseNetwork]:
+    networks = []
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError as e:
+            log_error("invalid_trusted_proxy", e, {"value": entry})
+    return networks
+
+_trusted_networks = _parse_networks(rate_limit_settings.TRUSTED_PROXIES)
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_networks)
+
+def client_ip(request: Request) -> str:
+    """
+    Returns the address of the client that sent the request.
+
+    X-Forwarded-For is only believed when the request comes from a trusted
+    proxy. The header is then read from right to left, skipping further
+    trusted proxies, so a client cannot choose its address by sending the
+    header itself.
+    """
+    peer = request.client.host if request.client else ""
+    if not _trusted_networks or not _is_trusted(peer):
+        return peer
+    forwarded = [a.strip() for a in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if a.strip()]
+    for address in reversed(forwarded):
+        if not _is_trusted(address):
+            return address
+    return forwarded[0] if forwarded else peer
+
+def device_id(request: Request) -> Optional[str]:
+    """Returns the device id from the device cookie, or None if it is missing or malformed."""
+    value = request.cookies.get(rate_limit_settings.DEVICE_COOKIE)
+    return value if value and _DEVICE_ID_PATTERN.match(value) else None
+
+def rate_limit_identities(ip: str, session_id: Optional[str], device: Optional[str]) -> List[Tuple[str, int]]:
+    """
+    Lists the identities a request is counted against, with their limits.
+
+    The device is the client proper. The IP within the session and the IP
+    as a whole are backstops sized for a lecture hall behind one NAT, which
+    also cap clients that drop the device cookie.
+
+    Args:
+        ip (str): The client's address.
+        session_id (Optional[str]): The session the request is for, if any.
+        device (Optional[str]): The id from the device cookie, if any.
+
+    Returns:
+        List[Tuple[str, int]]: Pairs of identity and request limit.
+    """
+    limits = []
+    if device:
+        limits.append((f"device:{device}", rate_limit_settings.REQUESTS_LIMIT))
+    if session_id:
+        limits.append((f"{ip}:{session_id}", rate_limit_settings.SESSION_IP_LIMIT))
+    limits.append((ip, rate_limit_settings.IP_LIMIT))
+    return limits
+
+def ensure_device_id(request: Request) -> str:
+    """
+    Returns the request's device id, assigning a new one if it has none.
+
+    A new id is kept on `request.state` until `set_device_cookie` stores it
+    in the response.
+    """
+    device = device_id(request)
+    if device is None:
+        device = getattr(request.state, "new_device_id", None) or secrets.token_urlsafe(16)
+        request.state.new_device_id = device
+    return device
+
+def set_device_cookie(request: Request, response: Response) -> Response:
+    """Sets the device cookie on the response if the request was assigned a new device id."""
+    device = getattr(request.state, "new_device_id", None)
+    if device is not None:
+        response.set_cookie(
+            rate_limit_settings.DEVICE_COOKIE, device,
+            max_age=_DEVICE_COOKIE_MAX_AGE, httponly=True, samesite="lax",
+            secure=request.url.scheme == "https"
+        )
+    return response
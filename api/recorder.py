@@ -0,0 +1,124 @@
+from fastapi import Request
+from typing import Any, Dict, Optional, Tuple
+from .config import recorder_settings
+from .logger import log_info
+from .ratelimit import device_id
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+
+# (method, route template) of the requests that make up the attendance flow.
+RECORDED_ROUTES = (
+    ("POST", "/qr/generate-qr-code"),
+    ("POST", "/qr/api/request-attendance-token"),
+    ("GET", "/S/{session_id}"),
+    ("GET", "/S/{session_id}/{code}"),
+    ("GET", "/qr/attend/{session_id}"),
+    ("POST", "/qr/attend/{session_id}"),
+    ("GET", "/qr/session/{session_id}/summary"),
+    ("POST", "/qr/export/{session_id}"),
+)
+
+_ROUTE_PATTERNS = [
+    (method, route, re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", route) + "$"))
+    for method, route in RECORDED_ROUTES
+]
+
+# Routes whose small JSON bodies link a request to a session or student.
+_BODY_ROUTES = frozenset({"/qr/api/request-attendance-token", "/qr/attend/{session_id}"})
+
+def match_route(method: str, path: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Returns the recorded route template matching a request and its path parameters."""
+    for route_method, route, pattern in _ROUTE_PATTERNS:
+        match = pattern.match(path) if method == route_method else None
+        if match:
+            return route, match.groupdict()
+    return None, {}
+
+class TrafficRecorder:
+    """
+    Appends a compact trace of the attendance flow to a JSON lines file.
+
+    Each line holds the wall-clock start, route template, status and
+    duration of one request. Sessions, devices, students and idempotency
+    keys appear only as keyed hashes, so requests can be linked without storing the ids
+    themselves. Workers that share the alias key produce traces that can be
+    merged.
+    """
+    def __init__(self, path: str, alias_key: str, max_events: int):
+        self.path = path
+        self.max_events = max_events
+        self._key = alias_key.encode()
+        self._file = open(path, "a", buffering=64 * 1024)
+        self._lock = threading.Lock()
+        self._events = 0
+
+    def alias(self, kind: str, value: Optional[str]) -> Optional[str]:
+        """Returns a stable, irreversible alias for an id, e.g. a session id or school number."""
+        if not value:
+            return None
+        return hmac.new(self._key, f"{kind}:{value}".encode(), hashlib.sha256).hexdigest()[:16]
+
+    def record(self, event: Dict[str, Any]):
+        line = json.dumps({k: v for k, v in event.items() if v is not None}, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self._events += 1
+            if self._events >= self.max_events:
+                self._file.close()
+                log_info("traffic_recording_stopped", {"path": self.path, "events": self._events})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+traffic_recorder: Optional[TrafficRecorder] = (
+    TrafficRecorder(recorder_settings.FILE_PATH, recorder_settings.ALIAS_KEY, recorder_settings.MAX_EVENTS)
+    if recorder_settings.ENABLED else None
+)
+
+async def record_traffic(request: Request, call_next):
+    """Middleware that records the attendance flow's requests when the recorder is enabled."""
+    if traffic_recorder is None:
+        return await call_next(request)
+
+    route, path_params = match_route(request.method, request.url.path)
+    if route is None:
+        return await call_next(request)
+
+    started_at = time.time()
+    started = time.perf_counter()
+    payload: Dict[str, Any] = {}
+    if request.method == "POST" and route in _BODY_ROUTES:
+        try:
+            body = json.loads(await request.body())
+            payload = body if isinstance(body, dict) else {}
+        except ValueError:
+            pass
+
+    response = await call_next(request)
+    session_id = path_params.get("session_id") or payload.get("session_id") or response.headers.get("X-Session-ID")
+    device = device_id(request) or getattr(request.state, "new_device_id", None)
+    school_no = payload.get("school_no")
+    idempotency_key = request.headers.get("Idempotency-Key") if route in _BODY_ROUTES else None
+    traffic_recorder.record({
+        "ts": round(started_at, 3),
+        "method": request.method,
+        "route": route,
+        "session": traffic_recorder.alias("session", session_id if isinstance(session_id, str) else None),
+        "device": traffic_recorder.alias("device", device),
+        "student": traffic_recorder.alias("student", school_no if isinstance(school_no, str) else None),
+        "idempotency": traffic_recorder.alias("idempotency", idempotency_key),
+        "token": True if "token" in request.query_params else None,
+        "code": True if "code" in request.query_params else None,
+        "rotating": True if "X-Presenter-Key" in response.headers else None,
+        "status": response.status_code,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+    })
+    return response
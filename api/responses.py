@@ -0,0 +1,8 @@
+from fastapi.responses import JSONResponse
+from typing import Any
+import orjson
+
+class FastJSONResponse(JSONResponse):
+    """A JSONResponse that renders its content with orjson instead of the standard library."""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
@@ -0,0 +1,196 @@
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from .config import rotation_settings
+from .credentials import current_window, window_code, window_start
+from .exceptions import ExecutorBusyError
+from .executors import qr_executor
+from .logger import log_error
+from .services import SessionService
+import asyncio
+import json
+import time
+
+class _WatchedSession:
+    """A rotating session shown on at least one teacher page, with its rendered frames."""
+    __slots__ = ("base_url", "subscribers", "frames")
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.subscribers = 0
+        # window -> base64 PNG
+        self.frames: Dict[int, str] = {}
+
+class RotationScheduler:
+    """
+    Renders the QR frames of rotating sessions ahead of time.
+
+    All sessions rotate on the same window boundaries, so one pass per
+    window renders the next window's frame for every session being shown,
+    LEAD_SECONDS before it is due. Frames are rendered on the QR pool in
+    batches of BATCH_SIZE sessions, at most one batch per worker at a time,
+    so rendering costs one frame per session and period however many pages
+    show a session, and never takes the whole pool. A frame missing when it
+    is due, e.g. for a session that has just been opened, is rendered on
+    demand. Only sessions with a connected teacher page are rendered.
+    """
+    def __init__(self, period: int, lead: float, batch_size: int, max_sessions: int, window: int = 256):
+        self.period = period
+        self.lead = min(lead, period)
+        self.batch_size = max(1, batch_size)
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, _WatchedSession] = {}
+        self._rendering: Dict[Tuple[str, int], "asyncio.Future[Optional[str]]"] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._frames_total = 0
+        self._misses_total = 0
+        self._failed_total = 0
+        self._passes: Deque[float] = deque(maxlen=window)
+
+    def start(self):
+        """Starts rendering ahead of time on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def watch(self, session_id: str, base_url: str) -> bool:
+        """Registers a page showing a session. Returns False if too many sessions are shown already."""
+        watched = self._sessions.get(session_id)
+        if watched is None:
+            if len(self._sessions) >= self.max_sessions:
+                return False
+            watched = self._sessions[session_id] = _WatchedSession(base_url)
+        watched.subscribers += 1
+        return True
+
+    def unwatch(self, session_id: str):
+        watched = self._sessions.get(session_id)
+        if watched is not None:
+            watched.subscribers -= 1
+            if watched.subscribers <= 0:
+                del self._sessions[session_id]
+
+    async def frame(self, session_id: str, window: int) -> Optional[str]:
+        """Returns a session's frame for a window, rendering it now if it was not rendered ahead."""
+        watched = self._sessions.get(session_id)
+        if watched is None:
+            return None
+        frame = watched.frames.get(window)
+        if frame is not None:
+            return frame
+        self._misses_total += 1
+        frames = await self._render([(session_id, watched)], window)
+        return frames[0]
+
+    async def _render(self, batch: List[Tuple[str, _WatchedSession]], window: int) -> List[Optional[str]]:
+        """Renders one batch on the QR pool, joining renders of the same frame already in flight."""
+        loop = asyncio.get_running_loop()
+        owned, waiting = [], []
+        for session_id, watched in batch:
+            key = (session_id, window)
+            if key in self._rendering:
+                waiting.append(self._rendering[key])
+            else:
+                future = self._rendering[key] = loop.create_future()
+                owned.append((session_id, watched, future))
+                waiting.append(future)
+
+        if owned:
+            urls = [
+                SessionService.attendance_url(watched.base_url, session_id, window_code(session_id, window))
+                for session_id, watched, _ in owned
+            ]
+            frames: List[Optional[str]] = [None] * len(owned)
+            try:
+                frames = await qr_executor.run(SessionService.render_frames, urls)
+            except ExecutorBusyError:
+                self._failed_total += len(owned)
+            except Exception as e:
+                self._failed_total += len(owned)
+                log_error("rotation_render_failed", e, {"window": window, "sessions": len(owned)})
+            finally:
+                # Runs on cancellation too, so joined renders never wait forever.
+                for (session_id, watched, future), frame in zip(owned, frames):
+                    del self._rendering[(session_id, window)]
+                    if frame is not None:
+                        self._frames_total += 1
+                        watched.frames[window] = frame
+                    future.set_result(frame)
+        return [await asyncio.shield(future) for future in waiting]
+
+    async def prepare(self, window: int):
+        """Renders `window`'s frames for every watched session that lacks one, and drops stale frames."""
+        started = time.monotonic()
+        pending = [(sid, watched) for sid, watched in list(self._sessions.items()) if window not in watched.frames]
+        workers = asyncio.Semaphore(qr_executor.workers)
+
+        async def render_batch(batch):
+            async with workers:
+                await self._render(batch, window)
+
+        await asyncio.gather(*(
+            render_batch(pending[i:i + self.batch_size]) for i in range(0, len(pending), self.batch_size)
+        ))
+        for watched in self._sessions.values():
+            for stale in [w for w in watched.frames if w < window - 1]:
+                del watched.frames[stale]
+        self._passes.append(time.monotonic() - started)
+
+    async def _run(self):
+        while True:
+            window = current_window() + 1
+            await asyncio.sleep(max(0.0, window_start(window) - self.lead - time.time()))
+            try:
+                await self.prepare(window)
+            except Exception as e:
+                log_error("rotation_pass_failed", e, {"window": window})
+            await asyncio.sleep(max(0.0, window_start(window) - time.time()))
+
+    async def stream(self, session_id: str, is_open: Callable[[], Awaitable[bool]]) -> AsyncIterator[str]:
+        """
+        Yields a server-sent event with the frame of each window as it starts,
+        until the session closes or the page disconnects. The session must
+        have been registered with `watch`; it is unregistered when the stream ends.
+        """
+        try:
+            window = current_window()
+            while True:
+                frame = await self.frame(session_id, window)
+                if frame is not None:
+                    event = {
+                        "window": window, "code": window_code(session_id, window),
+                        "expires_at": window_start(window + 1), "image": frame
+                    }
+                    yield f"event: frame\ndata: {json.dumps(event)}\n\n"
+                await asyncio.sleep(max(0.0, window_start(window + 1) - time.time()))
+                window = current_window()
+                if not await is_open():
+                    yield "event: closed\ndata: {}\n\n"
+                    return
+        finally:
+            self.unwatch(session_id)
+
+    def metrics(self) -> Dict:
+        ordered = sorted(self._passes)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3) if ordered else None
+        return {
+            "period_seconds": self.period,
+            "sessions": len(self._sessions),
+            "subscribers": sum(watched.subscribers for watched in self._sessions.values()),
+            "frames_total": self._frames_total,
+            "misses_total": self._misses_total,
+            "failed_total": self._failed_total,
+            "pass_ms": {"p50": pick(0.5), "p99": pick(0.99)}
+        }
+
+rotation_scheduler = RotationScheduler(
+    rotation_settings.PERIOD_SECONDS, rotation_settings.LEAD_SECONDS,
+    rotation_settings.BATCH_SIZE, rotation_settings.MAX_SESSIONS
+)
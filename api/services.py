@@ -1,38 +1,56 @@
 from db import RedisClient
 from utils.generate import QRCodeGenerator, UniqueIdGenerator
 from utils.export import StudentDataExporter
-from .config import access_token_settings
+from utils.roster import RosterFormatError, RosterParser
+from utils.analytics import build_course_report
+from utils.tracing import start_span, traced
+from .config import access_token_settings, roster_settings, id_settings, report_settings
+from .credentials import current_window, window_code
 from .exceptions import APIServiceError, SessionNotFoundOrClosedError
+from .executors import export_executor, qr_executor
 from .logger import log_error, log_info
 import io
-from typing import Tuple
-import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import base64
+from urllib.parse import urlsplit
 
 class SessionService:
-    def __init__(self, redis: RedisClient):
+    _MAX_HISTOGRAM_BUCKETS = 1440
+
+    def __init__(self, redis: RedisClient, id_generator: Optional[UniqueIdGenerator] = None):
         self.redis = redis
-        self.id_generator = UniqueIdGenerator()
+        self.id_generator = id_generator or UniqueIdGenerator()
+
+    @traced("service.create_qr_session")
+    async def create_qr_session(self, base_url: str, course_id: Optional[str] = None,
+                                rotating: bool = False) -> Tuple[str, io.BytesIO]:
+        """Create a new attendance session and generate a QR code image.
 
-    async def create_qr_session(self, base_url: str) -> Tuple[str, io.BytesIO]:
-        """Create a new attendance session and generate a QR code image."""
+        The QR of a rotating session carries the current window's code; the
+        following frames are streamed by the rotation scheduler.
+        """
         session_id = self.id_generator.generate()
 
-        if not await self.redis.create_session(session_id=session_id):
+        if not await self.redis.create_session(session_id=session_id, course_id=course_id, rotating=rotating):
             log_error("redis_session_creation_failed", Exception("Failed to create session"),{"session_id": session_id})
             raise APIServiceError("Could not create a new session.")
         
-        url_to_encode = f"{base_url}qr/attend/{session_id}"
-        stream = await asyncio.to_thread(SessionService.generate_qr_image, url_to_encode)
+        code = window_code(session_id, current_window()) if rotating else None
+        url_to_encode = self.attendance_url(base_url, session_id, code)
+        stream = await qr_executor.run(SessionService.generate_qr_image, url_to_encode)
 
         if stream is None:
             log_error("qr_generation_failed", Exception("Failed to generate QR image"), {"session_id": session_id})
             raise APIServiceError("Failed to generate QR code image.")
         
-        log_info("session_created", {"session_id": session_id})
+        log_info("session_created", {"session_id": session_id, "course_id": course_id, "rotating": rotating})
         return session_id, stream
 
+    @traced("service.get_one_time_token")
     async def get_one_time_token(self, session_id: str) -> str:
         """Generates and stores a one-time access token for a session."""
+        if not self.id_generator.is_valid(session_id):
+            raise SessionNotFoundOrClosedError(session_id)
         if not await self.redis.is_session_valid(session_id):
             raise SessionNotFoundOrClosedError(session_id)
             
@@ -50,31 +68,232 @@ class SessionService:
         log_info("access_token_generated", {"session_id": session_id})
         return access_token
 
+    @traced("service.finalize_session_export")
     async def finalize_session_export(self, session_id: str, format: str) -> Tuple[str, str, str]:
-        """Exports attendance data, closes the session, and returns file content."""
-        attendance_data = await self.redis.export_attendance(session_id)
-        if attendance_data is None:
-            raise APIServiceError("Could not fetch attendance data.")
+        """Exports attendance data, closes the session, and returns file content.
+
+        The export is normally assembled from rows appended at submission
+        time. If those rows have diverged from the stored records, they are
+        rebuilt from the records first.
+        """
+        media_types = {"txt": "text/plain", "csv": "text/csv"}
+        if format not in media_types:
+            raise APIServiceError("Invalid export format specified", status_code=400)
+
+        prebuilt = await self.redis.get_export(session_id, format)
+        attendance_data = None
+        if prebuilt is None:
+            attendance_data = await self.redis.rebuild_export(session_id)
+            if attendance_data is None:
+                raise APIServiceError("Could not fetch attendance data.")
+            log_info("session_export_rebuilt", {"session_id": session_id, "count": len(attendance_data)})
 
         if not await self.redis.close_session(session_id):
             log_info("session_close_failed_after_export", {"session_id": session_id})
 
-        exporter = StudentDataExporter(students_data=attendance_data)
-        exporters = {
-            "txt": ("text/plain", exporter.generate_txt),
-            "csv": ("text/csv", exporter.generate_csv)
+        course_id = await self.redis.get_session_course(session_id)
+        absentees = await self.redis.get_absentees(course_id, session_id) if course_id else None
+
+        with start_span("export.format", {"format": format, "rebuilt": attendance_data is not None}):
+            content = await export_executor.run(
+                SessionService.format_export, format, attendance_data, prebuilt, absentees
+            )
+
+        log_info("session_exported", {"session_id": session_id, "format": format})
+        return content, media_types[format], f"rollcall_{session_id}.{format}"
+
+    @traced("service.import_roster")
+    async def import_roster(self, course_id: str, stream: AsyncIterator[bytes]) -> int:
+        """Replaces a course roster with the school numbers of a streamed CSV."""
+        parser = RosterParser(chunk_size=roster_settings.IMPORT_CHUNK_SIZE)
+        try:
+            count = await self.redis.import_roster(course_id, parser.iter_chunks(stream))
+        except RosterFormatError as e:
+            raise APIServiceError(str(e), status_code=400)
+        if count is None:
+            raise APIServiceError("Could not import the roster.")
+
+        log_info("roster_imported", {"course_id": course_id, "count": count})
+        return count
+
+    @traced("service.get_session_absentees")
+    async def get_session_absentees(self, session_id: str) -> Dict:
+        """Lists roster students who have not attended a session."""
+        course_id = await self.redis.get_session_course(session_id)
+        if not course_id:
+            raise APIServiceError("Session is not linked to a course roster.", status_code=404)
+
+        absentees = await self.redis.get_absentees(course_id, session_id)
+        if absentees is None:
+            raise APIServiceError("Could not fetch absentees.")
+        return {"session_id": session_id, "course_id": course_id, "absentees": absentees}
+
+    @traced("service.get_course_report")
+    async def get_course_report(self, course_id: str, format: str, threshold: Optional[float] = None,
+                                after: Optional[float] = None, before: Optional[float] = None):
+        """Builds a course's attendance matrix across its sessions and returns it as JSON, CSV or XLSX.
+
+        All sessions' records are fetched in one pipelined read, and the
+        matrix is built and rendered on the export pool.
+        """
+        threshold = report_settings.AT_RISK_THRESHOLD if threshold is None else threshold
+        sessions = await self.redis.list_course_sessions(
+            course_id, float("-inf") if after is None else after, float("inf") if before is None else before
+        )
+        if sessions is None:
+            raise APIServiceError("Could not list course sessions.")
+        if not sessions:
+            raise APIServiceError("Course has no sessions.", status_code=404)
+        sessions = sessions[-report_settings.MAX_SESSIONS:]
+
+        records = await self.redis.export_attendance_bulk([session_id for session_id, _ in sessions])
+        roster = await self.redis.get_roster(course_id)
+        if records is None or roster is None:
+            raise APIServiceError("Could not fetch course attendance.")
+
+        with start_span("report.build", {"format": format, "sessions": len(sessions), "roster": len(roster)}):
+            try:
+                report = await export_executor.run(build_course_report, format, sessions, records, roster, threshold)
+            except ImportError as e:
+                log_error("course_report_unavailable", e, {"course_id": course_id, "format": format})
+                raise APIServiceError(str(e), status_code=501)
+
+        log_info("course_report_built", {"course_id": course_id, "format": format, "sessions": len(sessions)})
+        if format == "json":
+            return {"course_id": course_id, **report}
+        return report
+
+    @traced("service.get_session_summary")
+    async def get_session_summary(self, session_id: str) -> Dict:
+        """Returns the incrementally maintained attendance counters of a session."""
+        summary = await self.redis.get_attendance_summary(session_id)
+        if summary is None:
+            raise APIServiceError("Could not fetch attendance summary.")
+        return {"session_id": session_id, **summary}
+
+    @traced("service.get_student_history")
+    async def get_student_history(self, school_no: str, offset: int, limit: int) -> Dict:
+        """Returns one page of the sessions a student attended, newest first."""
+        history = await self.redis.get_student_history(school_no, offset, limit)
+        if history is None:
+            raise APIServiceError("Could not fetch attendance history.")
+
+        next_offset = offset + len(history["sessions"])
+        return {
+            "school_no": school_no,
+            **history,
+            "next_offset": next_offset if next_offset < history["total"] else None
         }
 
+    @traced("service.list_session_arrivals")
+    async def list_session_arrivals(self, session_id: str, after: Optional[float], before: Optional[float],
+                                    from_minute: Optional[float], to_minute: Optional[float],
+                                    limit: int, cursor: Optional[str], newest_first: bool) -> Dict:
+        """Returns one page of a session's arrivals with their records, in time order.
+
+        Arrivals can be bounded by Unix timestamps (`after`, `before`) or by
+        minutes since the session was created (`from_minute`, `to_minute`).
+        """
+        start = after if after is not None else float("-inf")
+        end = before if before is not None else float("inf")
+        if from_minute is not None or to_minute is not None:
+            created_at = await self.redis.get_session_created_at(session_id)
+            if created_at is None:
+                raise APIServiceError("Session start time is unknown.", status_code=404)
+            if from_minute is not None:
+                start = max(start, created_at + from_minute * 60)
+            if to_minute is not None:
+                end = min(end, created_at + to_minute * 60)
+
+        position = self._decode_cursor(cursor) if cursor else None
+        page = await self.redis.list_arrivals(session_id, start, end, limit, position, newest_first)
+        if page is None:
+            raise APIServiceError("Could not fetch arrivals.")
+
+        last = page["last"]
+        return {
+            "session_id": session_id,
+            "arrivals": page["arrivals"],
+            "next_cursor": self._encode_cursor(last[1], last[0]) if last else None
+        }
+
+    @traced("service.get_arrival_histogram")
+    async def get_arrival_histogram(self, session_id: str, bucket_seconds: int) -> Dict:
+        """Counts a session's arrivals per time bucket, starting when the session was created."""
+        created_at = await self.redis.get_session_created_at(session_id)
+        histogram = await self.redis.count_arrivals(
+            session_id, created_at, bucket_seconds, self._MAX_HISTOGRAM_BUCKETS
+        )
+        if histogram is None:
+            raise APIServiceError("Could not fetch arrival counts.")
+        return {"session_id": session_id, "bucket_seconds": bucket_seconds, **histogram}
+
+    @staticmethod
+    def attendance_url(base_url: str, session_id: str, code: Optional[str] = None) -> str:
+        """Builds the URL a session's QR code points to.
+
+        With compact QR URLs enabled, the link is the uppercase short alias
+        `/S/{id}`, or `/S/{id}/{code}` for a rotating session, when it fits
+        QR alphanumeric mode, which needs fewer modules than byte mode.
+        Scheme and host are case-insensitive, so only deployments at the
+        root path qualify.
+        """
+        suffix = f"/{code}" if code else ""
+        if id_settings.COMPACT_QR_URL:
+            parts = urlsplit(base_url)
+            compact = f"{parts.scheme}://{parts.netloc}/S/{session_id}{suffix}".upper()
+            if (parts.path in ("", "/") and compact.endswith(session_id + suffix)
+                    and QRCodeGenerator.is_alphanumeric(compact)):
+                return compact
+        return f"{base_url}qr/attend/{session_id}" + (f"?code={code}" if code else "")
+
+    @staticmethod
+    def _encode_cursor(arrived_at: float, school_no: str) -> str:
+        """Encodes the position of an arrival as an opaque page cursor."""
+        return base64.urlsafe_b64encode(f"{arrived_at!r}:{school_no}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[float, str]:
+        """Decodes a page cursor back into the arrival timestamp and school number."""
         try:
-            media_type, generator = exporters[format]
-            content = generator()
-        except KeyError:
-            raise APIServiceError("Invalid export format specified", status_code=400)
-            
-        log_info("session_exported", {"session_id": session_id, "format": format})
-        return content, media_type, f"rollcall_{session_id}.{format}"
-    
+            arrived_at, _, school_no = base64.urlsafe_b64decode(cursor.encode()).decode().partition(":")
+            return float(arrived_at), school_no
+        except (ValueError, UnicodeDecodeError):
+            raise APIServiceError("Invalid cursor.", status_code=400)
+
+    @traced("service.delete_session_attendance")
+    async def delete_session_attendance(self, session_id: str) -> None:
+        """Closes a session and deletes its attendance data and history entries."""
+        if not await self.redis.close_session(session_id):
+            log_info("session_close_failed_before_delete", {"session_id": session_id})
+
+        if not await self.redis.delete_attendance(session_id):
+            raise APIServiceError("Could not delete attendance data.")
+        log_info("session_attendance_deleted", {"session_id": session_id})
+
+    @staticmethod
+    def format_export(format: str, attendance_data: Optional[Dict[str, Dict]], prebuilt: Optional[str],
+                      absentees: Optional[List[str]]) -> str:
+        """Formats an export from the stored records, or from the prebuilt rows when no records are given."""
+        if attendance_data is not None:
+            exporter = StudentDataExporter(students_data=attendance_data, absentees=absentees)
+            return exporter.generate_txt() if format == "txt" else exporter.generate_csv()
+        if format == "txt":
+            return StudentDataExporter.assemble_txt(prebuilt, absentees)
+        return StudentDataExporter.assemble_csv(prebuilt)
+
+    @staticmethod
+    @traced("qr.render_frames", format="PNG")
+    def render_frames(urls: List[str]) -> List[Optional[str]]:
+        """Render a batch of QR codes as base64-encoded PNGs, one worker job for many sessions."""
+        frames = []
+        for url in urls:
+            stream = SessionService.generate_qr_image(url)
+            frames.append(base64.b64encode(stream.getvalue()).decode() if stream is not None else None)
+        return frames
+
     @staticmethod
+    @traced("qr.render", format="PNG")
     def generate_qr_image(url_to_encode: str) -> io.BytesIO:
             """Generate QR code image for the attendance URL."""
             qr_gen = QRCodeGenerator()
@@ -0,0 +1,87 @@
+"""
+Measures how much memory a session's attendance records take in Redis with
+one hash versus the bucketed layout (ATTENDANCE_BUCKETS), and how long
+reading them all for an export takes.
+
+Needs a running Redis server, given by REDIS_HOST and REDIS_PORT. The
+records are written under throwaway session ids and deleted afterwards.
+A hash keeps the compact listpack encoding only while it has at most
+hash-max-listpack-entries fields, each no longer than
+hash-max-listpack-value bytes; both limits are printed first.
+
+Records are larger than the default hash-max-listpack-value, so every
+case is measured with the server's limit and with each value given to
+--listpack-values. The limit is changed with CONFIG SET for the run and
+restored afterwards, so use a throwaway server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_attendance_memory --listpack-values 128,256
+"""
+import argparse
+import os
+import time
+import uuid
+from collections import Counter
+import redis
+from db.attendanceManager import AttendanceManager, encode_record
+from benchmarks.run import make_students
+
+SIZES = (1000, 10000, 100000)
+BUCKETS = (1, 16, 128, 1024)
+CHUNK = 5000
+
+def measure(client: redis.Redis, records: dict, buckets: int) -> dict:
+    manager = AttendanceManager(client, buckets=buckets)
+    session_id = f"bench-{uuid.uuid4().hex}"
+    items = list(records.items())
+    for i in range(0, len(items), CHUNK):
+        with client.pipeline(transaction=False) as pipe:
+            for student_id, data in items[i:i + CHUNK]:
+                pipe.hset(manager.record_key(session_id, student_id), student_id, encode_record(data))
+            pipe.execute()
+
+    keys = manager.record_keys(session_id)
+    with client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.memory_usage(key, samples=0)
+            pipe.object("encoding", key)
+        results = pipe.execute()
+    used = sum(size or 0 for size in results[::2])
+    encodings = Counter(encoding for encoding in results[1::2] if encoding)
+
+    started = time.perf_counter()
+    count = len(manager._get_attendance_sync(session_id))
+    read_ms = (time.perf_counter() - started) * 1000
+    client.delete(*keys)
+    assert count == len(records)
+    return {"bytes": used, "encodings": encodings, "read_ms": read_ms}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listpack-values", default="",
+                        help="comma-separated hash-max-listpack-value limits to compare with the server's own")
+    args = parser.parse_args()
+
+    client = redis.Redis(host=os.getenv("REDIS_HOST", "localhost"), port=int(os.getenv("REDIS_PORT", 6379)),
+                         decode_responses=True)
+    limits = client.config_get("hash-max-listpack-*") or client.config_get("hash-max-ziplist-*")
+    value_option = next(name for name in limits if name.endswith("-value"))
+    original = limits[value_option]
+    record_size = len(encode_record(make_students(1)["20230000"]))
+    print(f"{limits}; record size {record_size} bytes")
+    print(f"{'limit':>6} {'records':>8} {'buckets':>8} {'MiB':>9} {'bytes/rec':>10} {'read ms':>9}  encodings")
+    try:
+        for limit in [original] + [v.strip() for v in args.listpack_values.split(",") if v.strip()]:
+            client.config_set(value_option, limit)
+            for size in SIZES:
+                records = make_students(size)
+                for buckets in BUCKETS:
+                    if buckets > size // 8:
+                        continue
+                    result = measure(client, records, buckets)
+                    encodings = ", ".join(f"{name}: {count}" for name, count in result["encodings"].most_common())
+                    print(f"{limit:>6} {size:>8} {buckets:>8} {result['bytes'] / 2 ** 20:>9.2f} "
+                          f"{result['bytes'] / size:>10.1f} {result['read_ms']:>9.1f}  {encodings}")
+    finally:
+        client.config_set(value_option, original)
@@ -0,0 +1,52 @@
+"""
+Compares id schemes by the size of the QR codes and Redis keys they produce.
+
+For each scheme it reports the QR version (21 + 4 * (version - 1) modules
+per side), render time, PNG size and the bytes of session id stored in
+Redis for one session, i.e. in its key names and in the history entry of
+every attendee.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_identifiers
+"""
+import timeit
+from api.services import SessionService
+from utils.generate import UniqueIdGenerator
+
+BASE_URL = "https://rollcall.example.edu/"
+ATTENDEES = 200
+NUMBER = 20
+
+# Keys named after the session id: session, attendance, summary, members,
+# arrivals and the two export buffers.
+SESSION_KEYS = ("session:{}", "attendance:{}", "attendance_summary:{}", "attendance_members:{}",
+                "attendance_arrivals:{}", "attendance_export:{}:csv", "attendance_export:{}:txt")
+
+SCHEMES = [
+    ("hex-256 (legacy)", UniqueIdGenerator("hex", 256), f"{BASE_URL}qr/attend/{{}}"),
+    ("base62-128", UniqueIdGenerator("base62", 128), f"{BASE_URL}qr/attend/{{}}"),
+    ("base32-128+check", UniqueIdGenerator("base32", 128, checksum=True), f"{BASE_URL}qr/attend/{{}}"),
+    ("base32-128+check /S/", UniqueIdGenerator("base32", 128, checksum=True), None),
+]
+
+def qr_version(data: str) -> int:
+    import qrcode
+    qr = qrcode.QRCode()
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.version
+
+def id_bytes_in_redis(session_id: str) -> int:
+    """Bytes of session id stored for one session with ATTENDEES attendees."""
+    key_names = sum(len(key.format(session_id)) for key in SESSION_KEYS)
+    return key_names + ATTENDEES * len(session_id)
+
+if __name__ == "__main__":
+    print(f"{'scheme':<22} {'id len':>6} {'url len':>7} {'version':>7} {'render ms':>9} {'png bytes':>9} {'redis id bytes':>14}")
+    for name, generator, template in SCHEMES:
+        session_id = generator.generate()
+        url = template.format(session_id) if template else SessionService.attendance_url(BASE_URL, session_id)
+        render = min(timeit.repeat(lambda: SessionService.generate_qr_image(url), number=NUMBER, repeat=3)) / NUMBER
+        png = len(SessionService.generate_qr_image(url).getvalue())
+        print(f"{name:<22} {len(session_id):>6} {len(url):>7} {qr_version(url):>7} {render * 1000:>9.2f} {png:>9} {id_bytes_in_redis(session_id):>14}")
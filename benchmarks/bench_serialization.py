@@ -0,0 +1,64 @@
+"""
+Compares the per-request CPU cost of the old and new serialization paths
+of `submit_attendance` and `request_attendance_token`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_serialization
+"""
+import json
+import timeit
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from api.attendRouters import StudentData
+from api.qrRouters import TokenRequest
+from api.responses import FastJSONResponse
+from db.attendanceManager import encode_record
+
+NUMBER = 20000
+
+SUBMISSION = json.dumps({
+    "name": "Ada", "surname": "Lovelace", "school_no": "20231234",
+    "faculty": "Engineering", "section": "B"
+}).encode()
+TOKEN_REQUEST = json.dumps({"session_id": "f" * 64}).encode()
+
+class LegacyStudentData(BaseModel):
+    name: str
+    surname: str
+    school_no: str
+    faculty: str
+    section: str
+
+class LegacyTokenRequest(BaseModel):
+    session_id: str
+
+def legacy_submit():
+    student = LegacyStudentData.model_validate(json.loads(SUBMISSION))
+    json.dumps(student.model_dump())
+    JSONResponse(content={"message": "Attendance recorded successfully!"})
+
+def fast_submit():
+    student = StudentData.model_validate_json(SUBMISSION)
+    encode_record(vars(student))
+    FastJSONResponse(content={"message": "Attendance recorded successfully!"})
+
+def legacy_token():
+    request = LegacyTokenRequest.model_validate(json.loads(TOKEN_REQUEST))
+    JSONResponse(content={"access_token": request.session_id})
+
+def fast_token():
+    request = TokenRequest.model_validate_json(TOKEN_REQUEST)
+    FastJSONResponse(content={"access_token": request.session_id})
+
+def measure(func) -> float:
+    """Returns the best per-call time in microseconds over a few repeats."""
+    return min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER * 1e6
+
+if __name__ == "__main__":
+    for name, legacy, fast in [
+        ("submit_attendance", legacy_submit, fast_submit),
+        ("request_attendance_token", legacy_token, fast_token),
+    ]:
+        before, after = measure(legacy), measure(fast)
+        print(f"{name:<26} legacy {before:6.2f} us  fast {after:6.2f} us  saved {before - after:6.2f} us ({1 - after / before:.0%})")
@@ -0,0 +1,60 @@
+"""
+Measures how long a fresh worker takes to import the API and how much of
+the first request's work the lifespan warm-up moves ahead of traffic.
+
+Each measurement runs in a new interpreter so nothing is cached between
+runs. Redis is not needed.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import api.main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_ms": elapsed * 1000,
+    "lazy": [name for name in ("qrcode", "PIL", "jinja2", "uvicorn") if name not in sys.modules],
+}))
+"""
+
+FIRST_REQUEST_PROBE = """
+import json, time
+import api.main
+from api import qrRouters
+from api.services import SessionService
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+def first_request():
+    SessionService.generate_qr_image("https://example.com/qr/attend/" + "f" * 64)
+    qrRouters.get_templates().get_template("teacher/teacher.html")
+
+print(json.dumps({"cold_ms": timed(first_request), "warm_ms": timed(first_request)}))
+"""
+
+def run_probe(source: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", source], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    imports = [run_probe(IMPORT_PROBE) for _ in range(RUNS)]
+    requests = [run_probe(FIRST_REQUEST_PROBE) for _ in range(RUNS)]
+    import_ms = statistics.median(run["import_ms"] for run in imports)
+    cold_ms = statistics.median(run["cold_ms"] for run in requests)
+    warm_ms = statistics.median(run["warm_ms"] for run in requests)
+    print(f"import api.main            {import_ms:7.1f} ms  (not loaded: {', '.join(imports[0]['lazy']) or 'none'})")
+    print(f"first QR + template, cold  {cold_ms:7.1f} ms")
+    print(f"first QR + template, warm  {warm_ms:7.1f} ms  saved by warm-up {cold_ms - warm_ms:7.1f} ms")
@@ -0,0 +1,173 @@
+"""
+Microbenchmark suite for the CPU-bound and serialization hot spots, with
+regression gating against stored baselines.
+
+Run from the repository root:
+
+    python -m benchmarks.run --save     # record baselines for this machine
+    python -m benchmarks.run            # compare; exits 1 on a regression
+
+Baselines are machine-specific, so record them on the same machine, e.g.
+on the main branch before switching to a change. A benchmark without a
+baseline also fails the comparison, unless --allow-missing is given, so
+a missing baselines file cannot pass the gate unnoticed.
+"""
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import os
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+from api.config import id_settings
+from api.logger import JsonFormatter
+from db.attendanceManager import decode_record, encode_record
+from utils.export import StudentDataExporter
+from utils.generate import QRCodeGenerator, UniqueIdGenerator
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_THRESHOLD = 0.15
+
+# name -> (function, calls per timing run)
+BENCHMARKS: Dict[str, Tuple[Callable[[], object], int]] = {}
+
+def benchmark(name: str, number: int):
+    """Registers a zero-argument function as a benchmark case."""
+    def register(func):
+        BENCHMARKS[name] = (func, number)
+        return func
+    return register
+
+def make_students(count: int) -> Dict[str, Dict]:
+    return {
+        str(20230000 + i): {
+            "name": f"Name{i}", "surname": f"Surname, {i}", "school_no": str(20230000 + i),
+            "faculty": "Engineering", "section": "AB"[i % 2]
+        }
+        for i in range(count)
+    }
+
+ID_GENERATOR = UniqueIdGenerator(id_settings.SCHEME, id_settings.BITS, id_settings.CHECKSUM)
+
+@benchmark("ids.unique_id_generate", 20000)
+def unique_id_generate():
+    return ID_GENERATOR.generate()
+
+QR_DATA = "https://example.com/qr/attend/" + "f" * 64
+
+@benchmark("qr.generate_and_save", 10)
+def qr_generate_and_save():
+    QRCodeGenerator.save(QRCodeGenerator.generate(QR_DATA), io.BytesIO(), format="PNG")
+
+for size, label, number in [(10, "10", 2000), (1000, "1k", 20), (100000, "100k", 1)]:
+    exporter = StudentDataExporter(make_students(size))
+    benchmark(f"export.csv.{label}", number)(exporter.generate_csv)
+    benchmark(f"export.txt.{label}", number)(exporter.generate_txt)
+
+RECORD = make_students(1)["20230000"]
+ENCODED_RECORD = encode_record(RECORD)
+
+@benchmark("record.encode", 50000)
+def record_encode():
+    return encode_record(RECORD)
+
+@benchmark("record.decode", 50000)
+def record_decode():
+    return decode_record(ENCODED_RECORD)
+
+def make_course(students: int, sessions: int) -> Tuple[List[Tuple[str, float]], Dict[str, Dict[str, Dict]]]:
+    """A course whose students each attend about 80% of its sessions."""
+    roster = make_students(students)
+    course_sessions = [(f"s{j}", 1700000000.0 + j * 86400) for j in range(sessions)]
+    records = {
+        session_id: {no: record for i, (no, record) in enumerate(roster.items()) if (i * 7 + j * 13) % 10 < 8}
+        for j, (session_id, _) in enumerate(course_sessions)
+    }
+    return course_sessions, records
+
+if importlib.util.find_spec("numpy") is not None:
+    from utils.analytics import build_course_report
+    COURSE_SESSIONS, COURSE_RECORDS = make_course(500, 100)
+
+    for format, number in [("json", 5), ("csv", 5)]:
+        benchmark(f"report.{format}.500x100", number)(
+            lambda format=format: build_course_report(format, COURSE_SESSIONS, COURSE_RECORDS, None, 0.7)
+        )
+
+FORMATTER = JsonFormatter()
+LOG_RECORD = logging.LogRecord("root", logging.INFO, __file__, 1, "attendance_submitted", None, None)
+LOG_RECORD.extra_data = {"event": "attendance_submitted", "session_id": "f" * 64, "student_no": "20230000"}
+
+@benchmark("logger.json_formatter", 20000)
+def json_formatter():
+    return FORMATTER.format(LOG_RECORD)
+
+def measure(func: Callable[[], object], number: int, repeat: int = 5) -> float:
+    """Returns the best per-call time in microseconds over `repeat` runs."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+def run(names: List[str]) -> Dict[str, float]:
+    results = {}
+    for name in names:
+        func, number = BENCHMARKS[name]
+        results[name] = measure(func, number, repeat=3 if number == 1 else 5)
+    return results
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="path of the baselines JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction of the baseline (default: %(default)s)")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="do not fail for benchmarks that have no baseline")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    results = run(names)
+
+    if args.save:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        for name, value in results.items():
+            print(f"{name:<26} {value:12.2f} us  saved")
+        return 0
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    regressions, missing = [], []
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            missing.append(name)
+            print(f"{name:<26} {value:12.2f} us  (no baseline)")
+            continue
+        change = value / baseline - 1
+        regressed = change > args.threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<26} {value:12.2f} us  baseline {baseline:12.2f} us  {change:+7.1%}{'  REGRESSION' if regressed else ''}")
+
+    failed = False
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        failed = True
+    if missing and not args.allow_missing:
+        print(f"{len(missing)} benchmark(s) have no baseline in {args.baseline}: {', '.join(missing)}. "
+              "Record baselines with --save, or pass --allow-missing.")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
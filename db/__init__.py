@@ -1,3 +1,4 @@
 from .redisClient import RedisClient
+from .attendanceManager import RecordStatus
 
-__all__ = ["RedisClient"]
\ No newline at end of file
+__all__ = ["RedisClient", "RecordStatus"]
\ No newline at end of file
@@ -1,37 +1,476 @@
 from redis.asyncio import Redis
 import redis.exceptions
-import json
+import orjson
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Mapping, Optional, Tuple
+from enum import IntEnum
+from collections import Counter
 import asyncio
+import time
+import zlib
+from utils.export import StudentDataExporter
+from .replicaRouter import ReplicaRouter
+from .sessionManager import SessionManager
 
 logger = logging.getLogger(__name__)
 
+def encode_record(student_data: Mapping) -> bytes:
+    """Encodes a student's data to the JSON bytes stored in the attendance hash."""
+    return orjson.dumps(student_data)
+
+def decode_record(raw: str) -> Dict:
+    """Decodes a stored attendance record back into a dictionary."""
+    return orjson.loads(raw)
+
+class RecordStatus(IntEnum):
+    """The outcome of writing a single attendance record."""
+    ADDED = 1
+    EXISTS = 0
+    NONCE_REUSED = -1
+    REPLAYED = 2
+
 class AttendanceManager:
+    """
+    Stores attendance records and the data derived from them.
+
+    A session's records live in one hash, or, with `buckets` > 1, are
+    spread over that many hashes by a CRC32 of the school number. Small
+    buckets can keep Redis's compact listpack encoding for very large
+    sessions if the server's hash-max-listpack-value admits a record, and
+    each submission and duplicate check touches a single bucket. The
+    bucket count must be the same for every worker and must not change
+    while sessions hold records.
+    """
     _ATTENDANCE_KEY_PREFIX = "attendance:{}"
+    _BUCKET_KEY_PREFIX = "attendance:{}:{}"
+    _SUMMARY_KEY_PREFIX = "attendance_summary:{}"
+    _SUMMARY_TOTAL_FIELD = "total"
+    _SUMMARY_GROUPS = ("faculty", "section")
+    _STUDENT_INDEX_KEY_PREFIX = "student_sessions:{}"
+    _MEMBERS_KEY_PREFIX = "attendance_members:{}"
+    _NONCE_KEY_PREFIX = "submission_nonce:{}"
+    _EXPORT_KEY_PREFIX = "attendance_export:{}:{}"
+    _EXPORT_FORMATS = ("csv", "txt")
+    _ARRIVALS_KEY_PREFIX = "attendance_arrivals:{}"
+    _IDEMPOTENCY_KEY_PREFIX = "idempotency:{}:{}"
 
-    def __init__(self, client: Redis):
+    # Stops at once if the submission's idempotency key, if any, was used
+    # before, or its nonce, if any, was consumed. Otherwise inserts the
+    # record only if the student has none yet and consumes the nonce, so a
+    # duplicate attempt leaves the credential usable. In the same atomic step it
+    # bumps the session's total, faculty and section counters, adds the
+    # session to the student's attendance history, adds the student to the
+    # session's attendees and arrivals (scored by time), appends the
+    # pre-formatted CSV row and numbered TXT block to the exports and stores
+    # the response that retries with the idempotency key are answered with.
+    _ADD_RECORD_SCRIPT = """
+    local record_key, summary_key, history_key, members_key, nonce_key, csv_key, txt_key, arrivals_key, idempotency_key = unpack(KEYS)
+    local student_id, record, faculty, section, session_id, now, nonce_ttl, csv_row, txt_block, idempotency_ttl, response = unpack(ARGV)
+
+    if idempotency_ttl ~= '0' and redis.call('EXISTS', idempotency_key) == 1 then
+        return 2
+    end
+    if nonce_ttl ~= '0' and redis.call('EXISTS', nonce_key) == 1 then
+        return -1
+    end
+    if redis.call('HSETNX', record_key, student_id, record) == 0 then
+        return 0
+    end
+    if nonce_ttl ~= '0' then
+        redis.call('SET', nonce_key, 1, 'EX', nonce_ttl)
+    end
+    local position = redis.call('HINCRBY', summary_key, 'total', 1)
+    redis.call('HINCRBY', summary_key, 'faculty:' .. faculty, 1)
+    redis.call('HINCRBY', summary_key, 'section:' .. section, 1)
+    redis.call('ZADD', history_key, now, session_id)
+    redis.call('SADD', members_key, student_id)
+    redis.call('ZADD', arrivals_key, now, student_id)
+    redis.call('APPEND', csv_key, csv_row)
+    redis.call('APPEND', txt_key, ' Student ' .. position .. '\\n' .. txt_block)
+    if idempotency_ttl ~= '0' then
+        redis.call('SET', idempotency_key, response, 'EX', idempotency_ttl)
+    end
+    return 1
+    """
+
+    def __init__(self, client: Redis, router: Optional[ReplicaRouter] = None, buckets: int = 1):
         self.client = client
+        self.router = router or ReplicaRouter(client)
+        self.buckets = max(1, buckets)
+        self._add_record_script = client.register_script(self._ADD_RECORD_SCRIPT)
+
+    def record_key(self, session_id: str, student_id: str) -> str:
+        """Returns the key of the hash holding a student's record in a session."""
+        if self.buckets == 1:
+            return self._ATTENDANCE_KEY_PREFIX.format(session_id)
+        return self._BUCKET_KEY_PREFIX.format(session_id, zlib.crc32(student_id.encode()) % self.buckets)
+
+    def record_keys(self, session_id: str) -> List[str]:
+        """Returns the keys of every hash holding a session's records."""
+        if self.buckets == 1:
+            return [self._ATTENDANCE_KEY_PREFIX.format(session_id)]
+        return [self._BUCKET_KEY_PREFIX.format(session_id, bucket) for bucket in range(self.buckets)]
+
+    def _read_records(self, client, session_id: str) -> Dict[str, str]:
+        """Reads the raw records of every bucket in one pipelined round trip."""
+        with client.pipeline(transaction=False) as pipe:
+            for key in self.record_keys(session_id):
+                pipe.hgetall(key)
+            buckets = pipe.execute()
+        if len(buckets) == 1:
+            return buckets[0]
+        return {student_id: raw for bucket in buckets for student_id, raw in bucket.items()}
+
+    def _read_some_records(self, client, session_id: str, student_ids: List[str]) -> List[Optional[str]]:
+        """Reads the raw records of the given students, one HMGET per bucket, in request order."""
+        by_key: Dict[str, List[str]] = {}
+        for student_id in student_ids:
+            by_key.setdefault(self.record_key(session_id, student_id), []).append(student_id)
+        with client.pipeline(transaction=False) as pipe:
+            for key, ids in by_key.items():
+                pipe.hmget(key, ids)
+            results = pipe.execute()
+        found = {
+            student_id: raw
+            for ids, values in zip(by_key.values(), results)
+            for student_id, raw in zip(ids, values)
+        }
+        return [found[student_id] for student_id in student_ids]
+
+    @classmethod
+    def idempotency_key(cls, session_id: str, key: str) -> str:
+        """Returns the key holding the response to replay for a submission's idempotency key."""
+        return cls._IDEMPOTENCY_KEY_PREFIX.format(session_id, key)
+
+    @classmethod
+    def members_key(cls, session_id: str) -> str:
+        """Returns the key of the set holding the school numbers of a session's attendees."""
+        return cls._MEMBERS_KEY_PREFIX.format(session_id)
+
+    def _script_params(self, session_id: str, student_id: str, student_data: Mapping,
+                       nonce: Optional[str] = None, nonce_ttl: int = 0, timestamp: Optional[float] = None,
+                       idempotency_key: Optional[str] = None, idempotency_ttl: int = 0, response: str = ""):
+        """Builds the keys and arguments for one invocation of the add-record script."""
+        keys = [
+            self.record_key(session_id, student_id),
+            self._SUMMARY_KEY_PREFIX.format(session_id),
+            self._STUDENT_INDEX_KEY_PREFIX.format(student_id),
+            self.members_key(session_id),
+            self._NONCE_KEY_PREFIX.format(nonce) if nonce else "",
+            self._EXPORT_KEY_PREFIX.format(session_id, "csv"),
+            self._EXPORT_KEY_PREFIX.format(session_id, "txt"),
+            self._ARRIVALS_KEY_PREFIX.format(session_id),
+            self.idempotency_key(session_id, idempotency_key) if idempotency_key else ""
+        ]
+        args = [
+            student_id,
+            encode_record(student_data),
+            student_data.get("faculty", ""),
+            student_data.get("section", ""),
+            session_id,
+            timestamp or time.time(),
+            nonce_ttl if nonce else 0,
+            StudentDataExporter.format_csv_row(student_data),
+            StudentDataExporter.format_txt_block(student_data),
+            idempotency_ttl if idempotency_key else 0,
+            response
+        ]
+        return keys, args
+
+    def _load_scripts_sync(self) -> str:
+        """Executes the blocking SCRIPT LOAD for the add-record script."""
+        return self.client.script_load(self._ADD_RECORD_SCRIPT)
+
+    def _get_idempotent_response_sync(self, session_id: str, key: str) -> Optional[str]:
+        """Executes the blocking Redis command to read the response stored for an idempotency key."""
+        redis_key = self.idempotency_key(session_id, key)
+        return self.router.read(redis_key, lambda client: client.get(redis_key))
 
     def _has_submitted_sync(self, session_id: str, student_id: str) -> bool:
         """Executes the blocking Redis command to check for a student's submission."""
-        key = self._ATTENDANCE_KEY_PREFIX.format(session_id)
-        return self.client.hexists(key, student_id)
+        key = self.record_key(session_id, student_id)
+        return self.router.read(key, lambda client: client.hexists(key, student_id))
 
-    def _add_record_sync(self, session_id: str, student_id: str, student_data: Dict):
-        """Executes the blocking Redis command to add a student's attendance record."""
-        key = self._ATTENDANCE_KEY_PREFIX.format(session_id)
-        data_str = json.dumps(student_data)
-        self.client.hset(key, student_id, data_str)
+    def _add_record_sync(self, session_id: str, student_id: str, student_data: Mapping,
+                         nonce: Optional[str], nonce_ttl: int, idempotency_key: Optional[str] = None,
+                         idempotency_ttl: int = 0, response: str = "") -> RecordStatus:
+        """
+        Executes the blocking add-record script for a single student.
+        """
+        keys, args = self._script_params(
+            session_id, student_id, student_data, nonce, nonce_ttl,
+            idempotency_key=idempotency_key, idempotency_ttl=idempotency_ttl, response=response
+        )
+        self.router.mark_written(*keys[:3], *filter(None, keys[8:]))
+        return RecordStatus(self._add_record_script(keys=keys, args=args))
+
+    def _add_records_sync(self, session_id: str, records: Dict[str, Mapping]) -> Dict[str, bool]:
+        """
+        Executes the blocking add-record script for many students at once.
+        Uses a non-transactional pipeline so existing records are kept.
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            for student_id, student_data in records.items():
+                keys, args = self._script_params(session_id, student_id, student_data)
+                self.router.mark_written(*keys[:3])
+                self._add_record_script(keys=keys, args=args, client=pipe)
+            results = pipe.execute()
+        return {student_id: result == RecordStatus.ADDED for student_id, result in zip(records, results)}
+
+    def _replay_records_sync(self, entries: List[Dict]):
+        """
+        Executes the blocking add-record script for journaled submissions,
+        which may span many sessions. Uses a non-transactional pipeline.
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            for entry in entries:
+                keys, args = self._script_params(
+                    entry["session_id"], entry["student_id"], entry["student_data"],
+                    entry.get("nonce"), entry.get("nonce_ttl", 0), entry.get("accepted_at"),
+                    entry.get("idempotency_key"), entry.get("idempotency_ttl", 0), entry.get("response", "")
+                )
+                self.router.mark_written(*keys[:3])
+                self._add_record_script(keys=keys, args=args, client=pipe)
+            pipe.execute()
 
     def _get_attendance_sync(self, session_id: str) -> Optional[Dict[str, Dict]]:
-        """Executes the blocking Redis command to fetch all attendance records for a session."""
-        key = self._ATTENDANCE_KEY_PREFIX.format(session_id)
-        raw_data = self.client.hgetall(key)
+        """
+        Executes the blocking Redis commands to fetch all attendance records for a session.
+        The buckets are read together in a pipeline.
+        """
+        # The summary is written with every record, so it stands in for the buckets' freshness.
+        key = self._SUMMARY_KEY_PREFIX.format(session_id)
+        raw_data = self.router.read(key, lambda client: self._read_records(client, session_id))
         if not raw_data:
             return {}
-        return {sid: json.loads(data) for sid, data in raw_data.items()}
+        return {sid: decode_record(data) for sid, data in raw_data.items()}
+
+    def _get_attendance_bulk_sync(self, session_ids: List[str]) -> Dict[str, Dict[str, Dict]]:
+        """
+        Executes the blocking Redis commands to fetch the records of many sessions.
+        Every bucket of every session is read in one pipelined round trip.
+        """
+        keys = {session_id: self.record_keys(session_id) for session_id in session_ids}
+
+        def read_all(client) -> List[Dict[str, str]]:
+            with client.pipeline(transaction=False) as pipe:
+                for session_keys in keys.values():
+                    for key in session_keys:
+                        pipe.hgetall(key)
+                return pipe.execute()
+
+        # The newest session is the likeliest to have been written to recently.
+        buckets = iter(self.router.read(self._SUMMARY_KEY_PREFIX.format(session_ids[-1]), read_all))
+        return {
+            session_id: {
+                student_id: decode_record(raw)
+                for bucket in (next(buckets) for _ in session_keys)
+                for student_id, raw in bucket.items()
+            }
+            for session_id, session_keys in keys.items()
+        }
+
+    def _get_summary_sync(self, session_id: str) -> Dict:
+        """Executes the blocking Redis command to fetch a session's aggregate counters."""
+        key = self._SUMMARY_KEY_PREFIX.format(session_id)
+        raw_summary = self.router.read(key, lambda client: client.hgetall(key))
+        summary = {self._SUMMARY_TOTAL_FIELD: int(raw_summary.pop(self._SUMMARY_TOTAL_FIELD, 0))}
+        summary.update({group: {} for group in self._SUMMARY_GROUPS})
+        for field, count in raw_summary.items():
+            group, _, value = field.partition(":")
+            if group in summary:
+                summary[group][value] = int(count)
+        return summary
+
+    def _get_export_sync(self, session_id: str, format: str) -> Optional[str]:
+        """
+        Executes the blocking Redis commands to fetch a pre-built export.
+        Uses a pipeline to read the export along with the counts used to check it.
+        Returns None if the export has diverged from the attendance hash.
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self._EXPORT_KEY_PREFIX.format(session_id, format))
+            pipe.hget(self._SUMMARY_KEY_PREFIX.format(session_id), self._SUMMARY_TOTAL_FIELD)
+            for key in self.record_keys(session_id):
+                pipe.hlen(key)
+            artifact, total, *bucket_sizes = pipe.execute()
+        record_count = sum(bucket_sizes)
+
+        if int(total or 0) != record_count or bool(artifact) != bool(record_count):
+            logger.warning(f"Export of session {session_id} diverged: {total} counted, {record_count} stored")
+            return None
+        return artifact or ""
+
+    def _rebuild_derived_sync(self, session_id: str) -> Dict[str, Dict]:
+        """
+        Executes the blocking Redis commands to rebuild a session's counters
+        and exports from its attendance records. The record hashes are
+        watched so the rebuild is retried if a record is added while it runs.
+        """
+        keys = self.record_keys(session_id)
+        summary_key = self._SUMMARY_KEY_PREFIX.format(session_id)
+        self.router.mark_written(summary_key)
+
+        def rebuild(pipe) -> Dict[str, Dict]:
+            records = {sid: decode_record(data) for key in keys for sid, data in pipe.hgetall(key).items()}
+            counts = Counter({self._SUMMARY_TOTAL_FIELD: len(records)})
+            for record in records.values():
+                counts.update(f"{group}:{record.get(group, '')}" for group in self._SUMMARY_GROUPS)
+            exporter = StudentDataExporter(records)
+            blocks = {
+                "csv": "".join(exporter.format_csv_row(record) for record in records.values()),
+                "txt": "".join(
+                    exporter.format_txt_heading(i) + exporter.format_txt_block(record)
+                    for i, record in enumerate(records.values(), 1)
+                )
+            }
+
+            pipe.multi()
+            pipe.delete(summary_key)
+            if records:
+                pipe.hset(summary_key, mapping=counts)
+            for fmt, content in blocks.items():
+                pipe.set(self._EXPORT_KEY_PREFIX.format(session_id, fmt), content)
+            return records
+
+        return self.client.transaction(rebuild, *keys, value_from_callable=True)
+
+    def _get_student_history_sync(self, student_id: str, offset: int, limit: int) -> Dict:
+        """
+        Executes the blocking Redis commands to read one page of a student's
+        attendance history, newest first. Uses a pipeline for efficiency.
+        """
+        key = self._STUDENT_INDEX_KEY_PREFIX.format(student_id)
+
+        def read_page(client):
+            with client.pipeline(transaction=False) as pipe:
+                pipe.zcard(key)
+                pipe.zrevrange(key, offset, offset + limit - 1, withscores=True)
+                return pipe.execute()
+
+        total, entries = self.router.read(key, read_page)
+        return {
+            "total": total,
+            "sessions": [{"session_id": sid, "timestamp": ts} for sid, ts in entries]
+        }
+
+    def _list_arrivals_sync(self, session_id: str, start: float, end: float, limit: int,
+                            cursor: Optional[Tuple[float, str]], descending: bool) -> Dict:
+        """
+        Executes the blocking Redis commands to read one page of arrivals
+        between two timestamps, with the students' records.
+
+        The cursor is the (timestamp, school number) of the last arrival of
+        the previous page. Arrivals sharing its timestamp are ordered by
+        school number, so those up to and including it are skipped.
+        """
+        key = self._ARRIVALS_KEY_PREFIX.format(session_id)
+
+        def read_page(client) -> Dict:
+            low, high, skip = start, end, 0
+            if cursor is not None:
+                score, member = cursor
+                ties = client.zrangebyscore(key, score, score)
+                if descending:
+                    high = score
+                    skip = sum(1 for tie in ties if tie >= member)
+                else:
+                    low = score
+                    skip = sum(1 for tie in ties if tie <= member)
+            if descending:
+                entries = client.zrevrangebyscore(key, high, low, start=skip, num=limit + 1, withscores=True)
+            else:
+                entries = client.zrangebyscore(key, low, high, start=skip, num=limit + 1, withscores=True)
+            entries, has_more = entries[:limit], len(entries) > limit
+            student_ids = [student_id for student_id, _ in entries]
+            records = self._read_some_records(client, session_id, student_ids) if entries else []
+            return {
+                "arrivals": [
+                    {"school_no": student_id, "arrived_at": score, "record": decode_record(raw) if raw else None}
+                    for (student_id, score), raw in zip(entries, records)
+                ],
+                "last": entries[-1] if has_more else None
+            }
+
+        return self.router.read(key, read_page)
+
+    def _count_arrivals_sync(self, session_id: str, start: Optional[float], bucket_seconds: int,
+                             max_buckets: int) -> Dict:
+        """
+        Executes the blocking Redis commands to count arrivals per time bucket.
+        Each bucket is one ZCOUNT range query, sent together in a pipeline.
+        """
+        key = self._ARRIVALS_KEY_PREFIX.format(session_id)
+
+        def count(client) -> Dict:
+            with client.pipeline(transaction=False) as pipe:
+                pipe.zrange(key, 0, 0, withscores=True)
+                pipe.zrange(key, -1, -1, withscores=True)
+                first, last = pipe.execute()
+            if not first:
+                return {"start": start, "counts": []}
+            origin = start if start is not None else first[0][1]
+            buckets = min(max_buckets, int((last[0][1] - origin) // bucket_seconds) + 1)
+            with client.pipeline(transaction=False) as pipe:
+                for i in range(buckets):
+                    pipe.zcount(key, origin + i * bucket_seconds, f"({origin + (i + 1) * bucket_seconds}")
+                return {"start": origin, "counts": pipe.execute()}
+
+        return self.router.read(key, count)
+
+    def _delete_attendance_sync(self, session_id: str) -> int:
+        """
+        Executes the blocking Redis commands to delete a session's attendance
+        data and remove the session from every attendee's history and from
+        its course's sessions. The course is read from the key that outlives
+        the session hash, or from the hash for sessions created without it.
+        """
+        keys = self.record_keys(session_id)
+        with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hkeys(key)
+            pipe.get(SessionManager.session_course_key(session_id))
+            pipe.hget(SessionManager.session_key(session_id), SessionManager._SESSION_COURSE_FIELD)
+            *buckets, course_id, hash_course_id = pipe.execute()
+        student_ids = [student_id for bucket in buckets for student_id in bucket]
+        course_id = course_id or hash_course_id
+        course_keys = [SessionManager.course_sessions_key(course_id)] if course_id else []
+        self.router.mark_written(
+            *keys, self._SUMMARY_KEY_PREFIX.format(session_id), *course_keys,
+            *(self._STUDENT_INDEX_KEY_PREFIX.format(student_id) for student_id in student_ids)
+        )
+        with self.client.pipeline(transaction=True) as pipe:
+            for student_id in student_ids:
+                pipe.zrem(self._STUDENT_INDEX_KEY_PREFIX.format(student_id), session_id)
+            for course_key in course_keys:
+                pipe.zrem(course_key, session_id)
+            pipe.delete(
+                *keys,
+                self._SUMMARY_KEY_PREFIX.format(session_id),
+                SessionManager.session_course_key(session_id),
+                self.members_key(session_id),
+                self._ARRIVALS_KEY_PREFIX.format(session_id),
+                *(self._EXPORT_KEY_PREFIX.format(session_id, fmt) for fmt in self._EXPORT_FORMATS)
+            )
+            pipe.execute()
+        return len(student_ids)
     
+    async def load_scripts(self) -> bool:
+        """
+        Loads the add-record script into the Redis script cache so the first
+        submission does not pay for sending and compiling it.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Returns:
+            bool: True if the script was loaded, otherwise False.
+        """
+        try:
+            await asyncio.to_thread(self._load_scripts_sync)
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Loading the add-record script failed: {e}")
+            return False
+
     async def has_submitted(self, session_id: str, student_id: str) -> bool:
         """
         Checks if a student has already submitted attendance for the given session.
@@ -50,25 +489,106 @@ class AttendanceManager:
             logger.error(f"Check submission failed for student {student_id} in session {session_id}: {e}")
             return False
 
-    async def add_record(self, session_id: str, student_id: str, student_data: Dict) -> bool:
+    async def add_record(self, session_id: str, student_id: str, student_data: Mapping,
+                         nonce: Optional[str] = None, nonce_ttl: int = 0, idempotency_key: Optional[str] = None,
+                         idempotency_ttl: int = 0, response: str = "") -> Optional[RecordStatus]:
         """
-        Adds or updates a student’s attendance record for a session.
+        Adds a student’s attendance record for a session and updates the
+        session's aggregate counters in the same atomic step. An existing
+        record is kept as is and the counters are left unchanged.
         This operation is executed in a separate thread to avoid blocking.
 
         Args:
             session_id (str): The identifier for the session.
             student_id (str): The identifier for the student (to be used as the hash field).
-            student_data (Dict): The student's data to store as a JSON string.
+            student_data (Mapping): The student's data to store as a JSON string.
+            nonce (Optional[str]): A single-use submission nonce to consume with the write.
+            nonce_ttl (int): How long, in seconds, a consumed nonce is remembered.
+            idempotency_key (Optional[str]): The client's key for this submission, if any.
+            idempotency_ttl (int): How long, in seconds, the response is kept for the key.
+            response (str): The response to replay for retries with the same key.
 
         Returns:
-            bool: True if the record was added successfully, otherwise False.
+            Optional[RecordStatus]: ADDED if the record was written, EXISTS if the
+            student had already submitted, NONCE_REUSED if the nonce was already
+            consumed, REPLAYED if the idempotency key was already used, or None
+            if an error occurs.
         """
         try:
-            await asyncio.to_thread(self._add_record_sync, session_id, student_id, student_data)
-            logger.info(f"Added attendance record for student {student_id} in session {session_id}")
-            return True
+            result = await asyncio.to_thread(
+                self._add_record_sync, session_id, student_id, student_data, nonce, nonce_ttl,
+                idempotency_key, idempotency_ttl, response
+            )
+            if result == RecordStatus.ADDED:
+                logger.info(f"Added attendance record for student {student_id} in session {session_id}")
+            else:
+                logger.warning(f"Attendance record for student {student_id} in session {session_id} not added: {result.name}")
+            return result
         except (redis.exceptions.RedisError, TypeError) as e:
             logger.error(f"Add record failed for student {student_id} in session {session_id}: {e}")
+            return None
+
+    async def get_idempotent_response(self, session_id: str, key: str) -> Optional[str]:
+        """
+        Reads the response stored for a submission's idempotency key.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+            key (str): The client's idempotency key.
+
+        Returns:
+            Optional[str]: The stored response, or None if the key is unused or an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_idempotent_response_sync, session_id, key)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Idempotency lookup failed for session {session_id}: {e}")
+            return None
+
+    async def add_records(self, session_id: str, records: Dict[str, Mapping]) -> Optional[Dict[str, bool]]:
+        """
+        Inserts many attendance records for a session in a single round trip.
+        Records that already exist are left untouched.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+            records (Dict[str, Dict]): Student data keyed by student identifier.
+
+        Returns:
+            A dictionary mapping each student identifier to True if the record
+            was added or False if it already existed, or None if an error occurs.
+        """
+        if not records:
+            return {}
+        try:
+            results = await asyncio.to_thread(self._add_records_sync, session_id, records)
+            logger.info(f"Added {sum(results.values())}/{len(records)} attendance records in session {session_id}")
+            return results
+        except (redis.exceptions.RedisError, TypeError) as e:
+            logger.error(f"Batch add failed for session {session_id}: {e}")
+            return None
+
+    async def replay_records(self, entries: List[Dict]) -> bool:
+        """
+        Writes submissions that were journaled while Redis was unavailable.
+        Records that already exist and nonces that were already consumed are
+        skipped by the add-record script, so replaying an entry twice is safe.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            entries (List[Dict]): Journal entries with `session_id`, `student_id`,
+                `student_data`, and optionally `nonce`, `nonce_ttl` and `accepted_at`.
+
+        Returns:
+            bool: True if every entry was written, otherwise False.
+        """
+        try:
+            await asyncio.to_thread(self._replay_records_sync, entries)
+            return True
+        except (redis.exceptions.RedisError, KeyError, TypeError) as e:
+            logger.error(f"Replay of {len(entries)} journaled records failed: {e}")
             return False
 
     async def export_attendance(self, session_id: str) -> Optional[Dict[str, Dict]]:
@@ -93,3 +613,171 @@ class AttendanceManager:
         except redis.exceptions.RedisError as e:
             logger.error(f"Export attendance failed for session {session_id}: {e}")
             return None
+
+    async def export_attendance_bulk(self, session_ids: List[str]) -> Optional[Dict[str, Dict[str, Dict]]]:
+        """
+        Fetches the records of many sessions at once, e.g. for a course report.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_ids (List[str]): The identifiers of the sessions.
+
+        Returns:
+            A dictionary of student records per session, or None if an error occurs.
+        """
+        if not session_ids:
+            return {}
+        try:
+            return await asyncio.to_thread(self._get_attendance_bulk_sync, session_ids)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Bulk export failed for {len(session_ids)} sessions: {e}")
+            return None
+
+    async def get_summary(self, session_id: str) -> Optional[Dict]:
+        """
+        Fetches the aggregate counters of a session without reading its records.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+
+        Returns:
+            A dictionary with the `total` count and per-`faculty` and
+            per-`section` counts, or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_summary_sync, session_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Fetch summary failed for session {session_id}: {e}")
+            return None
+
+    async def get_export(self, session_id: str, format: str) -> Optional[str]:
+        """
+        Fetches the incrementally built export of a session in one round trip.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+            format (str): The export format, `csv` or `txt`.
+
+        Returns:
+            Optional[str]: The concatenated CSV rows or numbered TXT blocks, or
+            None if the export diverged from the records or an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_export_sync, session_id, format)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Fetch export failed for session {session_id}: {e}")
+            return None
+
+    async def rebuild_derived_data(self, session_id: str) -> Optional[Dict[str, Dict]]:
+        """
+        Rebuilds a session's counters and exports from its attendance records.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+
+        Returns:
+            A dictionary of the session's student records, or None if an error occurs.
+        """
+        try:
+            records = await asyncio.to_thread(self._rebuild_derived_sync, session_id)
+            logger.info(f"Rebuilt exports for session {session_id}, count: {len(records)}")
+            return records
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Rebuild exports failed for session {session_id}: {e}")
+            return None
+
+    async def get_student_history(self, student_id: str, offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        """
+        Fetches the sessions a student attended, newest first, one page at a time.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            student_id (str): The identifier for the student.
+            offset (int): The number of most recent sessions to skip.
+            limit (int): The maximum number of sessions to return.
+
+        Returns:
+            A dictionary with the `total` number of sessions and the requested
+            page of `sessions`, or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_student_history_sync, student_id, offset, limit)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Fetch history failed for student {student_id}: {e}")
+            return None
+
+    async def list_arrivals(self, session_id: str, start: float = float("-inf"), end: float = float("inf"),
+                            limit: int = 50, cursor: Optional[Tuple[float, str]] = None,
+                            descending: bool = False) -> Optional[Dict]:
+        """
+        Lists a session's arrivals in time order, one page at a time.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+            start (float): The earliest arrival timestamp to include.
+            end (float): The latest arrival timestamp to include.
+            limit (int): The maximum number of arrivals to return.
+            cursor (Optional[Tuple[float, str]]): The timestamp and school number
+                of the last arrival on the previous page.
+            descending (bool): Whether to list the most recent arrivals first.
+
+        Returns:
+            A dictionary with the page of `arrivals` and the `last` (school
+            number, timestamp) pair if more follow, or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(
+                self._list_arrivals_sync, session_id, start, end, limit, cursor, descending
+            )
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Listing arrivals failed for session {session_id}: {e}")
+            return None
+
+    async def count_arrivals(self, session_id: str, start: Optional[float], bucket_seconds: int,
+                             max_buckets: int) -> Optional[Dict]:
+        """
+        Counts a session's arrivals in consecutive time buckets.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+            start (Optional[float]): The start of the first bucket; defaults to the first arrival.
+            bucket_seconds (int): The width of each bucket in seconds.
+            max_buckets (int): The maximum number of buckets to count.
+
+        Returns:
+            A dictionary with the `start` timestamp and the `counts` per
+            bucket, or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(
+                self._count_arrivals_sync, session_id, start, bucket_seconds, max_buckets
+            )
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Counting arrivals failed for session {session_id}: {e}")
+            return None
+
+    async def delete_attendance(self, session_id: str) -> bool:
+        """
+        Deletes a session's attendance records and counters and removes the
+        session from the attendance history of every student who attended it
+        and from its course's sessions.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            session_id (str): The identifier for the session.
+
+        Returns:
+            bool: True if the data was deleted successfully, otherwise False.
+        """
+        try:
+            count = await asyncio.to_thread(self._delete_attendance_sync, session_id)
+            logger.info(f"Deleted attendance for session {session_id}, count: {count}")
+            return True
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Delete attendance failed for session {session_id}: {e}")
+            return False
@@ -2,16 +2,21 @@ import redis.asyncio as redis
 import redis.exceptions
 import os
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-def create_redis_client() -> redis.Redis:
+def create_redis_client(host: Optional[str] = None, port: Optional[int] = None) -> redis.Redis:
     """
     Creates and returns an asynchronous Redis client using a connection pool.
 
     This function reads connection details (host, port) from environment
-    variables and establishes a robust connection pool for efficient
-    Redis communication.
+    variables, unless given explicitly, and establishes a robust connection
+    pool for efficient Redis communication.
+
+    Args:
+        host (Optional[str]): The server host; defaults to REDIS_HOST.
+        port (Optional[int]): The server port; defaults to REDIS_PORT.
 
     Returns:
         redis.Redis: An initialized asynchronous Redis client instance.
@@ -20,8 +25,8 @@ def create_redis_client() -> redis.Redis:
         redis.exceptions.ConnectionError: If the connection to the Redis server fails
                                      during initialization.
     """
-    host = os.getenv("REDIS_HOST", "localhost")
-    port = int(os.getenv("REDIS_PORT", 6379))
+    host = host or os.getenv("REDIS_HOST", "localhost")
+    port = port or int(os.getenv("REDIS_PORT", 6379))
     try:
         pool = redis.ConnectionPool(
             host=host,
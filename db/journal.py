@@ -0,0 +1,287 @@
+import redis.exceptions
+import orjson
+import logging
+import os
+import re
+import shutil
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from utils.tracing import start_span
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+class SubmissionJournal:
+    """
+    A local append-only journal for submissions that could not reach Redis.
+
+    Entries are written as JSON lines and fsynced in groups: an append returns
+    only once the group holding it is on disk. While the journal holds
+    entries, a background task probes Redis and replays them once it answers.
+    """
+    # Replay spans reference at most this many journaled request traces.
+    _MAX_SPAN_LINKS = 32
+
+    def __init__(self, path: str, max_bytes: int, fsync_interval: float,
+                 replay_interval: float, replay_batch_size: int):
+        self.path = path
+        self._replay_path = f"{path}.replaying"
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self.replay_interval = replay_interval
+        self.replay_batch_size = replay_batch_size
+
+        self.degraded = False
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._pending_bytes = 0
+        self._flush_event = asyncio.Event()
+        self._file_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+        self._size, self._depth = self._scan_existing_sync()
+        self._appended_total = 0
+        self._rejected_total = 0
+        self._replayed_total = 0
+        self._replay_rate = 0.0
+        self._last_replay_at: Optional[float] = None
+
+    def _scan_existing_sync(self) -> Tuple[int, int]:
+        """Measures entries left over from a previous run so they are replayed too."""
+        size = depth = 0
+        for path in (self._replay_path, self.path):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                size += len(data)
+                depth += data.count(b"\n")
+        if depth:
+            logger.warning(f"Journal holds {depth} unreplayed submissions from a previous run")
+        return size, depth
+
+    def _write_sync(self, data: bytes):
+        """Appends a group of entries to the journal file and fsyncs it."""
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_replay_file_sync(self) -> bytes:
+        """Moves the journal aside, if needed, and returns the entries waiting for replay."""
+        if not os.path.exists(self._replay_path):
+            if not os.path.exists(self.path):
+                return b""
+            os.replace(self.path, self._replay_path)
+        with open(self._replay_path, "rb") as f:
+            return f.read()
+
+    def start(self, writer: Callable[[List[Dict]], Awaitable[bool]], probe: Callable[[], Awaitable[bool]]):
+        """
+        Starts the background flush and replay tasks.
+
+        Args:
+            writer: Writes a batch of journal entries to Redis; returns True on success.
+            probe: Checks whether Redis is reachable again.
+        """
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._flush_loop()),
+                asyncio.create_task(self._replay_loop(writer, probe))
+            ]
+
+    async def stop(self):
+        """Flushes pending entries to disk and stops the background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+
+    async def append(self, entry: Dict) -> bool:
+        """
+        Durably records a submission that could not be written to Redis.
+
+        Args:
+            entry (Dict): The submission, as accepted by the journal's writer.
+
+        Returns:
+            bool: True once the entry is fsynced, or False if the journal is full.
+        """
+        line = orjson.dumps(entry) + b"\n"
+        if self._size + self._pending_bytes + len(line) > self.max_bytes:
+            self._rejected_total += 1
+            logger.error(f"Journal is full ({self._size} bytes); submission rejected")
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((line, future))
+        self._pending_bytes += len(line)
+        if self._tasks:
+            self._flush_event.set()
+        else:
+            await self._flush()
+        return await future
+
+    async def _flush(self):
+        """Writes every pending entry with a single fsync and resolves their appends."""
+        async with self._file_lock:
+            batch, self._pending, self._pending_bytes = self._pending, [], 0
+            if not batch:
+                return
+            data = b"".join(line for line, _ in batch)
+            try:
+                await asyncio.to_thread(self._write_sync, data)
+            except OSError as e:
+                logger.error(f"Journal write failed: {e}")
+                for _, future in batch:
+                    future.set_result(False)
+                return
+
+        self._size += len(data)
+        self._depth += len(batch)
+        self._appended_total += len(batch)
+        for _, future in batch:
+            future.set_result(True)
+
+    async def _flush_loop(self):
+        """Groups appends that arrive within the fsync interval into one write."""
+        while True:
+            await self._flush_event.wait()
+            self._flush_event.clear()
+            await asyncio.sleep(self.fsync_interval)
+            await self._flush()
+
+    async def _replay_loop(self, writer: Callable[[List[Dict]], Awaitable[bool]], probe: Callable[[], Awaitable[bool]]):
+        """Replays the journal whenever it holds entries and Redis answers again."""
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            if not self.degraded and not self._depth:
+                continue
+            try:
+                if not await probe():
+                    continue
+                if await self._replay(writer) and self.degraded:
+                    logger.info("Redis is reachable again; leaving degraded mode")
+                    self.degraded = False
+            except (redis.exceptions.RedisError, OSError):
+                continue
+            except Exception as e:
+                # Keep the loop alive; the entries stay on disk for the next attempt.
+                logger.error(f"Journal replay failed unexpectedly: {e}")
+
+    async def _replay(self, writer: Callable[[List[Dict]], Awaitable[bool]]) -> bool:
+        """Writes journaled entries to Redis in batches; returns True if all of them were written."""
+        async with self._file_lock:
+            data = await asyncio.to_thread(self._read_replay_file_sync)
+        if not data:
+            return True
+
+        started = time.monotonic()
+        entries = []
+        for line in data.splitlines():
+            try:
+                entries.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                logger.warning("Skipping a torn journal entry")
+
+        linked = [entry["traceparent"] for entry in entries if "traceparent" in entry]
+        with start_span("journal.replay", {"entries": len(entries), "links": linked[:self._MAX_SPAN_LINKS]}) as span:
+            for offset in range(0, len(entries), self.replay_batch_size):
+                if not await writer(entries[offset:offset + self.replay_batch_size]):
+                    logger.warning(f"Journal replay interrupted after {offset} of {len(entries)} entries")
+                    span.set_attribute("replayed", offset)
+                    return False
+
+        await asyncio.to_thread(os.remove, self._replay_path)
+        elapsed = time.monotonic() - started
+        self._size -= len(data)
+        self._depth -= data.count(b"\n")
+        self._replayed_total += len(entries)
+        self._replay_rate = len(entries) / elapsed if elapsed > 0 else float(len(entries))
+        self._last_replay_at = time.time()
+        logger.info(f"Replayed {len(entries)} journaled submissions in {elapsed:.3f}s")
+        return True
+
+    def metrics(self) -> Dict:
+        """Returns the journal's depth, size and replay statistics."""
+        return {
+            "degraded": self.degraded,
+            "depth": self._depth + len(self._pending),
+            "bytes": self._size + self._pending_bytes,
+            "max_bytes": self.max_bytes,
+            "appended_total": self._appended_total,
+            "rejected_total": self._rejected_total,
+            "replayed_total": self._replayed_total,
+            "last_replay_rate_per_second": round(self._replay_rate, 1),
+            "last_replay_at": self._last_replay_at
+        }
+
+_DEFAULT_JOURNAL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "journal")
+_JOURNAL_NAME = "submissions-{}.journal"
+_JOURNAL_FILE_PATTERN = re.compile(r"^submissions-(\d+)\.journal(\.replaying|\.adopting)?$")
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _adopt_orphaned_journals(directory: str, path: str):
+    """
+    Moves the entries of journals left behind by exited workers into `path`.
+
+    Each orphan is first renamed, which only one worker can do, so every
+    entry is adopted by exactly one journal and replayed once.
+    """
+    claimed = f"{path}.adopting"
+
+    def append_claimed():
+        with open(claimed, "rb") as source, open(path, "ab") as target:
+            shutil.copyfileobj(source, target)
+            target.flush()
+            os.fsync(target.fileno())
+        os.remove(claimed)
+
+    # Left over if a previous worker with this pid stopped while adopting.
+    if os.path.exists(claimed):
+        append_claimed()
+    for name in sorted(os.listdir(directory)):
+        match = _JOURNAL_FILE_PATTERN.match(name)
+        if not match or int(match.group(1)) == os.getpid() or _is_running(int(match.group(1))):
+            continue
+        try:
+            os.rename(os.path.join(directory, name), claimed)
+        except FileNotFoundError:
+            continue
+        append_claimed()
+        logger.warning(f"Adopted the submission journal {name} of an exited worker")
+
+def create_submission_journal() -> Optional[SubmissionJournal]:
+    """
+    Creates the submission journal from environment variables.
+
+    Journaling is off unless JOURNAL_ENABLED is 1, so failed writes are
+    reported to the caller. Each worker process appends to its own file,
+    `submissions-{pid}.journal` in JOURNAL_DIR, and adopts the journals of
+    workers that have exited so their entries are still replayed.
+
+    Returns:
+        Optional[SubmissionJournal]: The journal, or None if it is disabled.
+    """
+    if os.getenv("JOURNAL_ENABLED", "0") != "1":
+        return None
+    directory = os.path.abspath(os.getenv("JOURNAL_DIR", _DEFAULT_JOURNAL_DIR))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _JOURNAL_NAME.format(os.getpid()))
+    _adopt_orphaned_journals(directory, path)
+    journal = SubmissionJournal(
+        path=path,
+        max_bytes=int(os.getenv("JOURNAL_MAX_BYTES", 64 * 1024 * 1024)),
+        fsync_interval=float(os.getenv("JOURNAL_FSYNC_INTERVAL_MS", 5)) / 1000,
+        replay_interval=float(os.getenv("JOURNAL_REPLAY_INTERVAL_MS", 2000)) / 1000,
+        replay_batch_size=int(os.getenv("JOURNAL_REPLAY_BATCH_SIZE", 500))
+    )
+    logger.info(f"Submission journal enabled at {path}")
+    return journal
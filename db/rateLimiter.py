@@ -2,6 +2,7 @@ from redis.asyncio import Redis
 import redis.exceptions
 import logging
 import asyncio
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -51,3 +52,45 @@ class RateLimiter:
         except redis.exceptions.RedisError as e:
             logger.error(f"Rate limit check failed for client {client_id}: {e}")
             raise
+
+    def _first_exceeded_sync(self, limits: List[Tuple[str, int]], window: int) -> Optional[str]:
+        """
+        Counts one request against every identity in a single pipeline round trip.
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            for client_id, _ in limits:
+                key = self._RATE_LIMIT_KEY_PREFIX.format(client_id)
+                pipe.incr(key)
+                pipe.expire(key, window, nx=True)
+            results = pipe.execute()
+
+        for (client_id, limit), count in zip(limits, results[::2]):
+            if count > limit:
+                logger.warning(f"Rate limit exceeded for client {client_id} ({count} > {limit})")
+                return client_id
+        return None
+
+    async def first_exceeded(self, limits: List[Tuple[str, int]], window: int) -> Optional[str]:
+        """
+        Counts a request against several identities at once, e.g. a device,
+        an IP within a session and the IP as a whole.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            limits (List[Tuple[str, int]]): Pairs of identity and the maximum
+                number of requests it may make in the window, in the order
+                they should be reported.
+            window (int): The duration of the time window in seconds.
+
+        Returns:
+            Optional[str]: The first identity over its limit, or None if the
+            request is allowed.
+
+        Raises:
+            redis.exceptions.RedisError: If a Redis command fails.
+        """
+        try:
+            return await asyncio.to_thread(self._first_exceeded_sync, limits, window)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Rate limit check failed for {[client_id for client_id, _ in limits]}: {e}")
+            raise
@@ -1,23 +1,92 @@
 import logging
-from typing import Dict, Optional
+import os
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 from .connection import create_redis_client
 from .sessionManager import SessionManager
-from .attendanceManager import AttendanceManager
+from .attendanceManager import AttendanceManager, RecordStatus
 from .rateLimiter import RateLimiter
 from .tokenManager import TokenManager
+from .rosterManager import RosterManager
+from .journal import create_submission_journal
+from .replicaRouter import create_replica_router
+from utils.tracing import current_span, traced
 
 logger = logging.getLogger(__name__)
 
 class RedisClient:
     """The facade class that manages all Redis operations."""
+    # Sessions seen open within this window are still trusted while Redis is down.
+    _OPEN_SESSION_GRACE_SECONDS = 300
+    _OPEN_SESSION_CACHE_SIZE = 10000
+
     def __init__(self):
         self.client = create_redis_client()
-        self._session_manager = SessionManager(self.client)
-        self._attendance_manager = AttendanceManager(self.client)
+        self._router = create_replica_router(self.client)
+        self._session_manager = SessionManager(self.client, self._router)
+        self._attendance_manager = AttendanceManager(
+            self.client, self._router, buckets=int(os.getenv("ATTENDANCE_BUCKETS", 1))
+        )
         self._rate_limiter = RateLimiter(self.client)
         self._token_manager = TokenManager(self.client)
+        self._roster_manager = RosterManager(self.client)
+        self._journal = create_submission_journal()
+        self._write_deadline = float(os.getenv("REDIS_WRITE_DEADLINE_MS", 500)) / 1000
+        # session id -> (when it was last seen open, whether it rotates)
+        self._open_sessions: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
         logger.info("RedisClient initialized successfully.")
+
+    async def start(self):
+        """Starts background work, such as replaying the submission journal."""
+        if self._journal:
+            self._journal.start(writer=self._attendance_manager.replay_records, probe=self.ping)
+
+    async def warm_up(self, connections: int = 4) -> bool:
+        """
+        Opens pool connections and loads Lua scripts ahead of the first request.
+
+        Args:
+            connections (int): The number of pool connections to open.
+
+        Returns:
+            bool: True if Redis answered and the scripts were loaded.
+        """
+        try:
+            await asyncio.gather(*(self.client.ping() for _ in range(connections)))
+        except Exception as e:
+            logger.error(f"Redis warm-up failed: {e}")
+            return False
+        return await self._attendance_manager.load_scripts()
+
+    async def stop(self):
+        """Flushes the submission journal and stops background work."""
+        if self._journal:
+            await self._journal.stop()
+
+    @property
+    def degraded(self) -> bool:
+        """True while submissions are journaled locally because Redis is unavailable."""
+        return bool(self._journal and self._journal.degraded)
+
+    def journal_metrics(self) -> Optional[Dict]:
+        return self._journal.metrics() if self._journal else None
+
+    def _remember_open_session(self, session_id: str, rotating: Optional[bool] = None):
+        """Records that a session was just seen open, evicting the oldest entries."""
+        if rotating is None:
+            rotating = self._open_sessions.get(session_id, (0.0, False))[1]
+        self._open_sessions[session_id] = (time.monotonic(), rotating)
+        self._open_sessions.move_to_end(session_id)
+        while len(self._open_sessions) > self._OPEN_SESSION_CACHE_SIZE:
+            self._open_sessions.popitem(last=False)
+
+    def _was_recently_open(self, session_id: str) -> bool:
+        seen = self._open_sessions.get(session_id)
+        return seen is not None and time.monotonic() - seen[0] < self._OPEN_SESSION_GRACE_SECONDS
     
+    @traced("redis.ping", command="PING")
     async def ping(self) -> bool:
         """
         Checks the connection to the Redis server by sending a PING command.
@@ -37,29 +106,182 @@ class RedisClient:
             logger.error(f"Redis ping failed: {e}")
             raise
 
-    async def create_session(self, session_id: str, expires_in_seconds: int = 300) -> bool:
-        return await self._session_manager.create_session(session_id, expires_in_seconds)
+    @traced("redis.create_session", command="HSET+EXPIRE", key_prefix="session")
+    async def create_session(self, session_id: str, expires_in_seconds: int = 300, course_id: Optional[str] = None,
+                             rotating: bool = False) -> bool:
+        return await self._session_manager.create_session(session_id, expires_in_seconds, course_id, rotating)
 
+    @traced("redis.close_session", command="HSET+PERSIST", key_prefix="session")
     async def close_session(self, session_id: str) -> bool:
+        self._open_sessions.pop(session_id, None)
         return await self._session_manager.close_session(session_id)
 
+    @traced("redis.is_session_valid", command="HGET", key_prefix="session")
     async def is_session_valid(self, session_id: str) -> bool:
-        return await self._session_manager.is_session_valid(session_id)
+        if self.degraded:
+            return self._was_recently_open(session_id)
+        valid = await self._session_manager.is_session_valid(session_id)
+        if valid:
+            self._remember_open_session(session_id)
+        return valid
 
+    @traced("redis.get_session_access", command="HMGET", key_prefix="session")
+    async def get_session_access(self, session_id: str) -> Tuple[bool, bool]:
+        if self.degraded:
+            seen = self._open_sessions.get(session_id)
+            return self._was_recently_open(session_id), bool(seen and seen[1])
+        is_open, rotating = await self._session_manager.get_access(session_id)
+        if is_open:
+            self._remember_open_session(session_id, rotating)
+        return is_open, rotating
+
+    @traced("redis.get_session_course", command="HGET", key_prefix="session")
+    async def get_session_course(self, session_id: str) -> Optional[str]:
+        if self.degraded:
+            return None
+        return await self._session_manager.get_course(session_id)
+
+    @traced("redis.has_student_submitted", command="HEXISTS", key_prefix="attendance")
     async def has_student_submitted(self, session_id: str, student_id: str) -> bool:
+        if self.degraded:
+            return False
         return await self._attendance_manager.has_submitted(session_id, student_id)
 
-    async def add_student_record(self, session_id: str, student_id: str, student_data: Dict) -> bool:
-        return await self._attendance_manager.add_record(session_id, student_id, student_data)
+    @traced("redis.add_student_record", command="EVALSHA", key_prefix="attendance")
+    async def add_student_record(self, session_id: str, student_id: str, student_data: Dict,
+                                 nonce: Optional[str] = None, nonce_ttl: int = 0,
+                                 idempotency_key: Optional[str] = None, idempotency_ttl: int = 0,
+                                 response: str = "") -> Optional[RecordStatus]:
+        """
+        Writes a student's record, falling back to the local journal if Redis
+        fails or misses the write deadline. Journaled records are reported as
+        added and are replayed into Redis once it recovers. Without a journal
+        there is nothing to fall back to, so the write is awaited however
+        long it takes rather than abandoned while it may still land.
+        """
+        if not self.degraded:
+            write = self._attendance_manager.add_record(
+                session_id, student_id, student_data, nonce, nonce_ttl,
+                idempotency_key, idempotency_ttl, response
+            )
+            if self._journal is None:
+                return await write
+            try:
+                result = await asyncio.wait_for(write, timeout=self._write_deadline)
+            except asyncio.TimeoutError:
+                logger.warning(f"Add record for session {session_id} missed the {self._write_deadline}s deadline")
+                result = None
+            if result is not None:
+                return result
+            logger.warning("Redis write failed; journaling submissions locally")
+            self._journal.degraded = True
 
+        entry = {
+            "session_id": session_id,
+            "student_id": student_id,
+            "student_data": student_data,
+            "nonce": nonce,
+            "nonce_ttl": nonce_ttl,
+            "accepted_at": time.time()
+        }
+        if idempotency_key:
+            entry.update(idempotency_key=idempotency_key, idempotency_ttl=idempotency_ttl, response=response)
+        span = current_span()
+        if span is not None and span.sampled:
+            # Lets the replay span link back to the request that was journaled.
+            entry["traceparent"] = span.traceparent
+        accepted = await self._journal.append(entry)
+        return RecordStatus.ADDED if accepted else None
+
+    @traced("redis.get_idempotent_response", command="GET", key_prefix="idempotency")
+    async def get_idempotent_response(self, session_id: str, key: str) -> Optional[str]:
+        if self.degraded:
+            return None
+        return await self._attendance_manager.get_idempotent_response(session_id, key)
+
+    @traced("redis.add_student_records", command="EVALSHA", key_prefix="attendance")
+    async def add_student_records(self, session_id: str, records: Dict[str, Dict]) -> Optional[Dict[str, bool]]:
+        return await self._attendance_manager.add_records(session_id, records)
+
+    @traced("redis.export_attendance", command="HGETALL", key_prefix="attendance")
     async def export_attendance(self, session_id: str) -> Optional[Dict[str, Dict]]:
         return await self._attendance_manager.export_attendance(session_id)
 
+    @traced("redis.get_export", command="GET", key_prefix="attendance_export")
+    async def get_export(self, session_id: str, format: str) -> Optional[str]:
+        return await self._attendance_manager.get_export(session_id, format)
+
+    @traced("redis.rebuild_export", command="HGETALL", key_prefix="attendance")
+    async def rebuild_export(self, session_id: str) -> Optional[Dict[str, Dict]]:
+        return await self._attendance_manager.rebuild_derived_data(session_id)
+
+    @traced("redis.export_attendance_bulk", command="HGETALL", key_prefix="attendance")
+    async def export_attendance_bulk(self, session_ids: List[str]) -> Optional[Dict[str, Dict[str, Dict]]]:
+        return await self._attendance_manager.export_attendance_bulk(session_ids)
+
+    @traced("redis.list_course_sessions", command="ZRANGEBYSCORE", key_prefix="course_sessions")
+    async def list_course_sessions(self, course_id: str, start: float = float("-inf"),
+                                   end: float = float("inf")) -> Optional[List[Tuple[str, float]]]:
+        return await self._session_manager.list_course_sessions(course_id, start, end)
+
+    @traced("redis.get_attendance_summary", command="HGETALL", key_prefix="attendance_summary")
+    async def get_attendance_summary(self, session_id: str) -> Optional[Dict]:
+        return await self._attendance_manager.get_summary(session_id)
+
+    @traced("redis.get_student_history", command="ZREVRANGE", key_prefix="student_sessions")
+    async def get_student_history(self, student_id: str, offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        return await self._attendance_manager.get_student_history(student_id, offset, limit)
+
+    @traced("redis.get_session_created_at", command="HGET", key_prefix="session")
+    async def get_session_created_at(self, session_id: str) -> Optional[float]:
+        return await self._session_manager.get_created_at(session_id)
+
+    @traced("redis.list_arrivals", command="ZRANGEBYSCORE+HMGET", key_prefix="attendance_arrivals")
+    async def list_arrivals(self, session_id: str, start: float, end: float, limit: int,
+                            cursor: Optional[Tuple[float, str]], descending: bool) -> Optional[Dict]:
+        return await self._attendance_manager.list_arrivals(session_id, start, end, limit, cursor, descending)
+
+    @traced("redis.count_arrivals", command="ZCOUNT", key_prefix="attendance_arrivals")
+    async def count_arrivals(self, session_id: str, start: Optional[float], bucket_seconds: int,
+                             max_buckets: int) -> Optional[Dict]:
+        return await self._attendance_manager.count_arrivals(session_id, start, bucket_seconds, max_buckets)
+
+    @traced("redis.delete_attendance", command="DEL", key_prefix="attendance")
+    async def delete_attendance(self, session_id: str) -> bool:
+        return await self._attendance_manager.delete_attendance(session_id)
+
+    @traced("redis.check_rate_limit", command="INCR+EXPIRE", key_prefix="rate_limit")
     async def check_rate_limit(self, client_id: str, limit: int, window: int) -> bool:
+        if self.degraded:
+            return False
         return await self._rate_limiter.is_limited(client_id, limit, window)
+
+    @traced("redis.check_rate_limits", command="INCR+EXPIRE", key_prefix="rate_limit")
+    async def check_rate_limits(self, limits: List[Tuple[str, int]], window: int) -> Optional[str]:
+        if self.degraded:
+            return None
+        return await self._rate_limiter.first_exceeded(limits, window)
     
+    @traced("redis.set_access_token", command="SETEX", key_prefix="access_token")
     async def set_access_token(self, token: str, session_id: str, expire_seconds: int) -> bool:
         return await self._token_manager.set_token(token, session_id, expire_seconds)
 
+    @traced("redis.consume_access_token", command="GET+DEL", key_prefix="access_token")
     async def consume_access_token(self, token: str) -> Optional[str]:
-        return await self._token_manager.consume_token(token)
\ No newline at end of file
+        return await self._token_manager.consume_token(token)
+
+    @traced("redis.import_roster", command="SADD", key_prefix="roster")
+    async def import_roster(self, course_id: str, chunks: AsyncIterator[List[str]]) -> Optional[int]:
+        return await self._roster_manager.import_roster(course_id, chunks)
+
+    @traced("redis.check_roster_members", command="SMISMEMBER", key_prefix="roster")
+    async def check_roster_members(self, course_id: str, student_ids: List[str]) -> Dict[str, bool]:
+        return await self._roster_manager.check_members(course_id, student_ids)
+
+    @traced("redis.get_roster", command="SMEMBERS", key_prefix="roster")
+    async def get_roster(self, course_id: str) -> Optional[List[str]]:
+        return await self._roster_manager.get_roster(course_id)
+
+    @traced("redis.get_absentees", command="SDIFF", key_prefix="roster")
+    async def get_absentees(self, course_id: str, session_id: str) -> Optional[List[str]]:
+        return await self._roster_manager.get_absentees(course_id, session_id)
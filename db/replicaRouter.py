@@ -0,0 +1,104 @@
+from redis.asyncio import Redis
+import redis.exceptions
+import logging
+import os
+import time
+from itertools import cycle
+from typing import Callable, Dict, List, Optional, TypeVar
+from .connection import create_redis_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class ReplicaRouter:
+    """
+    Chooses the Redis server that serves each read.
+
+    Reads go to the replicas in turn, except for keys written within the
+    freshness window, which are read from the primary so that a client never
+    sees its own write undone (e.g. a session reopened right after closing).
+    A replica that fails is skipped for a while and the read is retried on
+    the primary. Without replicas every read goes to the primary.
+
+    Written keys are tracked in this process only, so a read served by
+    another worker process may still come from a lagging replica.
+    """
+    # Expired entries are pruned once the write log grows past this size.
+    _WRITE_LOG_PRUNE_SIZE = 10000
+
+    def __init__(self, primary: Redis, replicas: Optional[List[Redis]] = None,
+                 freshness_ms: int = 1000, retry_seconds: float = 5.0):
+        self.primary = primary
+        self.replicas = replicas or []
+        self.freshness = freshness_ms / 1000
+        self.retry_seconds = retry_seconds
+        self._rotation = cycle(self.replicas)
+        self._recent_writes: Dict[str, float] = {}
+        self._down_until: Dict[int, float] = {}
+
+    def mark_written(self, *keys: str):
+        """Pins the given keys to the primary for the freshness window."""
+        if not self.replicas:
+            return
+        fresh_until = time.monotonic() + self.freshness
+        for key in keys:
+            self._recent_writes[key] = fresh_until
+        if len(self._recent_writes) > self._WRITE_LOG_PRUNE_SIZE:
+            now = time.monotonic()
+            self._recent_writes = {k: t for k, t in self._recent_writes.items() if t > now}
+
+    def _pick(self, key: str) -> Optional[Redis]:
+        """Returns the next healthy replica, or None if the read must use the primary."""
+        now = time.monotonic()
+        if self._recent_writes.get(key, 0) > now:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self._rotation)
+            if self._down_until.get(id(replica), 0) <= now:
+                return replica
+        return None
+
+    def read(self, key: str, command: Callable[[Redis], T]) -> T:
+        """
+        Runs a read-only command against a replica, falling back to the primary.
+
+        Args:
+            key (str): The key the command reads, used for the freshness policy.
+            command: Executes the read against the given client.
+
+        Returns:
+            The command's result.
+        """
+        replica = self._pick(key)
+        if replica is None:
+            return command(self.primary)
+        try:
+            return command(replica)
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            logger.warning(f"Replica read failed, using the primary for {self.retry_seconds}s: {e}")
+            self._down_until[id(replica)] = time.monotonic() + self.retry_seconds
+            return command(self.primary)
+
+def create_replica_router(primary: Redis) -> ReplicaRouter:
+    """
+    Creates the read router from environment variables.
+
+    REDIS_REPLICA_HOSTS lists replicas as comma-separated host:port pairs.
+    REDIS_REPLICA_FRESHNESS_MS sets how long written keys are read from the
+    primary, and REDIS_REPLICA_RETRY_SECONDS how long a failed replica is
+    skipped.
+
+    Returns:
+        ReplicaRouter: The router; without replicas it always reads from the primary.
+    """
+    replicas = []
+    for address in filter(None, (a.strip() for a in os.getenv("REDIS_REPLICA_HOSTS", "").split(","))):
+        host, _, port = address.partition(":")
+        replicas.append(create_redis_client(host=host, port=int(port or 6379)))
+    return ReplicaRouter(
+        primary,
+        replicas,
+        freshness_ms=int(os.getenv("REDIS_REPLICA_FRESHNESS_MS", 1000)),
+        retry_seconds=float(os.getenv("REDIS_REPLICA_RETRY_SECONDS", 5))
+    )
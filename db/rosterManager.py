@@ -0,0 +1,159 @@
+from redis.asyncio import Redis
+import redis.exceptions
+import logging
+import secrets
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+from .attendanceManager import AttendanceManager
+
+logger = logging.getLogger(__name__)
+
+class RosterManager:
+    """Manages the per-course sets of enrolled school numbers."""
+    _ROSTER_KEY_PREFIX = "roster:{}"
+    _STAGING_KEY_PREFIX = "roster_import:{}:{}"
+    _STAGING_TTL_SECONDS = 3600
+
+    def __init__(self, client: Redis):
+        self.client = client
+
+    def _add_chunk_sync(self, staging_key: str, student_ids: List[str]):
+        """
+        Executes the blocking Redis commands to add one chunk to a staging set.
+        The staging set expires on its own if the import never completes.
+        """
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.sadd(staging_key, *student_ids)
+            pipe.expire(staging_key, self._STAGING_TTL_SECONDS)
+            pipe.execute()
+
+    def _commit_import_sync(self, staging_key: str, course_id: str, imported: int) -> int:
+        """
+        Executes the blocking Redis commands to replace a roster with its staging set.
+        An empty import leaves the current roster in place.
+        """
+        key = self._ROSTER_KEY_PREFIX.format(course_id)
+        if not imported:
+            return 0
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.rename(staging_key, key)
+            pipe.persist(key)
+            pipe.scard(key)
+            results = pipe.execute()
+        return results[-1]
+
+    def _check_members_sync(self, course_id: str, student_ids: List[str]) -> List[bool]:
+        """
+        Executes the blocking Redis commands to check students against a roster.
+        A course without a roster accepts every student.
+        """
+        key = self._ROSTER_KEY_PREFIX.format(course_id)
+        with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            pipe.smismember(key, student_ids)
+            exists, members = pipe.execute()
+        if not exists:
+            return [True] * len(student_ids)
+        return [bool(member) for member in members]
+
+    def _get_roster_sync(self, course_id: str) -> List[str]:
+        """
+        Executes the blocking Redis command to read a course roster.
+        """
+        return sorted(self.client.smembers(self._ROSTER_KEY_PREFIX.format(course_id)))
+
+    def _get_absentees_sync(self, course_id: str, session_id: str) -> List[str]:
+        """
+        Executes the blocking Redis command to diff a roster against a session's attendees.
+        """
+        key = self._ROSTER_KEY_PREFIX.format(course_id)
+        return sorted(self.client.sdiff(key, AttendanceManager.members_key(session_id)))
+
+    async def import_roster(self, course_id: str, chunks: AsyncIterator[List[str]]) -> Optional[int]:
+        """
+        Replaces a course roster with school numbers read chunk by chunk.
+
+        The chunks are written to a staging set that atomically replaces the
+        current roster once the last chunk arrives, so submissions never see
+        a half-imported roster. Each chunk is written in a separate thread.
+
+        Args:
+            course_id (str): The identifier of the course.
+            chunks (AsyncIterator[List[str]]): Batches of school numbers to import.
+
+        Returns:
+            Optional[int]: The number of distinct students on the new roster,
+            or None if an error occurs.
+        """
+        staging_key = self._STAGING_KEY_PREFIX.format(course_id, secrets.token_hex(8))
+        imported = 0
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    await asyncio.to_thread(self._add_chunk_sync, staging_key, chunk)
+                    imported += len(chunk)
+            count = await asyncio.to_thread(self._commit_import_sync, staging_key, course_id, imported)
+            logger.info(f"Imported roster for course {course_id}, count: {count}")
+            return count
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Roster import failed for course {course_id}: {e}")
+            return None
+
+    async def check_members(self, course_id: str, student_ids: List[str]) -> Dict[str, bool]:
+        """
+        Checks which students are on a course roster with a single round trip.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            course_id (str): The identifier of the course.
+            student_ids (List[str]): The school numbers to check.
+
+        Returns:
+            Dict[str, bool]: Whether each student is on the roster. If the course
+            has no roster, or the check fails, every student is accepted.
+        """
+        if not student_ids:
+            return {}
+        try:
+            members = await asyncio.to_thread(self._check_members_sync, course_id, student_ids)
+            return dict(zip(student_ids, members))
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Roster check failed for course {course_id}: {e}")
+            return {student_id: True for student_id in student_ids}
+
+    async def get_roster(self, course_id: str) -> Optional[List[str]]:
+        """
+        Lists the school numbers on a course roster.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            course_id (str): The identifier of the course.
+
+        Returns:
+            Optional[List[str]]: The sorted school numbers, empty if the course
+            has no roster, or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_roster_sync, course_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Roster lookup failed for course {course_id}: {e}")
+            return None
+
+    async def get_absentees(self, course_id: str, session_id: str) -> Optional[List[str]]:
+        """
+        Lists the students on a course roster who did not attend a session.
+        This operation is executed in a separate thread to avoid blocking.
+
+        Args:
+            course_id (str): The identifier of the course.
+            session_id (str): The identifier of the session.
+
+        Returns:
+            Optional[List[str]]: The sorted school numbers of absent students,
+            or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_absentees_sync, course_id, session_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Absentee lookup failed for session {session_id}: {e}")
+            return None
@@ -1,7 +1,10 @@
 from redis.asyncio import Redis
 import redis.exceptions
 import logging
+from typing import List, Optional, Tuple
 import asyncio
+import time
+from .replicaRouter import ReplicaRouter
 
 logger = logging.getLogger(__name__)
 
@@ -11,19 +14,54 @@ class SessionManager:
     _SESSION_STATUS_FIELD = "status"
     _SESSION_OPEN_STATUS = "open"
     _SESSION_CLOSED_STATUS = "closed"
+    _SESSION_COURSE_FIELD = "course"
+    _SESSION_CREATED_AT_FIELD = "created_at"
+    _SESSION_ROTATING_FIELD = "rotating"
+    _COURSE_SESSIONS_KEY_PREFIX = "course_sessions:{}"
+    # The session hash expires with the session, so the course is also kept here for deletes.
+    _SESSION_COURSE_KEY_PREFIX = "session_course:{}"
 
-    def __init__(self, client: Redis):
+    def __init__(self, client: Redis, router: Optional[ReplicaRouter] = None):
         self.client = client
+        self.router = router or ReplicaRouter(client)
 
-    def _create_session_sync(self, session_id: str, expires_in_seconds: int):
+    @classmethod
+    def session_key(cls, session_id: str) -> str:
+        """Returns the key of the hash holding a session's status and course."""
+        return cls._SESSION_KEY_PREFIX.format(session_id)
+
+    @classmethod
+    def session_course_key(cls, session_id: str) -> str:
+        """Returns the key holding a session's course, which outlives the session hash."""
+        return cls._SESSION_COURSE_KEY_PREFIX.format(session_id)
+
+    @classmethod
+    def course_sessions_key(cls, course_id: str) -> str:
+        """Returns the key of the sorted set indexing a course's sessions by creation time."""
+        return cls._COURSE_SESSIONS_KEY_PREFIX.format(course_id)
+
+    def _create_session_sync(self, session_id: str, expires_in_seconds: int, course_id: Optional[str],
+                             rotating: bool = False):
         """
         Executes the blocking Redis commands to create a new session.
-        Uses a pipeline to ensure atomicity.
+        Uses a pipeline to ensure atomicity. A session with a course is also
+        added to the course's sessions, scored by creation time, and its
+        course is kept without a TTL so that a delete can find the index.
         """
         key = self._SESSION_KEY_PREFIX.format(session_id)
+        created_at = time.time()
+        fields = {self._SESSION_STATUS_FIELD: self._SESSION_OPEN_STATUS, self._SESSION_CREATED_AT_FIELD: created_at}
+        if course_id:
+            fields[self._SESSION_COURSE_FIELD] = course_id
+        if rotating:
+            fields[self._SESSION_ROTATING_FIELD] = 1
+        self.router.mark_written(key)
         with self.client.pipeline(transaction=True) as pipe:
-            pipe.hset(key, self._SESSION_STATUS_FIELD, self._SESSION_OPEN_STATUS)
+            pipe.hset(key, mapping=fields)
             pipe.expire(key, expires_in_seconds)
+            if course_id:
+                pipe.zadd(self._COURSE_SESSIONS_KEY_PREFIX.format(course_id), {session_id: created_at})
+                pipe.set(self.session_course_key(session_id), course_id)
             pipe.execute()
 
     def _close_session_sync(self, session_id: str):
@@ -32,6 +70,7 @@ class SessionManager:
         Uses a pipeline to ensure atomicity.
         """
         key = self._SESSION_KEY_PREFIX.format(session_id)
+        self.router.mark_written(key)
         with self.client.pipeline(transaction=True) as pipe:
             pipe.hset(key, self._SESSION_STATUS_FIELD, self._SESSION_CLOSED_STATUS)
             pipe.persist(key) 
@@ -42,10 +81,44 @@ class SessionManager:
         Executes the blocking Redis command to check if a session is open.
         """
         key = self._SESSION_KEY_PREFIX.format(session_id)
-        status = self.client.hget(key, self._SESSION_STATUS_FIELD)
+        status = self.router.read(key, lambda client: client.hget(key, self._SESSION_STATUS_FIELD))
         return status == self._SESSION_OPEN_STATUS
 
-    async def create_session(self, session_id: str, expires_in_seconds: int = 300) -> bool:
+    def _get_access_sync(self, session_id: str) -> Tuple[bool, bool]:
+        """
+        Executes the blocking Redis command to read whether a session is open
+        and whether it uses rotating QR codes, in one round trip.
+        """
+        key = self._SESSION_KEY_PREFIX.format(session_id)
+        status, rotating = self.router.read(
+            key, lambda client: client.hmget(key, [self._SESSION_STATUS_FIELD, self._SESSION_ROTATING_FIELD])
+        )
+        return status == self._SESSION_OPEN_STATUS, bool(rotating)
+
+    def _get_course_sync(self, session_id: str) -> Optional[str]:
+        """
+        Executes the blocking Redis command to read the course a session belongs to.
+        """
+        key = self._SESSION_KEY_PREFIX.format(session_id)
+        return self.router.read(key, lambda client: client.hget(key, self._SESSION_COURSE_FIELD))
+
+    def _get_created_at_sync(self, session_id: str) -> Optional[float]:
+        """
+        Executes the blocking Redis command to read when a session was created.
+        """
+        key = self._SESSION_KEY_PREFIX.format(session_id)
+        created_at = self.router.read(key, lambda client: client.hget(key, self._SESSION_CREATED_AT_FIELD))
+        return float(created_at) if created_at else None
+
+    def _list_course_sessions_sync(self, course_id: str, start: float, end: float) -> List[Tuple[str, float]]:
+        """
+        Executes the blocking Redis command to list a course's sessions in creation order.
+        """
+        key = self._COURSE_SESSIONS_KEY_PREFIX.format(course_id)
+        return self.router.read(key, lambda client: client.zrangebyscore(key, start, end, withscores=True))
+
+    async def create_session(self, session_id: str, expires_in_seconds: int = 300, course_id: Optional[str] = None,
+                             rotating: bool = False) -> bool:
         """
         Creates a new session with an 'open' status and a TTL.
 
@@ -55,13 +128,15 @@ class SessionManager:
         Args:
             session_id (str): The unique identifier for the session.
             expires_in_seconds (int): The session's time-to-live in seconds.
+            course_id (Optional[str]): The course whose roster the session checks against.
+            rotating (bool): Whether the session's QR link carries a rotating code.
 
         Returns:
             bool: True if the session was created successfully, otherwise False.
         """
         try:
             await asyncio.to_thread(
-                self._create_session_sync, session_id, expires_in_seconds
+                self._create_session_sync, session_id, expires_in_seconds, course_id, rotating
             )
             logger.info(f"Created session {session_id}")
             return True
@@ -90,6 +165,26 @@ class SessionManager:
             logger.error(f"Close session failed for {session_id}: {e}")
             return False
 
+    async def get_access(self, session_id: str) -> Tuple[bool, bool]:
+        """
+        Checks if a session is open and whether it uses rotating QR codes.
+
+        This method safely executes the synchronous, blocking database
+        operation in a separate thread.
+
+        Args:
+            session_id (str): The identifier of the session.
+
+        Returns:
+            Tuple[bool, bool]: Whether the session is open and whether it
+            rotates; (False, False) if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_access_sync, session_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Session access check failed for {session_id}: {e}")
+            return False, False
+
     async def is_session_valid(self, session_id: str) -> bool:
         """
         Checks if a session exists and its status is 'open'.
@@ -108,3 +203,66 @@ class SessionManager:
         except redis.exceptions.RedisError as e:
             logger.error(f"Session validation failed for {session_id}: {e}")
             return False
+
+    async def get_course(self, session_id: str) -> Optional[str]:
+        """
+        Returns the course a session was created for, if any.
+
+        This method safely executes the synchronous, blocking database
+        operation in a separate thread.
+
+        Args:
+            session_id (str): The identifier of the session.
+
+        Returns:
+            Optional[str]: The course identifier, or None if the session has no
+            course or an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_course_sync, session_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Course lookup failed for {session_id}: {e}")
+            return None
+
+    async def get_created_at(self, session_id: str) -> Optional[float]:
+        """
+        Returns when a session was created, as a Unix timestamp.
+
+        This method safely executes the synchronous, blocking database
+        operation in a separate thread.
+
+        Args:
+            session_id (str): The identifier of the session.
+
+        Returns:
+            Optional[float]: The creation time, or None if the session predates
+            this field, does not exist, or an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._get_created_at_sync, session_id)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Creation time lookup failed for {session_id}: {e}")
+            return None
+
+    async def list_course_sessions(self, course_id: str, start: float = float("-inf"),
+                                   end: float = float("inf")) -> Optional[List[Tuple[str, float]]]:
+        """
+        Lists the sessions created for a course between two timestamps, oldest first.
+
+        This method safely executes the synchronous, blocking database
+        operation in a separate thread.
+
+        Args:
+            course_id (str): The identifier of the course.
+            start (float): The earliest creation time to include.
+            end (float): The latest creation time to include.
+
+        Returns:
+            Optional[List[Tuple[str, float]]]: (session id, creation time) pairs,
+            or None if an error occurs.
+        """
+        try:
+            return await asyncio.to_thread(self._list_course_sessions_sync, course_id, start, end)
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Listing sessions failed for course {course_id}: {e}")
+            return None
@@ -0,0 +1,74 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Templates and static files are resolved against the working directory.
+os.chdir(ROOT)
+
+API_KEY = "test-api-key"
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Points every Redis client the app creates at one in-memory server."""
+    import db.connection
+    import db.redisClient
+    import db.replicaRouter
+    from api.dependencies import get_redis_client
+
+    server = fakeredis.FakeServer()
+    create = lambda *args, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(db.connection, "create_redis_client", create)
+    monkeypatch.setattr(db.redisClient, "create_redis_client", create)
+    monkeypatch.setattr(db.replicaRouter, "create_redis_client", create)
+    get_redis_client.cache_clear()
+    yield server
+    get_redis_client.cache_clear()
+
+@pytest.fixture
+def redis(redis_server):
+    from api.dependencies import get_redis_client
+    return get_redis_client()
+
+@pytest.fixture
+def client(redis, monkeypatch):
+    from fastapi.testclient import TestClient
+    from api import config
+    from api.main import app
+
+    monkeypatch.setattr(config.auth_settings, "API_KEY", API_KEY)
+    # Rate limits are skipped for this address; tests of the limiter clear it.
+    monkeypatch.setattr(config.app_settings, "CLIENT_IP", "testclient")
+    # Without the lifespan, so the shared worker pools are not shut down between tests.
+    return TestClient(app)
+
+@pytest.fixture
+def api_headers():
+    return {"X-API-Key": API_KEY}
+
+@pytest.fixture
+def open_session(redis):
+    """Creates an open session, optionally for a course, and returns its id."""
+    import asyncio
+    from api.dependencies import get_id_generator
+
+    def create(course_id=None, rotating=False):
+        session_id = get_id_generator().generate()
+        asyncio.run(redis.create_session(session_id, 300, course_id, rotating))
+        return session_id
+    return create
+
+@pytest.fixture
+def attend(client, api_headers):
+    """Records attendance for the given school numbers through the batch upload endpoint."""
+    def upload(session_id, *school_nos, section="A"):
+        students = [
+            {"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": "Eng", "section": section}
+            for school_no in school_nos
+        ]
+        response = client.post(f"/qr/attend/{session_id}/batch", json=students, headers=api_headers)
+        assert response.status_code == 200, response.text
+    return upload
@@ -0,0 +1,17 @@
+import pytest
+
+from api.admission import PAGE, SUBMIT, TOKEN, classify
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/qr/attend/ABC234", SUBMIT),
+    ("GET", "/qr/attend/ABC234", TOKEN),
+    ("GET", "/S/ABC234", TOKEN),
+    ("GET", "/S/ABC234/CODE2345", TOKEN),
+    ("POST", "/qr/api/request-attendance-token", TOKEN),
+    ("GET", "/qr/attend/", PAGE),
+    ("POST", "/qr/attend/ABC234/batch", PAGE),
+    ("GET", "/qr/teacher", PAGE),
+    ("GET", "/live", None),
+])
+def test_classify(method, path, expected):
+    assert classify(method, path) == expected
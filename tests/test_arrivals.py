@@ -0,0 +1,14 @@
+def test_arrivals_require_api_key(client, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001")
+
+    assert client.get(f"/qr/session/{session_id}/arrivals").status_code == 401
+    assert client.get(f"/qr/session/{session_id}/arrivals", headers={"X-API-Key": "wrong"}).status_code == 401
+
+def test_arrivals_list_records(client, api_headers, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001", "1002")
+
+    response = client.get(f"/qr/session/{session_id}/arrivals", headers=api_headers)
+    assert response.status_code == 200
+    assert [arrival["school_no"] for arrival in response.json()["arrivals"]] == ["1001", "1002"]
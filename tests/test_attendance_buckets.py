@@ -0,0 +1,57 @@
+import pytest
+
+SCHOOL_NOS = [str(1000 + i) for i in range(12)]
+
+@pytest.fixture(autouse=True, params=[1, 4, 16])
+def buckets(request, monkeypatch):
+    """Runs each test with the records in one hash and spread over several buckets."""
+    monkeypatch.setenv("ATTENDANCE_BUCKETS", str(request.param))
+    return request.param
+
+def attendance_keys(redis, session_id):
+    return sorted(redis.client.scan_iter(f"attendance:{session_id}*"))
+
+def test_records_are_spread_over_the_buckets(redis, open_session, attend, buckets):
+    session_id = open_session()
+    attend(session_id, *SCHOOL_NOS)
+
+    manager = redis._attendance_manager
+    keys = attendance_keys(redis, session_id)
+    assert keys == sorted({manager.record_key(session_id, school_no) for school_no in SCHOOL_NOS})
+    assert (len(keys) > 1) == (buckets > 1)
+    assert sum(redis.client.hlen(key) for key in keys) == len(SCHOOL_NOS)
+
+def test_duplicates_are_found_in_their_bucket(client, api_headers, open_session, attend):
+    session_id = open_session()
+    attend(session_id, *SCHOOL_NOS)
+
+    batch = [{"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": "Eng", "section": "A"}
+             for school_no in SCHOOL_NOS[:3] + ["2000"]]
+    response = client.post(f"/qr/attend/{session_id}/batch", json=batch, headers=api_headers)
+    assert response.json()["counts"] == {"added": 1, "duplicate": 3, "invalid": 0}
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == len(SCHOOL_NOS) + 1
+
+def test_export_reads_every_bucket(client, open_session, attend, redis):
+    session_id = open_session()
+    attend(session_id, *SCHOOL_NOS)
+    # Without the appended rows, the export is rebuilt from the buckets.
+    redis.client.delete(f"attendance_export:{session_id}:csv")
+
+    response = client.post(f"/qr/export/{session_id}?format=csv")
+    assert response.status_code == 200
+    assert all(school_no in response.text for school_no in SCHOOL_NOS)
+
+def test_arrivals_read_every_bucket(client, api_headers, open_session, attend):
+    session_id = open_session()
+    attend(session_id, *SCHOOL_NOS)
+
+    response = client.get(f"/qr/session/{session_id}/arrivals", headers=api_headers)
+    assert [arrival["school_no"] for arrival in response.json()["arrivals"]] == SCHOOL_NOS
+
+def test_delete_removes_every_bucket(client, api_headers, open_session, attend, redis):
+    session_id = open_session()
+    attend(session_id, *SCHOOL_NOS)
+    assert attendance_keys(redis, session_id)
+
+    assert client.delete(f"/qr/session/{session_id}", headers=api_headers).status_code == 204
+    assert attendance_keys(redis, session_id) == []
@@ -0,0 +1,56 @@
+import json
+
+from api import config
+
+def student(school_no, **fields):
+    return {"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": "Eng", "section": "A", **fields}
+
+def test_batch_reports_each_record(client, api_headers, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001")
+
+    batch = [student("1001"), student("1002"), student("1002"), {"school_no": "1003"}, student("1004")]
+    response = client.post(f"/qr/attend/{session_id}/batch", json=batch, headers=api_headers)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [outcome["status"] for outcome in body["results"]] == ["duplicate", "added", "duplicate", "invalid", "added"]
+    assert body["counts"] == {"added": 2, "duplicate": 2, "invalid": 1}
+
+def test_ndjson_batch_reports_bad_lines_as_invalid(client, api_headers, open_session):
+    session_id = open_session()
+    body = "\n".join([json.dumps(student("1001")), "{not json", json.dumps(student("1002"))])
+
+    response = client.post(f"/qr/attend/{session_id}/batch", content=body,
+                           headers={**api_headers, "Content-Type": "application/x-ndjson"})
+    assert response.json()["counts"] == {"added": 2, "duplicate": 0, "invalid": 1}
+
+def test_batch_over_the_limit_is_rejected(client, api_headers, open_session, monkeypatch):
+    monkeypatch.setattr(config.batch_upload_settings, "MAX_RECORDS", 2)
+    session_id = open_session()
+
+    batch = [student(str(1000 + i)) for i in range(3)]
+    assert client.post(f"/qr/attend/{session_id}/batch", json=batch, headers=api_headers).status_code == 413
+    assert client.post(f"/qr/attend/{session_id}/batch", json=batch[:2], headers=api_headers).status_code == 200
+
+def test_malformed_batch_is_rejected(client, api_headers, open_session):
+    session_id = open_session()
+    url = f"/qr/attend/{session_id}/batch"
+    assert client.post(url, content=b"[{", headers=api_headers).status_code == 400
+    assert client.post(url, json={"records": []}, headers=api_headers).status_code == 400
+
+def test_batch_write_failure_adds_nothing(client, api_headers, open_session, redis, monkeypatch):
+    session_id = open_session()
+
+    async def fail(*args):
+        return None
+    with monkeypatch.context() as patch:
+        patch.setattr(redis, "add_student_records", fail)
+        response = client.post(f"/qr/attend/{session_id}/batch", json=[student("1001")], headers=api_headers)
+    assert response.status_code == 500
+
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == 0
+
+def test_batch_requires_api_key(client, open_session):
+    session_id = open_session()
+    assert client.post(f"/qr/attend/{session_id}/batch", json=[student("1001")]).status_code == 401
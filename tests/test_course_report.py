@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+def test_deleted_session_leaves_the_report(client, api_headers, open_session, attend):
+    kept, deleted = open_session("CS101"), open_session("CS101")
+    attend(kept, "1001", "1002")
+    attend(deleted, "1003")
+
+    report = client.get("/qr/course/CS101/report", headers=api_headers).json()
+    assert [session["session_id"] for session in report["sessions"]] == [kept, deleted]
+
+    assert client.delete(f"/qr/session/{deleted}", headers=api_headers).status_code == 204
+    report = client.get("/qr/course/CS101/report", headers=api_headers).json()
+    assert [session["session_id"] for session in report["sessions"]] == [kept]
+    assert {student["school_no"]: student["rate"] for student in report["students"]} == {"1001": 1.0, "1002": 1.0}
+    assert report["at_risk"] == []
+
+def test_session_deleted_after_it_expired_leaves_the_report(client, api_headers, open_session, attend, redis):
+    from db.sessionManager import SessionManager
+
+    kept, expired = open_session("CS101"), open_session("CS101")
+    attend(kept, "1001")
+    attend(expired, "1001")
+    redis.client.delete(SessionManager.session_key(expired))
+
+    assert client.delete(f"/qr/session/{expired}", headers=api_headers).status_code == 204
+    report = client.get("/qr/course/CS101/report", headers=api_headers).json()
+    assert [session["session_id"] for session in report["sessions"]] == [kept]
+    assert not redis.client.exists(SessionManager.session_course_key(expired))
@@ -0,0 +1,61 @@
+import pytest
+
+from api import config
+from api.credentials import check_secret_key, issue_submission_credential, verify_submission_credential
+
+def student(school_no):
+    return {"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": "Eng", "section": "A"}
+
+def submit(client, session_id, credential, school_no, **headers):
+    return client.post(f"/qr/attend/{session_id}", json=student(school_no),
+                       headers={"X-Submission-Credential": credential, **headers})
+
+def test_credential_is_bound_to_its_session():
+    credential = issue_submission_credential("SESSION1")
+    assert verify_submission_credential(credential, "SESSION1")
+    assert verify_submission_credential(credential, "SESSION2") is None
+
+@pytest.mark.parametrize("tamper", [
+    lambda c: c[:-2] + ("AA" if not c.endswith("AA") else "BB"),
+    lambda c: "other-nonce." + c.split(".", 1)[1],
+    lambda c: ".".join([c.split(".")[0], str(int(c.split(".")[1]) + 3600), c.split(".")[2]]),
+    lambda c: c.replace(".", ""),
+    lambda c: "",
+])
+def test_tampered_credential_is_rejected(tamper):
+    assert verify_submission_credential(tamper(issue_submission_credential("SESSION1")), "SESSION1") is None
+
+def test_expired_credential_is_rejected(monkeypatch):
+    monkeypatch.setattr(config.credential_settings, "EXPIRE_SECONDS", -1)
+    assert verify_submission_credential(issue_submission_credential("SESSION1"), "SESSION1") is None
+
+def test_credential_is_single_use(client, open_session):
+    session_id = open_session()
+    credential = issue_submission_credential(session_id)
+
+    assert submit(client, session_id, credential, "1001").status_code == 200
+    assert submit(client, session_id, credential, "1002").status_code == 403
+
+def test_credential_from_another_session_is_rejected(client, open_session):
+    session_id = open_session()
+    credential = issue_submission_credential(open_session())
+    assert submit(client, session_id, credential, "1001").status_code == 403
+
+@pytest.mark.parametrize("headers", [{}, {"Idempotency-Key": "k" * 16}])
+def test_duplicate_attempt_does_not_use_up_the_credential(client, open_session, attend, headers):
+    session_id = open_session()
+    attend(session_id, "1001")
+    credential = issue_submission_credential(session_id)
+
+    assert submit(client, session_id, credential, "1001", **headers).status_code == 409
+    assert submit(client, session_id, credential, "1002").status_code == 200
+    assert submit(client, session_id, credential, "1003").status_code == 403
+
+def test_several_workers_need_a_shared_key(monkeypatch):
+    monkeypatch.setattr(config.app_settings, "WORKERS", 2)
+    monkeypatch.setattr(config.credential_settings, "__pydantic_fields_set__", set())
+    with pytest.raises(RuntimeError):
+        check_secret_key()
+
+    monkeypatch.setattr(config.credential_settings, "__pydantic_fields_set__", {"SECRET_KEY"})
+    check_secret_key()
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from api import executors
+from api.exceptions import ExecutorBusyError
+from api.executors import BoundedExecutor
+from utils import tracing
+
+def test_jobs_beyond_workers_and_queue_are_refused():
+    executor = BoundedExecutor("test", workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        metrics = executor.metrics()
+        with pytest.raises(ExecutorBusyError) as refused:
+            await executor.run(lambda: None)
+        release.set()
+        await asyncio.gather(*blocked)
+        return metrics, refused.value
+
+    try:
+        metrics, error = asyncio.run(scenario())
+    finally:
+        release.set()
+        executor.shutdown()
+    assert (metrics["running"], metrics["queued"]) == (1, 1)
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == str(executors.executor_settings.RETRY_AFTER_SECONDS)
+    assert executor.metrics()["rejected_total"] == 1
+    assert executor.metrics()["completed_total"] == 2
+
+def test_busy_export_pool_returns_503(client, open_session, monkeypatch):
+    pool = executors.export_executor
+    monkeypatch.setattr(pool, "_pending", pool.workers + pool.queue_size)
+
+    response = client.post(f"/qr/export/{open_session()}", params={"format": "csv"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(executors.executor_settings.RETRY_AFTER_SECONDS)
+
+def test_thread_jobs_run_in_the_callers_context():
+    executor = BoundedExecutor("test", workers=1, queue_size=0)
+
+    async def scenario():
+        with tracing.start_span("parent") as parent:
+            return parent, await executor.run(tracing.current_span)
+
+    try:
+        parent, seen = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+    assert seen is parent
+    assert tracing.current_span() is None
@@ -0,0 +1,39 @@
+from db.attendanceManager import encode_record
+
+def student(school_no):
+    return {"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": "Eng", "section": "A"}
+
+def export(client, session_id, format="csv"):
+    response = client.post(f"/qr/export/{session_id}?format={format}")
+    assert response.status_code == 200
+    return response.text
+
+def test_export_is_assembled_from_appended_rows(client, open_session, attend, monkeypatch, redis):
+    session_id = open_session()
+    attend(session_id, "1001", "1002")
+
+    async def no_rebuild(session_id):
+        raise AssertionError("export should not be rebuilt")
+    monkeypatch.setattr(redis, "rebuild_export", no_rebuild)
+    csv = export(client, session_id)
+    assert "1001" in csv and "1002" in csv
+
+def test_record_missing_from_the_export_triggers_a_rebuild(client, open_session, attend, redis):
+    session_id = open_session()
+    attend(session_id, "1001")
+    # Written behind the script's back: the record is stored but not counted or appended.
+    manager = redis._attendance_manager
+    redis.client.hset(manager.record_key(session_id, "1002"), "1002", encode_record(student("1002")))
+
+    assert "1002" in export(client, session_id)
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == 2
+    assert "1002" in export(client, session_id, "txt")
+
+def test_lost_export_is_rebuilt(client, open_session, attend, redis):
+    session_id = open_session()
+    attend(session_id, "1001", "1002")
+    redis.client.delete(f"attendance_export:{session_id}:csv")
+
+    csv = export(client, session_id)
+    assert "1001" in csv and "1002" in csv
+    assert redis.client.get(f"attendance_export:{session_id}:csv")
@@ -0,0 +1,60 @@
+from api import config
+from api.credentials import issue_submission_credential
+
+STUDENT = {"name": "Ada", "surname": "Lovelace", "school_no": "1001", "faculty": "Eng", "section": "A"}
+KEY = "retry-key-0123456789"
+
+def submit(client, session_id, key=KEY, credential=None):
+    headers = {"X-Submission-Credential": credential or issue_submission_credential(session_id)}
+    if key:
+        headers["Idempotency-Key"] = key
+    return client.post(f"/qr/attend/{session_id}", json=STUDENT, headers=headers)
+
+def test_retry_is_answered_with_the_stored_response(client, open_session):
+    session_id = open_session()
+    first = submit(client, session_id)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    # The retry resends the form's credential, whose nonce the first attempt consumed.
+    retry = submit(client, session_id, credential=first.request.headers["X-Submission-Credential"])
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == 1
+
+def test_retry_is_answered_before_rate_limiting(client, open_session, monkeypatch):
+    session_id = open_session()
+    assert submit(client, session_id).status_code == 200
+
+    monkeypatch.setattr(config.app_settings, "CLIENT_IP", "")
+    client.cookies.set(config.rate_limit_settings.DEVICE_COOKIE, "a" * 22)
+    for _ in range(config.rate_limit_settings.REQUESTS_LIMIT):
+        submit(client, session_id, key=None)
+    assert submit(client, session_id, key=None).status_code == 429
+
+    retry = submit(client, session_id)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+def test_retry_racing_its_first_attempt_is_replayed_by_the_script(client, open_session, redis, monkeypatch):
+    session_id = open_session()
+    assert submit(client, session_id).status_code == 200
+
+    # The retry's lookup ran before the first attempt stored its response.
+    async def not_stored_yet(session_id, key):
+        return None
+    monkeypatch.setattr(redis, "get_idempotent_response", not_stored_yet)
+
+    retry = submit(client, session_id)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == 1
+
+def test_same_student_without_a_key_is_a_duplicate(client, open_session):
+    session_id = open_session()
+    assert submit(client, session_id, key=None).status_code == 200
+    assert submit(client, session_id, key=None).status_code == 409
+
+def test_malformed_key_is_rejected(client, open_session):
+    assert submit(client, open_session(), key="short").status_code == 400
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+from db.journal import create_submission_journal
+
+def exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def test_journal_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("JOURNAL_ENABLED", raising=False)
+    assert create_submission_journal() is None
+
+def test_each_worker_gets_its_own_journal(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOURNAL_ENABLED", "1")
+    monkeypatch.setenv("JOURNAL_DIR", str(tmp_path))
+
+    journal = create_submission_journal()
+    assert journal.path == os.path.join(str(tmp_path), f"submissions-{os.getpid()}.journal")
+
+def test_journals_of_exited_workers_are_adopted(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOURNAL_ENABLED", "1")
+    monkeypatch.setenv("JOURNAL_DIR", str(tmp_path))
+    pid = exited_pid()
+    (tmp_path / f"submissions-{pid}.journal").write_bytes(b'{"a": 1}\n')
+    (tmp_path / f"submissions-{pid}.journal.replaying").write_bytes(b'{"b": 2}\n')
+    # A live worker's journal is left alone.
+    (tmp_path / f"submissions-{os.getppid()}.journal").write_bytes(b'{"c": 3}\n')
+
+    journal = create_submission_journal()
+    assert sorted(open(journal.path, "rb").read().splitlines()) == [b'{"a": 1}', b'{"b": 2}']
+    assert journal.metrics()["depth"] == 2
+    assert set(os.listdir(tmp_path)) == {f"submissions-{os.getppid()}.journal", os.path.basename(journal.path)}
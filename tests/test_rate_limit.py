@@ -0,0 +1,58 @@
+import pytest
+from starlette.requests import Request
+
+from api import config, ratelimit
+
+def make_request(peer, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (peer, 50000)})
+
+STUDENT = {"name": "Ada", "surname": "Lovelace", "school_no": "1001", "faculty": "Eng", "section": "A"}
+
+@pytest.fixture
+def limited_client(client, monkeypatch):
+    """The test client with a device cookie, no longer exempt from rate limiting."""
+    monkeypatch.setattr(config.app_settings, "CLIENT_IP", "")
+    client.cookies.set(config.rate_limit_settings.DEVICE_COOKIE, "a" * 22)
+    return client
+
+def submit(client, session_id):
+    # Without a credential, so every attempt is counted and refused.
+    return client.post(f"/qr/attend/{session_id}", json=STUDENT)
+
+def test_device_over_its_limit_gets_429(limited_client, open_session):
+    session_id = open_session()
+    for _ in range(config.rate_limit_settings.REQUESTS_LIMIT):
+        assert submit(limited_client, session_id).status_code == 403
+
+    response = submit(limited_client, session_id)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(config.rate_limit_settings.TIME_WINDOW)
+
+def test_other_device_keeps_its_budget(limited_client, open_session):
+    session_id = open_session()
+    for _ in range(config.rate_limit_settings.REQUESTS_LIMIT + 1):
+        submit(limited_client, session_id)
+
+    limited_client.cookies.set(config.rate_limit_settings.DEVICE_COOKIE, "b" * 22)
+    assert submit(limited_client, session_id).status_code == 403
+
+def test_session_ip_limit_caps_clients_without_cookie(limited_client, open_session, monkeypatch):
+    monkeypatch.setattr(config.rate_limit_settings, "SESSION_IP_LIMIT", 2)
+    limited_client.cookies.clear()
+    session_id = open_session()
+    assert [submit(limited_client, session_id).status_code for _ in range(3)] == [403, 403, 429]
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_trusted_networks", [])
+    assert ratelimit.client_ip(make_request("10.0.0.2", "203.0.113.7")) == "10.0.0.2"
+
+def test_forwarded_for_is_ignored_from_untrusted_peer(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_trusted_networks", ratelimit._parse_networks("10.0.0.0/8"))
+    assert ratelimit.client_ip(make_request("198.51.100.9", "203.0.113.7")) == "198.51.100.9"
+
+def test_forwarded_for_is_read_from_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_trusted_networks", ratelimit._parse_networks("10.0.0.0/8"))
+    # The client prepended a spoofed address; the proxies appended the real one and themselves.
+    request = make_request("10.0.0.2", "192.0.2.1, 203.0.113.7, 10.0.0.3")
+    assert ratelimit.client_ip(request) == "203.0.113.7"
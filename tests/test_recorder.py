@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from api import recorder
+from api.recorder import TrafficRecorder, match_route
+
+@pytest.fixture
+def recorded(monkeypatch, tmp_path):
+    """Records traffic to a temporary file and returns a function reading its events."""
+    path = tmp_path / "traffic.jsonl"
+    traffic_recorder = TrafficRecorder(str(path), "alias-key", 1000)
+    monkeypatch.setattr(recorder, "traffic_recorder", traffic_recorder)
+
+    def events():
+        traffic_recorder._file.flush()
+        return [json.loads(line) for line in path.read_text().splitlines()]
+    yield events
+    traffic_recorder.close()
+
+def test_rotating_short_links_are_matched():
+    assert match_route("GET", "/S/abc/K7QF2M4A") == ("/S/{session_id}/{code}", {"session_id": "abc", "code": "K7QF2M4A"})
+    assert match_route("GET", "/S/abc") == ("/S/{session_id}", {"session_id": "abc"})
+
+def test_rotating_link_is_recorded_without_its_code(client, recorded):
+    response = client.get("/S/abc/K7QF2M4A", follow_redirects=False)
+    assert response.status_code == 307
+
+    [event] = recorded()
+    assert event["route"] == "/S/{session_id}/{code}"
+    assert "K7QF2M4A" not in json.dumps(event) and "abc" not in json.dumps(event)
+
+def test_idempotency_key_is_recorded_as_an_alias(client, open_session, recorded):
+    session_id = open_session()
+    student = {"name": "Ada", "surname": "Lovelace", "school_no": "1001", "faculty": "Eng", "section": "A"}
+    key = "k" * 20
+    for _ in range(2):
+        client.post(f"/qr/attend/{session_id}", json=student, headers={"Idempotency-Key": key})
+
+    first, retry = recorded()
+    assert first["idempotency"] == retry["idempotency"]
+    assert key not in first["idempotency"]
+
+def test_replayed_retries_share_a_fresh_idempotency_key(monkeypatch):
+    from utils.replay import Replayer
+
+    replayer = Replayer("http://replay.invalid")
+    replayer._created, replayer._sessions = {"s1"}, {"s1": "live-session"}
+    replayer._session_ready["s1"].set()
+    sent = []
+    monkeypatch.setattr(replayer, "_send", lambda timings, method, path, device, body=None, headers=None:
+                        sent.append(headers) or (200, {}, ""))
+
+    submission = {"method": "POST", "route": "/qr/attend/{session_id}", "session": "s1", "device": "d1"}
+    for alias in ("first", "first", "second"):
+        replayer._dispatch({**submission, "idempotency": alias}, [])
+    replayer._dispatch(submission, [])
+
+    keys = [headers.get("Idempotency-Key") for headers in sent]
+    assert keys[0] == keys[1] != keys[2]
+    assert keys[3] is None and "first" not in keys
@@ -0,0 +1,29 @@
+import fakeredis
+import redis.exceptions
+
+from db.replicaRouter import ReplicaRouter
+
+class FailingReplica(fakeredis.FakeRedis):
+    def get(self, name):
+        raise redis.exceptions.ConnectionError("replica is down")
+
+def test_failed_replica_falls_back_to_the_primary():
+    primary = fakeredis.FakeRedis(decode_responses=True)
+    replica = FailingReplica(decode_responses=True)
+    router = ReplicaRouter(primary, [replica], retry_seconds=60)
+    primary.set("session:1", "open")
+
+    assert router.read("session:1", lambda client: client.get("session:1")) == "open"
+    # The replica is skipped until its retry time has passed.
+    assert router._pick("session:1") is None
+
+def test_written_keys_are_read_from_the_primary():
+    primary = fakeredis.FakeRedis(decode_responses=True)
+    replica = fakeredis.FakeRedis(decode_responses=True)
+    router = ReplicaRouter(primary, [replica], freshness_ms=60000)
+    primary.set("session:1", "closed")
+    replica.set("session:1", "open")
+
+    assert router.read("session:1", lambda client: client.get("session:1")) == "open"
+    router.mark_written("session:1")
+    assert router.read("session:1", lambda client: client.get("session:1")) == "closed"
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from utils.roster import RosterFormatError, RosterParser
+
+def parse(*pieces, chunk_size=1000):
+    async def stream():
+        for piece in pieces:
+            yield piece
+
+    async def collect():
+        return [school_no async for chunk in RosterParser(chunk_size).iter_chunks(stream()) for school_no in chunk]
+    return asyncio.run(collect())
+
+def test_quoted_newlines_stay_in_their_field():
+    body = b'school_no,name\n1001,"Lovelace,\nAda"\n1002,"Hopper\r\nGrace"\n1003,Turing\n'
+    assert parse(body) == ["1001", "1002", "1003"]
+
+def test_quoted_newline_split_across_pieces():
+    assert parse(b'name,school_no\n"Love', b'lace\nAda",10', b'01\n"x",1002') == ["1001", "1002"]
+
+def test_headerless_file_uses_first_column():
+    assert parse(b"1001,A\n1002,B\n", chunk_size=1) == ["1001", "1002"]
+
+def test_headerless_alphanumeric_school_numbers():
+    assert parse(b"A1234\nB5678\n") == ["A1234", "B5678"]
+
+@pytest.mark.parametrize("body", [b"student_id,name\n1001,Ada\n", b"Name,Section\nAda,A\n"])
+def test_header_without_school_no_column_is_rejected(body):
+    with pytest.raises(RosterFormatError):
+        parse(body)
+
+@pytest.mark.parametrize("body", [b"", b"school_no,name\n", b"\n\n"])
+def test_empty_roster_is_rejected(body):
+    with pytest.raises(RosterFormatError):
+        parse(body)
+
+def test_rejected_import_keeps_the_roster(client, api_headers, redis):
+    headers = {**api_headers, "Content-Type": "text/csv"}
+    assert client.post("/qr/roster/CS101", content=b"school_no\n1001\n1002\n", headers=headers).json()["count"] == 2
+
+    assert client.post("/qr/roster/CS101", content=b"student_id\n1003\n", headers=headers).status_code == 400
+    assert client.post("/qr/roster/CS101", content=b"school_no\n", headers=headers).status_code == 400
+    assert asyncio.run(redis.get_roster("CS101")) == ["1001", "1002"]
+
+def test_absentees_require_api_key(client, api_headers, open_session, attend):
+    headers = {**api_headers, "Content-Type": "text/csv"}
+    client.post("/qr/roster/CS101", content=b"school_no\n1001\n1002\n", headers=headers)
+    session_id = open_session("CS101")
+    attend(session_id, "1001")
+
+    assert client.get(f"/qr/session/{session_id}/absentees").status_code == 401
+    response = client.get(f"/qr/session/{session_id}/absentees", headers=api_headers)
+    assert response.json()["absentees"] == ["1002"]
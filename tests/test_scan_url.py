@@ -0,0 +1,41 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+SCAN_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ui", "student", "scan.js")
+BASE = "https://rollcall.example/qr/attend/"
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+
+def scan(text):
+    """Runs the scanner's URL parsing in node and returns the link and the form path it opens."""
+    script = f"""
+        const {{ parseAttendanceUrl, attendancePath }} = require({json.dumps(SCAN_JS)});
+        const link = parseAttendanceUrl({json.dumps(text)}, {json.dumps(BASE)});
+        console.log(JSON.stringify([link, link && attendancePath(link)]));
+    """
+    output = subprocess.run(["node", "-e", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+@pytest.mark.parametrize("text, expected", [
+    ("https://rollcall.example/qr/attend/ABC234", ({"sessionId": "ABC234", "code": None}, "/qr/attend/ABC234")),
+    ("HTTPS://ROLLCALL.EXAMPLE/S/ABC234", ({"sessionId": "ABC234", "code": None}, "/qr/attend/ABC234")),
+])
+def test_static_links(text, expected):
+    assert tuple(scan(text)) == expected
+
+@pytest.mark.parametrize("text", [
+    "https://rollcall.example/qr/attend/ABC234?code=K7QX2M4P",
+    "HTTPS://ROLLCALL.EXAMPLE/S/ABC234/K7QX2M4P",
+])
+def test_rotating_links_keep_the_code(text):
+    link, path = scan(text)
+    assert link == {"sessionId": "ABC234", "code": "K7QX2M4P"}
+    assert path == "/qr/attend/ABC234?code=K7QX2M4P"
+
+@pytest.mark.parametrize("text", ["https://elsewhere.example/", "https://rollcall.example/qr/teacher"])
+def test_other_links_are_rejected(text):
+    assert scan(text) == [None, None]
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from db.redisClient import RedisClient
+from tests.conftest import ROOT
+
+HEAVY_MODULES = ("qrcode", "PIL", "numpy")
+
+def test_import_leaves_heavy_modules_unloaded():
+    probe = f"import sys, api.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+async def ping(self):
+    return True
+
+def test_ready_waits_for_warm_up(client, monkeypatch):
+    from api.main import app
+
+    seen = []
+
+    async def observed_warm_up(self, *args):
+        seen.append(app.state.ready)
+        return True
+    monkeypatch.setattr(RedisClient, "warm_up", observed_warm_up)
+    monkeypatch.setattr(RedisClient, "ping", ping)
+    monkeypatch.delattr(app.state, "ready", raising=False)
+
+    assert client.get("/ready").status_code == 503
+    with TestClient(app) as started:
+        assert started.get("/ready").json() == {"status": "ok", "dependencies": {"redis": "ready"}}
+    assert seen == [False]
+    assert client.get("/ready").status_code == 503
+
+def test_ready_retries_failed_redis_warm_up(client, monkeypatch):
+    from api.main import app
+
+    outcomes = [False, True]
+
+    async def flaky_warm_up(self, *args):
+        return outcomes.pop(0)
+    monkeypatch.setattr(RedisClient, "warm_up", flaky_warm_up)
+    monkeypatch.setattr(RedisClient, "ping", ping)
+    monkeypatch.setattr(app.state, "ready", True, raising=False)
+    monkeypatch.setattr(app.state, "redis_warm", False, raising=False)
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["detail"]["status"] == "starting"
+    assert client.get("/ready").status_code == 200
+    assert client.get("/ready").status_code == 200
+    assert outcomes == []
@@ -0,0 +1,17 @@
+def test_history_requires_api_key(client, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001")
+
+    assert client.get("/qr/student/1001/sessions").status_code == 401
+    assert client.get("/qr/student/1001/sessions", headers={"X-API-Key": "wrong"}).status_code == 401
+
+def test_history_lists_sessions(client, api_headers, open_session, attend):
+    first, second = open_session(), open_session()
+    attend(first, "1001")
+    attend(second, "1001")
+
+    response = client.get("/qr/student/1001/sessions", headers=api_headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 2
+    assert {entry["session_id"] for entry in body["sessions"]} == {first, second}
@@ -0,0 +1,42 @@
+import asyncio
+
+def student(school_no, faculty="Eng", section="A"):
+    return {"name": "Ada", "surname": "Lovelace", "school_no": school_no, "faculty": faculty, "section": section}
+
+def add(redis, session_id, school_no, **fields):
+    return asyncio.run(redis.add_student_record(session_id, school_no, student(school_no, **fields)))
+
+def test_counters_follow_adds_and_duplicates(client, redis, open_session):
+    from db import RecordStatus
+
+    session_id = open_session()
+    assert add(redis, session_id, "1001", section="A") == RecordStatus.ADDED
+    assert add(redis, session_id, "1002", faculty="Law", section="B") == RecordStatus.ADDED
+    assert add(redis, session_id, "1001", section="B") == RecordStatus.EXISTS
+
+    summary = client.get(f"/qr/session/{session_id}/summary").json()
+    assert summary == {
+        "session_id": session_id,
+        "total": 2,
+        "faculty": {"Eng": 1, "Law": 1},
+        "section": {"A": 1, "B": 1}
+    }
+    records = asyncio.run(redis.export_attendance(session_id))
+    assert summary["total"] == len(records)
+
+def test_counters_match_batch_uploads(client, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001", "1002", section="A")
+    attend(session_id, "1002", "1003", section="B")
+
+    summary = client.get(f"/qr/session/{session_id}/summary").json()
+    assert summary["total"] == 3
+    assert summary["section"] == {"A": 2, "B": 1}
+
+def test_counters_are_cleared_by_delete(client, api_headers, open_session, attend):
+    session_id = open_session()
+    attend(session_id, "1001", "1002")
+
+    assert client.delete(f"/qr/session/{session_id}", headers=api_headers).status_code == 204
+    summary = client.get(f"/qr/session/{session_id}/summary").json()
+    assert summary == {"session_id": session_id, "total": 0, "faculty": {}, "section": {}}
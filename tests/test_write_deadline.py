@@ -0,0 +1,22 @@
+import time
+
+from api.credentials import issue_submission_credential
+
+def test_slow_write_without_journal_is_awaited(client, open_session, redis, monkeypatch):
+    assert redis._journal is None
+    manager = redis._attendance_manager
+    add_record = manager._add_record_sync
+
+    def slow_add_record(*args, **kwargs):
+        time.sleep(0.3)
+        return add_record(*args, **kwargs)
+    monkeypatch.setattr(redis, "_write_deadline", 0.05)
+    monkeypatch.setattr(manager, "_add_record_sync", slow_add_record)
+
+    session_id = open_session()
+    student = {"name": "Ada", "surname": "Lovelace", "school_no": "1001", "faculty": "Eng", "section": "A"}
+    response = client.post(f"/qr/attend/{session_id}", json=student,
+                           headers={"X-Submission-Credential": issue_submission_credential(session_id)})
+
+    assert response.status_code == 200
+    assert client.get(f"/qr/session/{session_id}/summary").json()["total"] == 1
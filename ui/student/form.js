@@ -1,7 +1,38 @@
+const MAX_ATTEMPTS = 3;
+const RETRY_DELAY_MS = 1000;
+
+// One key per rendered form: retries reuse it, so a submission that reached
+// the server before the connection dropped is answered with its first
+// response instead of a duplicate error. Kept across reloads of the tab.
+const getIdempotencyKey = (credential) => {
+    const storageKey = `idempotency:${credential}`;
+    let key = sessionStorage.getItem(storageKey);
+    if (!key) {
+        const bytes = crypto.getRandomValues(new Uint8Array(16));
+        key = Array.from(bytes, (b) => b.toString(16).padStart(2, '0')).join('');
+        sessionStorage.setItem(storageKey, key);
+    }
+    return key;
+};
+
+const postWithRetries = async (url, options) => {
+    for (let attempt = 1; ; attempt++) {
+        try {
+            return await fetch(url, options);
+        } catch (error) {
+            if (attempt >= MAX_ATTEMPTS) {
+                throw error;
+            }
+            await new Promise((resolve) => setTimeout(resolve, RETRY_DELAY_MS * attempt));
+        }
+    }
+};
+
 document.getElementById('attendanceForm').addEventListener('submit', async function(event) {
     event.preventDefault();
 
     const sessionId = document.getElementById('session_id').value;
+    const credential = document.getElementById('credential').value;
     const messageDiv = document.getElementById('message');
     const formData = {
         name: document.getElementById('name').value,
@@ -12,21 +43,24 @@ document.getElementById('attendanceForm').addEventListener('submit', async funct
     };
 
     try {
-        const response = await fetch(`/qr/attend/${sessionId}`, {
+        const response = await postWithRetries(`/qr/attend/${sessionId}`, {
             method: 'POST',
             headers: {
-                 'Content-Type': 'application/json'
+                 'Content-Type': 'application/json',
+                 'X-Submission-Credential': credential,
+                 'Idempotency-Key': getIdempotencyKey(credential)
             },
             body: JSON.stringify(formData)
         });
-                
+
         const result = await response.json();
 
         if (!response.ok){
             messageDiv.style.color = 'red';
             messageDiv.textContent = result.detail || 'An unknown error occurred.';
+            return;
         }
-        
+
         messageDiv.style.color = 'green';
         messageDiv.textContent = result.message;
         document.getElementById('attendanceForm').classList.add('hidden');
@@ -36,4 +70,4 @@ document.getElementById('attendanceForm').addEventListener('submit', async funct
         messageDiv.textContent = 'Failed to submit form. Please check your connection.';
         console.error('Error submitting form:', error);
     }
-});
\ No newline at end of file
+});
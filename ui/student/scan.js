@@ -0,0 +1,32 @@
+// Reads the session id, and the window code of a rotating session, from a
+// scanned QR link. Links have one of these shapes:
+//   https://host/qr/attend/{id}            https://host/qr/attend/{id}?code={code}
+//   HTTPS://HOST/S/{id}                    HTTPS://HOST/S/{id}/{code}
+// Returns null for anything else.
+function parseAttendanceUrl(text, base) {
+    let url, segments;
+    try {
+        url = new URL(text.trim(), base);
+        segments = url.pathname.split('/').filter(Boolean).map(decodeURIComponent);
+    } catch (error) {
+        return null;
+    }
+
+    const attend = segments.lastIndexOf('attend');
+    if (attend !== -1 && segments.length === attend + 2) {
+        return { sessionId: segments[attend + 1], code: url.searchParams.get('code') };
+    }
+    if (segments.length >= 2 && segments.length <= 3 && segments[0].toUpperCase() === 'S') {
+        return { sessionId: segments[1], code: segments[2] || null };
+    }
+    return null;
+}
+
+function attendancePath({ sessionId, code }) {
+    const path = `/qr/attend/${encodeURIComponent(sessionId)}`;
+    return code ? `${path}?code=${encodeURIComponent(code)}` : path;
+}
+
+if (typeof module !== 'undefined') {
+    module.exports = { parseAttendanceUrl, attendancePath };
+}
@@ -39,43 +39,15 @@ document.addEventListener("DOMContentLoaded", () => {
             statusDiv.textContent = "Failed to stop scanner.";
         }
         
-        const urlParts = decodedText.split('/');
-        const sessionId = urlParts[urlParts.length - 1];
+        const link = parseAttendanceUrl(decodedText, window.location.href);
 
-        if (!sessionId) {
+        if (!link || !link.sessionId) {
             statusDiv.textContent = "Invalid QR Code format. Session ID not found.";
             return;
         }
 
-        statusDiv.textContent = `Session ${sessionId} found. Requesting access...`;
-
-        try {
-            const response = await fetch('/qr/api/request-attendance-token', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ session_id: sessionId }),
-            });
-
-            if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.detail || 'Failed to get access token.');
-            }
-
-            const data = await response.json();
-
-            if(!data.access_token){
-                throw new Error('Token not found in response.');
-            }
-
-            statusDiv.textContent = "Access granted. Redirecting...";
-            window.location.href = `/qr/attend/${sessionId}?token=${data.access_token}`;
-
-        } catch (error) {
-            console.error('Error fetching access token:', error);
-            statusDiv.textContent = `Error: ${error.message}. Please try again.`;
-        }
+        statusDiv.textContent = `Session ${link.sessionId} found. Opening the attendance form...`;
+        window.location.href = attendancePath(link);
     }
 
     async function startScanner() {
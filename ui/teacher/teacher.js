@@ -2,6 +2,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     const GENERATE_API_URL = '/qr/generate-qr-code';
     const EXPORT_API_URL_BASE = '/qr/export';
+    const SESSION_API_URL_BASE = '/qr/session';
 
     const ALT_TEXT = {
         LOADING: 'Generating QR Code...',
@@ -11,12 +12,36 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     const generateButton = document.getElementById('generateButton');
+    const courseInput = document.getElementById('courseInput');
+    const rotateInput = document.getElementById('rotateInput');
+    const rotateLabel = document.getElementById('rotateLabel');
     const qrImageElement = document.getElementById('qrImage');
     const exportControls = document.getElementById('exportControls');
     const exportButton = document.getElementById('responseButton');
     const formatSelector = document.getElementById('formatSelector');
 
     let currentSessionId = null;
+    let frameSource = null;
+
+    const stopFrames = () => {
+        if (frameSource) {
+            frameSource.close();
+            frameSource = null;
+        }
+    };
+
+    // Rotating sessions: the server pushes each new QR frame as it becomes current.
+    const startFrames = (sessionId, presenterKey) => {
+        stopFrames();
+        const url = `${SESSION_API_URL_BASE}/${sessionId}/frames?key=${encodeURIComponent(presenterKey)}`;
+        frameSource = new EventSource(url);
+        frameSource.addEventListener('frame', (event) => {
+            const frame = JSON.parse(event.data);
+            qrImageElement.src = `data:image/png;base64,${frame.image}`;
+            qrImageElement.alt = ALT_TEXT.SUCCESS;
+        });
+        frameSource.addEventListener('closed', stopFrames);
+    };
 
     const handleGenerateClick = async () => {   
         qrImageElement.src = '';
@@ -24,10 +49,22 @@ document.addEventListener('DOMContentLoaded', () => {
         exportControls.style.display = 'none';
         generateButton.disabled = true;
         currentSessionId = null;
+        stopFrames();
 
 
         try {
-            const response = await fetch(GENERATE_API_URL, {
+            const courseId = courseInput.value.trim();
+            const params = new URLSearchParams();
+            if (courseId) {
+                params.set('course_id', courseId);
+            }
+            if (rotateInput.checked) {
+                params.set('rotate', 'true');
+            }
+            const query = params.toString();
+            const generateUrl = query ? `${GENERATE_API_URL}?${query}` : GENERATE_API_URL;
+
+            const response = await fetch(generateUrl, {
                 method: 'POST',
                 headers: {
                     'Accept': 'image/png'
@@ -51,7 +88,14 @@ document.addEventListener('DOMContentLoaded', () => {
             qrImageElement.src = imageUrl;
             qrImageElement.alt = ALT_TEXT.SUCCESS;
 
+            const presenterKey = response.headers.get('X-Presenter-Key');
+            if (presenterKey) {
+                startFrames(sessionId, presenterKey);
+            }
+
             generateButton.style.display = 'none';
+            courseInput.style.display = 'none';
+            rotateLabel.style.display = 'none';
             exportControls.style.display = 'block';
 
         } catch (error) {
@@ -82,6 +126,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 const errorData = await response.json().catch(() => null);
                 throw new Error(errorData?.detail || `Export failed with status ${response.status}`);
             }
+            // Exporting closes the session, so its QR code stops rotating.
+            stopFrames();
 
             const blob = await response.blob();
             const url = window.URL.createObjectURL(blob);
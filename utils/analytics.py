@@ -0,0 +1,181 @@
+"""
+Semester-level attendance analytics.
+
+The records of a course's sessions are loaded into a boolean
+students x sessions matrix, from which attendance rates per student,
+session and section are computed with array operations rather than
+per-record loops. numpy is needed to build the matrix and openpyxl to
+export it as XLSX; both are optional dependencies:
+
+    pip install numpy openpyxl
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+_UNKNOWN_SECTION = "unknown"
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("Course reports need numpy; install it with `pip install numpy`.") from e
+    return numpy
+
+def session_label(created_at: float) -> str:
+    """Formats a session's creation time as a column heading."""
+    return datetime.fromtimestamp(created_at, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+class AttendanceMatrix:
+    """
+    Attendance of a course's students across its sessions.
+
+    Rows are students, sorted by school number; columns are sessions, oldest
+    first. The students are the roster plus anyone who attended without
+    being on it. A student's section is taken from their latest submission.
+    """
+    def __init__(self, students: List[str], sections: List[str], sessions: List[Tuple[str, float]], attended):
+        self.students = students
+        self.sections = sections
+        self.sessions = sessions
+        self.attended = attended
+
+    @classmethod
+    def build(cls, sessions: List[Tuple[str, float]], records: Dict[str, Dict[str, Dict]],
+              roster: Optional[List[str]] = None) -> "AttendanceMatrix":
+        """
+        Builds the matrix from each session's attendance records.
+
+        Args:
+            sessions (List[Tuple[str, float]]): (session id, creation time) pairs, oldest first.
+            records (Dict[str, Dict[str, Dict]]): The student records of each session.
+            roster (Optional[List[str]]): The school numbers on the course roster.
+
+        Returns:
+            AttendanceMatrix: The matrix with its students, sections and sessions.
+        """
+        np = _numpy()
+        section_of: Dict[str, str] = {}
+        for session_id, _ in sessions:
+            for student_id, record in records.get(session_id, {}).items():
+                section_of[student_id] = record.get("section") or section_of.get(student_id, "")
+        students = sorted(set(roster or ()) | section_of.keys())
+        row_of = {student_id: row for row, student_id in enumerate(students)}
+
+        rows = np.fromiter(
+            (row_of[s] for session_id, _ in sessions for s in records.get(session_id, {})), dtype=np.intp
+        )
+        cols = np.repeat(
+            np.arange(len(sessions), dtype=np.intp),
+            [len(records.get(session_id, {})) for session_id, _ in sessions]
+        )
+        attended = np.zeros((len(students), len(sessions)), dtype=bool)
+        attended[rows, cols] = True
+        sections = [section_of.get(s) or _UNKNOWN_SECTION for s in students]
+        return cls(students, sections, list(sessions), attended)
+
+    def student_rates(self):
+        """Returns the share of sessions each student attended."""
+        np = _numpy()
+        if not self.sessions:
+            return np.zeros(len(self.students))
+        return self.attended.mean(axis=1)
+
+    def session_rates(self):
+        """Returns the share of students present in each session."""
+        np = _numpy()
+        if not self.students:
+            return np.zeros(len(self.sessions))
+        return self.attended.mean(axis=0)
+
+    def section_rates(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the size and mean attendance rate of each section."""
+        np = _numpy()
+        names, index = np.unique(np.asarray(self.sections, dtype=object), return_inverse=True)
+        sizes = np.bincount(index, minlength=len(names))
+        totals = np.bincount(index, weights=self.student_rates(), minlength=len(names))
+        return {
+            str(name): {"students": int(size), "rate": round(float(total / size), 4)}
+            for name, size, total in zip(names, sizes, totals)
+        }
+
+    def at_risk(self, threshold: float) -> List[Tuple[str, float]]:
+        """Lists the students whose attendance rate is below `threshold`, lowest first."""
+        np = _numpy()
+        rates = self.student_rates()
+        rows = np.flatnonzero(rates < threshold)
+        rows = rows[np.argsort(rates[rows], kind="stable")]
+        return [(self.students[row], round(float(rates[row]), 4)) for row in rows]
+
+    def to_dict(self, threshold: float) -> Dict[str, Any]:
+        """Summarises the matrix as rates per student, session and section."""
+        student_rates = self.student_rates()
+        session_rates = self.session_rates()
+        return {
+            "sessions": [
+                {"session_id": session_id, "created_at": created_at, "rate": round(float(rate), 4)}
+                for (session_id, created_at), rate in zip(self.sessions, session_rates)
+            ],
+            "students": [
+                {"school_no": student_id, "section": section, "attended": int(count), "rate": round(float(rate), 4)}
+                for student_id, section, count, rate
+                in zip(self.students, self.sections, self.attended.sum(axis=1), student_rates)
+            ],
+            "sections": self.section_rates(),
+            "at_risk": [{"school_no": student_id, "rate": rate} for student_id, rate in self.at_risk(threshold)],
+            "threshold": threshold
+        }
+
+    def _rows(self) -> List[List[Any]]:
+        """Returns the matrix as table rows: a header, then one row per student."""
+        header = ["school_no", "section"] + [
+            f"{session_label(created_at)} {session_id}" for session_id, created_at in self.sessions
+        ] + ["rate"]
+        marks = self.attended.astype(int).tolist()
+        rates = self.student_rates().round(4).tolist()
+        return [header] + [
+            [student_id, section, *row, rate]
+            for student_id, section, row, rate in zip(self.students, self.sections, marks, rates)
+        ]
+
+    def to_csv(self) -> str:
+        """Exports the matrix as CSV with a UTF-8 BOM for Excel compatibility."""
+        output = io.StringIO()
+        output.write("\ufeff")
+        csv.writer(output).writerows(self._rows())
+        return output.getvalue()
+
+    def to_xlsx(self, threshold: float) -> bytes:
+        """Exports the matrix, the section rates and the at-risk students as an XLSX workbook."""
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise ImportError("XLSX reports need openpyxl; install it with `pip install openpyxl`.") from e
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Attendance")
+        for row in self._rows():
+            sheet.append(row)
+        sheet = workbook.create_sheet("Sections")
+        sheet.append(["section", "students", "rate"])
+        for name, stats in self.section_rates().items():
+            sheet.append([name, stats["students"], stats["rate"]])
+        sheet = workbook.create_sheet("At risk")
+        sheet.append(["school_no", "rate"])
+        for student_id, rate in self.at_risk(threshold):
+            sheet.append([student_id, rate])
+
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+
+def build_course_report(format: str, sessions: List[Tuple[str, float]], records: Dict[str, Dict[str, Dict]],
+                        roster: Optional[List[str]], threshold: float):
+    """Builds a course's attendance matrix and renders it; a module-level function so process workers can run it."""
+    matrix = AttendanceMatrix.build(sessions, records, roster)
+    if format == "csv":
+        return matrix.to_csv()
+    if format == "xlsx":
+        return matrix.to_xlsx(threshold)
+    return matrix.to_dict(threshold)
@@ -1,40 +1,74 @@
 import csv
 import io
-from typing import Dict, Any
+from typing import Dict, Any, List, Mapping, Optional
 
 class StudentDataExporter:
     NO_DATA_MSG = "No student was found who participated in the roll call."
     CSV_HEADER = ['school_no', 'name', 'surname', 'faculty', 'section']
+    CSV_PREFIX = "\ufeff" + ",".join(CSV_HEADER) + "\r\n"
+    TXT_PREFIX = "Quick Roll Call\n" + "=" * 20 + "\n\n"
 
-    def __init__(self, students_data: Dict[str, Dict[str, Any]]):
+    def __init__(self, students_data: Dict[str, Dict[str, Any]], absentees: Optional[List[str]] = None):
         self.students_data = students_data
+        self.absentees = absentees
 
     def is_empty(self) -> bool:
         return not bool(self.students_data)
 
+    @classmethod
+    def format_csv_row(cls, student: Mapping[str, Any]) -> str:
+        """Format one student as a CSV row, quoted and terminated like `generate_csv`."""
+        output = io.StringIO()
+        csv.writer(output).writerow([student.get(field, "") for field in cls.CSV_HEADER])
+        return output.getvalue()
+
+    @staticmethod
+    def format_txt_block(student: Mapping[str, Any]) -> str:
+        """Format one student's TXT block, without its ` Student <n>` heading."""
+        return (
+            f" - School No: {student.get('school_no', 'N/A')}\n"
+            f" - Name Surname: {student.get('name', '')} {student.get('surname', '')}\n"
+            f" - Faculty: {student.get('faculty', 'N/A')}\n"
+            f" - Section: {student.get('section', 'N/A')}\n"
+            + "-" * 20 + "\n"
+        )
+
+    @staticmethod
+    def format_txt_heading(position: int) -> str:
+        """Format the heading that numbers a student's TXT block."""
+        return f" Student {position}\n"
+
     def generate_txt(self) -> str:
         """Generate a human-readable TXT representation of student data."""
-        if self.is_empty():
-            return self.NO_DATA_MSG
-
-        lines = ["Quick Roll Call\n", "=" * 20 + "\n\n"]
-        for i, student in enumerate(self.students_data.values(), 1):
-            lines.append(f" Student {i}\n")
-            lines.append(f" - School No: {student.get('school_no', 'N/A')}\n")
-            lines.append(f" - Name Surname: {student.get('name', '')} {student.get('surname', '')}\n")
-            lines.append(f" - Faculty: {student.get('faculty', 'N/A')}\n")
-            lines.append(f" - Section: {student.get('section', 'N/A')}\n")
-            lines.append("-" * 20 + "\n")
-        return "".join(lines)
+        blocks = "".join(
+            self.format_txt_heading(i) + self.format_txt_block(student)
+            for i, student in enumerate(self.students_data.values(), 1)
+        )
+        return self.assemble_txt(blocks, self.absentees)
 
     def generate_csv(self) -> str:
         """Generate CSV content with UTF-8 BOM for Excel compatibility."""
-        if self.is_empty():
-            return ",".join(self.CSV_HEADER) + "\n"
+        rows = "".join(self.format_csv_row(student) for student in self.students_data.values())
+        return self.assemble_csv(rows)
 
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=self.CSV_HEADER)
-        writer.writeheader()
-        writer.writerows(self.students_data.values())
+    @classmethod
+    def assemble_txt(cls, blocks: str, absentees: Optional[List[str]] = None) -> str:
+        """Assemble a TXT export from already formatted, numbered student blocks."""
+        body = cls.TXT_PREFIX + blocks if blocks else cls.NO_DATA_MSG
+        return body + cls._absentees_txt(absentees)
 
-        return "\ufeff" + output.getvalue()
+    @classmethod
+    def assemble_csv(cls, rows: str) -> str:
+        """Assemble a CSV export from already formatted rows."""
+        if not rows:
+            return ",".join(cls.CSV_HEADER) + "\n"
+        return cls.CSV_PREFIX + rows
+
+    @staticmethod
+    def _absentees_txt(absentees: Optional[List[str]]) -> str:
+        """Generate the TXT section listing roster students who did not attend."""
+        if not absentees:
+            return ""
+        lines = [f"\nAbsent Students ({len(absentees)})\n", "=" * 20 + "\n"]
+        lines.extend(f" - School No: {school_no}\n" for school_no in absentees)
+        return "".join(lines)
@@ -1,20 +1,89 @@
-import qrcode
+import base64
+import math
 import secrets
+import string
+import zlib
 
 class UniqueIdGenerator:
+    """
+    Generates random identifiers in a configurable scheme.
 
-    @staticmethod
-    def generate() -> str:
+    "hex" produces the original 64-character lowercase ids. "base62" and
+    "base32" encode the same randomness in fewer characters; base32 uses only
+    uppercase letters and digits, which QR codes store in the denser
+    alphanumeric mode. An optional trailing checksum character lets
+    mistyped or corrupted ids be rejected before any database lookup.
+    """
+    ALPHABETS = {
+        "hex": string.digits + "abcdef",
+        "base62": string.digits + string.ascii_uppercase + string.ascii_lowercase,
+        "base32": string.ascii_uppercase + "234567",
+    }
+    LEGACY_LENGTH = 64
+    _LEGACY_SYMBOLS = frozenset(string.digits + "abcdef")
+
+    def __init__(self, scheme: str = "hex", bits: int = 256, checksum: bool = False):
+        if scheme not in self.ALPHABETS:
+            raise ValueError(f"Unknown id scheme: {scheme}")
+        self.scheme = scheme
+        self.bits = bits
+        self.checksum = checksum
+        self.alphabet = self.ALPHABETS[scheme]
+        self._symbols = frozenset(self.alphabet)
+        self.length = math.ceil(bits / math.log2(len(self.alphabet)))
+
+    def _check_character(self, body: str) -> str:
+        return self.alphabet[zlib.crc32(body.encode()) % len(self.alphabet)]
+
+    def generate(self) -> str:
         """
         Generate a secure random unique ID.
 
         Returns:
-            str: A 64-character hexadecimal unique ID.
+            str: An ID carrying `bits` random bits in the configured scheme.
         """
-        return secrets.token_hex(32)
+        if self.scheme == "hex" and self.bits % 8 == 0:
+            body = secrets.token_hex(self.bits // 8)
+        elif self.scheme == "base32" and self.bits % 8 == 0:
+            body = base64.b32encode(secrets.token_bytes(self.bits // 8)).decode().rstrip("=")
+        else:
+            number = secrets.randbits(self.bits)
+            base = len(self.alphabet)
+            digits = []
+            for _ in range(self.length):
+                number, digit = divmod(number, base)
+                digits.append(self.alphabet[digit])
+            body = "".join(digits)
+        return body + self._check_character(body) if self.checksum else body
+
+    def is_valid(self, value: str) -> bool:
+        """
+        Checks whether a value could have been produced by this generator.
+
+        Legacy 64-character hex ids are always accepted, so sessions created
+        before a change of scheme keep working.
+
+        Args:
+            value (str): The ID to check.
+
+        Returns:
+            bool: True if the value has a valid shape and checksum.
+        """
+        if len(value) == self.LEGACY_LENGTH and set(value) <= self._LEGACY_SYMBOLS:
+            return True
+        if len(value) != self.length + (1 if self.checksum else 0) or not set(value) <= self._symbols:
+            return False
+        return not self.checksum or value[-1] == self._check_character(value[:-1])
 
 
 class QRCodeGenerator:
+    # Characters QR codes can store in alphanumeric mode (5.5 bits each rather than 8).
+    ALPHANUMERIC = frozenset(string.digits + string.ascii_uppercase + " $%*+-./:")
+
+    @classmethod
+    def is_alphanumeric(cls, data: str) -> bool:
+        """Returns True if the data can be encoded entirely in alphanumeric mode."""
+        return set(data) <= cls.ALPHANUMERIC
 
     @staticmethod
     def generate(data: str):
@@ -27,6 +96,8 @@ class QRCodeGenerator:
         Returns:
             PIL.Image.Image: The generated QR code image.
         """
+        # Imported here so that importing the API does not load qrcode and PIL.
+        import qrcode
         return qrcode.make(data)
 
     @staticmethod
@@ -0,0 +1,308 @@
+"""
+Replays a recorded traffic trace against a running instance and compares
+the latencies and outcomes with the recorded ones.
+
+Traces are written by the API when RECORDER_ENABLED is set. Several files,
+e.g. one per worker, are merged by timestamp. Requests are re-driven with
+their recorded spacing, divided by --speed, or as fast as possible with
+--speed max. Sessions are recreated, so each replay starts from the same
+state. Students are replaced by synthetic ones that keep the recorded
+duplicates and retries, and retries that shared an idempotency key share
+a fresh one. Rotating sessions are scanned with the code that is current
+when the request is replayed, read from the session's frame stream.
+Rosters are not replayed. Each device's requests
+keep their order; with --speed max, requests from different clients may
+overtake each other, e.g. an export may close a session before earlier
+submissions arrive.
+
+Run against a local instance whose rate limits allow one client address
+to send the whole trace, e.g. with CLIENT_IP=127.0.0.1:
+
+    python -m utils.replay traffic.jsonl --base-url http://127.0.0.1:5000 --speed 10
+"""
+import argparse
+import json
+import re
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+_CREDENTIAL_PATTERN = re.compile(r'id="credential" value="([^"]*)"')
+
+def load_trace(paths: List[str]) -> List[Dict]:
+    """Reads and merges trace files, ordered by request start."""
+    events = []
+    for path in paths:
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    events.sort(key=lambda event: event["ts"])
+    return events
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Reports redirects as responses, as they were recorded, instead of following them."""
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class Replayer:
+    """
+    Re-issues recorded requests, mapping recorded aliases to live ids.
+
+    A request for a session waits until the request that created it in the
+    replay has finished. Requests for sessions created before the recording
+    started are skipped.
+    """
+    def __init__(self, base_url: str, api_key: Optional[str] = None, timeout: float = 10, wait_timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.wait_timeout = wait_timeout
+        self._opener = urllib.request.build_opener(_NoRedirect)
+        self._lock = threading.Lock()
+        self._created = set()
+        self._session_ready: Dict[str, threading.Event] = defaultdict(threading.Event)
+        self._sessions: Dict[str, str] = {}
+        self._cookies: Dict[str, str] = {}
+        self._credentials: Dict[Tuple[str, str], str] = {}
+        self._tokens: Dict[Tuple[str, str], str] = {}
+        self._idempotency_keys: Dict[str, str] = {}
+        # session alias -> the rotating session's current code
+        self._codes: Dict[str, str] = {}
+        self._code_ready: Dict[str, threading.Event] = defaultdict(threading.Event)
+        # (event, replayed status or None if skipped, latency in ms, start lag in ms)
+        self.results: List[Tuple[Dict, Optional[int], float, float]] = []
+
+    def expect_sessions(self, events: List[Dict]):
+        """Notes which sessions the trace creates, so requests for other sessions are skipped at once."""
+        self._created = {e["session"] for e in events if e["route"] == "/qr/generate-qr-code" and "session" in e}
+
+    def _session_id(self, alias: Optional[str]) -> Optional[str]:
+        if alias not in self._created:
+            return None
+        with self._lock:
+            ready = self._session_ready[alias]
+        ready.wait(self.wait_timeout)
+        return self._sessions.get(alias)
+
+    def _code(self, alias: str) -> Optional[str]:
+        with self._lock:
+            ready = self._code_ready[alias]
+        ready.wait(self.wait_timeout)
+        return self._codes.get(alias)
+
+    def _follow_codes(self, alias: str, session_id: str, presenter_key: str):
+        """Tracks a rotating session's current code from its frame stream, as the teacher page does."""
+        query = urllib.parse.urlencode({"key": presenter_key})
+        try:
+            with self._opener.open(f"{self.base_url}/qr/session/{session_id}/frames?{query}") as stream:
+                for line in stream:
+                    if line.startswith(b"data: "):
+                        code = json.loads(line[6:]).get("code")
+                        if code:
+                            self._codes[alias] = code
+                            self._code_ready[alias].set()
+        except (urllib.error.URLError, OSError, ValueError):
+            pass
+        finally:
+            with self._lock:
+                self._code_ready[alias].set()
+
+    def _send(self, timings: List[float], method: str, path: str, device: Optional[str], body: Optional[Dict] = None,
+              headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], str]:
+        request = urllib.request.Request(self.base_url + path, method=method, headers=dict(headers or {}))
+        if body is not None:
+            request.data = json.dumps(body).encode()
+            request.add_header("Content-Type", "application/json")
+        if device and device in self._cookies:
+            request.add_header("Cookie", self._cookies[device])
+        started = time.monotonic()
+        try:
+            with self._opener.open(request, timeout=self.timeout) as response:
+                status, response_headers, text = response.status, response.headers, response.read().decode(errors="replace")
+        except urllib.error.HTTPError as e:
+            status, response_headers, text = e.code, e.headers, e.read().decode(errors="replace")
+        finally:
+            timings.append(time.monotonic() - started)
+        cookie = response_headers.get("Set-Cookie")
+        if device and cookie:
+            self._cookies[device] = cookie.split(";", 1)[0]
+        return status, response_headers, text
+
+    def replay_event(self, event: Dict, scheduled: float, after: Optional[threading.Event], done: threading.Event):
+        """
+        Replays one event once the same device's previous event has finished,
+        since a browser sends its form and submission one after the other.
+        """
+        lag = max(0.0, time.monotonic() - scheduled) * 1000
+        try:
+            if after is not None:
+                after.wait(self.wait_timeout)
+            timings = []
+            try:
+                status = self._dispatch(event, timings)
+            except (urllib.error.URLError, OSError):
+                status = 0
+            with self._lock:
+                self.results.append((event, status, sum(timings) * 1000, lag))
+        finally:
+            done.set()
+
+    def _dispatch(self, event: Dict, timings: List[float]) -> Optional[int]:
+        route, device, alias = event["route"], event.get("device"), event.get("session")
+
+        if route == "/qr/generate-qr-code":
+            try:
+                path = "/qr/generate-qr-code?rotate=true" if event.get("rotating") else "/qr/generate-qr-code"
+                status, headers, _ = self._send(timings, "POST", path, device)
+                if status == 200 and alias:
+                    self._sessions[alias] = headers["X-Session-ID"]
+                    if event.get("rotating"):
+                        threading.Thread(
+                            target=self._follow_codes, args=(alias, headers["X-Session-ID"], headers["X-Presenter-Key"]),
+                            daemon=True
+                        ).start()
+            finally:
+                if alias:
+                    with self._lock:
+                        self._session_ready[alias].set()
+            return status
+
+        session_id = self._session_id(alias)
+        if session_id is None:
+            return None
+        key = (device, alias)
+
+        if route == "/qr/api/request-attendance-token":
+            status, _, text = self._send(timings, "POST", "/qr/api/request-attendance-token", device, {"session_id": session_id})
+            if status == 200:
+                self._tokens[key] = json.loads(text)["access_token"]
+            return status
+        if route == "/S/{session_id}":
+            return self._send(timings, "GET", f"/S/{session_id}", device)[0]
+        if route == "/S/{session_id}/{code}":
+            code = self._code(alias)
+            if code is None:
+                return None
+            return self._send(timings, "GET", f"/S/{session_id}/{code}", device)[0]
+        if route == "/qr/attend/{session_id}" and event["method"] == "GET":
+            params = {}
+            if event.get("token") and key in self._tokens:
+                params["token"] = self._tokens.pop(key)
+            if event.get("code"):
+                params["code"] = self._code(alias) or ""
+            query = "?" + urllib.parse.urlencode(params) if params else ""
+            status, _, text = self._send(timings, "GET", f"/qr/attend/{session_id}{query}", device)
+            match = _CREDENTIAL_PATTERN.search(text)
+            if status == 200 and match:
+                self._credentials[key] = match.group(1)
+            return status
+        if route == "/qr/attend/{session_id}":
+            student = event.get("student") or "anonymous"
+            body = {"name": "Replay", "surname": "Student", "school_no": f"r{student}", "faculty": "Replay", "section": "A"}
+            headers = {"X-Submission-Credential": self._credentials.get(key, "")}
+            if event.get("idempotency"):
+                with self._lock:
+                    idempotency_key = self._idempotency_keys.setdefault(event["idempotency"], secrets.token_urlsafe(16))
+                headers["Idempotency-Key"] = idempotency_key
+            return self._send(timings, "POST", f"/qr/attend/{session_id}", device, body, headers)[0]
+
+        headers = {"X-API-Key": self.api_key} if self.api_key else {}
+        method = event["method"]
+        path = route.replace("{session_id}", session_id)
+        if route == "/qr/export/{session_id}":
+            path += "?format=csv"
+        return self._send(timings, method, path, device, headers=headers)[0]
+
+def replay(events: List[Dict], replayer: Replayer, speed: Optional[float], concurrency: int) -> float:
+    """
+    Issues the events with their recorded spacing divided by `speed`, or
+    back to back if `speed` is None.
+
+    Returns:
+        float: The replay's wall-clock duration in seconds.
+    """
+    replayer.expect_sessions(events)
+    started = time.monotonic()
+    first = events[0]["ts"] if events else 0
+    previous: Dict[str, threading.Event] = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for event in events:
+            scheduled = started + (event["ts"] - first) / speed if speed else time.monotonic()
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            done = threading.Event()
+            device = event.get("device")
+            after = previous.get(device) if device else None
+            if device:
+                previous[device] = done
+            pool.submit(replayer.replay_event, event, scheduled, after, done)
+    return time.monotonic() - started
+
+def report(results: List[Tuple[Dict, Optional[int], float, float]], events: List[Dict], elapsed: float) -> str:
+    """Formats latency percentiles per route, recorded and replayed, and the outcomes that differ."""
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[(result[0]["method"], result[0]["route"])].append(result)
+
+    lines = [f"{'route':<40} {'count':>6} {'skip':>5} {'rec p50':>8} {'rec p99':>8} "
+             f"{'p50':>8} {'p99':>8} {'max':>8} {'same':>6}"]
+    mismatches = Counter()
+    fmt = lambda value: f"{value:8.1f}" if value is not None else f"{'-':>8}"
+    for (method, route), group in sorted(by_route.items(), key=lambda item: item[0][1]):
+        replayed = [r for r in group if r[1] is not None]
+        recorded = [r[0]["duration_ms"] for r in replayed]
+        latencies = [r[2] for r in replayed]
+        same = sum(1 for r in replayed if r[1] == r[0]["status"])
+        for event, status, _, _ in replayed:
+            if status != event["status"]:
+                mismatches[(method, route, event["status"], status)] += 1
+        lines.append(
+            f"{method + ' ' + route:<40} {len(group):>6} {len(group) - len(replayed):>5} "
+            f"{fmt(percentile(recorded, 0.5))} {fmt(percentile(recorded, 0.99))} "
+            f"{fmt(percentile(latencies, 0.5))} {fmt(percentile(latencies, 0.99))} "
+            f"{fmt(max(latencies) if latencies else None)} {same:>6}"
+        )
+
+    span = events[-1]["ts"] - events[0]["ts"] if events else 0
+    lag = percentile([r[3] for r in results], 0.99)
+    lines.append(f"\n{len(results)} requests; recorded over {span:.1f}s, replayed in {elapsed:.1f}s; "
+                 f"p99 start lag {fmt(lag).strip()} ms")
+    if lag is not None and lag > 100:
+        lines.append("The replayer fell behind the schedule; raise --concurrency for a faithful replay.")
+    for (method, route, recorded, replayed), count in mismatches.most_common():
+        lines.append(f"  {method} {route}: recorded {recorded}, replayed {replayed or 'connection error'} x{count}")
+    return "\n".join(lines)
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="trace files written by the recorder")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="instance to replay against")
+    parser.add_argument("--speed", default="1", help="speed-up factor, or 'max' to send back to back (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight (default: %(default)s)")
+    parser.add_argument("--api-key", help="X-API-Key for the privileged routes in the trace")
+    args = parser.parse_args(argv)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    if speed is not None and speed <= 0:
+        parser.error("--speed must be positive or 'max'")
+    events = load_trace(args.traces)
+    replayer = Replayer(args.base_url, args.api_key)
+    elapsed = replay(events, replayer, speed, args.concurrency)
+    print(report(replayer.results, events, elapsed))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
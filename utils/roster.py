@@ -0,0 +1,83 @@
+import codecs
+import csv
+import io
+from typing import AsyncIterator, List, Optional, Tuple
+
+class RosterFormatError(ValueError):
+    """Raised when an uploaded roster is not a CSV list of school numbers."""
+
+class RosterParser:
+    SCHOOL_NO_COLUMN = "school_no"
+    # A first row naming any of these columns is a header rather than a student.
+    HEADER_COLUMNS = frozenset({
+        SCHOOL_NO_COLUMN, "student_id", "student_no", "id", "name", "surname",
+        "first_name", "last_name", "faculty", "section", "email"
+    })
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._column: Optional[int] = None
+
+    async def iter_chunks(self, stream: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+        """
+        Parse a streamed CSV roster into chunks of school numbers.
+
+        The first row is a header if it names any of HEADER_COLUMNS, and the
+        header must then include a `school_no` column. Otherwise the file has
+        no header and lists one school number per row in its first column.
+        Quoted fields may span lines.
+
+        Args:
+            stream (AsyncIterator[bytes]): The raw CSV body, in arbitrary pieces.
+
+        Yields:
+            List[str]: Up to `chunk_size` school numbers at a time.
+
+        Raises:
+            RosterFormatError: If the header has no `school_no` column or the
+                               file lists no school numbers.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        pending, chunk, total = "", [], 0
+        async for data in stream:
+            complete, pending = self._split_records(pending + decoder.decode(data))
+            chunk.extend(self._parse_records(complete))
+            while len(chunk) >= self.chunk_size:
+                total += self.chunk_size
+                yield chunk[:self.chunk_size]
+                chunk = chunk[self.chunk_size:]
+
+        chunk.extend(self._parse_records(pending + decoder.decode(b"", final=True)))
+        if not total and not chunk:
+            raise RosterFormatError("The roster lists no school numbers.")
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def _split_records(text: str) -> Tuple[str, str]:
+        """Splits text after its last line break outside a quoted field."""
+        cut = start = quotes = 0
+        while (end := text.find("\n", start)) != -1:
+            quotes += text.count('"', start, end)
+            start = end + 1
+            if quotes % 2 == 0:
+                cut = start
+        return text[:cut], text[cut:]
+
+    def _parse_records(self, text: str) -> List[str]:
+        """Extract the school numbers from complete CSV records."""
+        school_nos = []
+        for row in csv.reader(io.StringIO(text, newline="")):
+            if not row:
+                continue
+            if self._column is None:
+                header = [cell.strip().lower() for cell in row]
+                if self.SCHOOL_NO_COLUMN in header:
+                    self._column = header.index(self.SCHOOL_NO_COLUMN)
+                    continue
+                if self.HEADER_COLUMNS.intersection(header):
+                    raise RosterFormatError(f"The roster header has no `{self.SCHOOL_NO_COLUMN}` column.")
+                self._column = 0
+            if self._column < len(row) and row[self._column].strip():
+                school_nos.append(row[self._column].strip())
+        return school_nos
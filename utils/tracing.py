@@ -0,0 +1,185 @@
+import contextvars
+import functools
+import inspect
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TextIO
+
+class SpanExporter:
+    """Writes finished spans as JSON lines to a text stream."""
+    def __init__(self, stream: TextIO):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]):
+        line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            self._stream.write(line)
+
+    def shutdown(self):
+        with self._lock:
+            self._stream.flush()
+
+class ConsoleExporter(SpanExporter):
+    """Writes spans to standard error, keeping them apart from the JSON logs on standard output."""
+    def __init__(self):
+        super().__init__(sys.stderr)
+
+class FileExporter(SpanExporter):
+    """Appends spans to a local JSONL file."""
+    def __init__(self, path: str):
+        super().__init__(open(path, "a", buffering=64 * 1024))
+
+    def shutdown(self):
+        super().shutdown()
+        self._stream.close()
+
+class Span:
+    """
+    A timed unit of work within a trace.
+
+    Spans are context managers; entering one makes it the parent of every
+    span started in the same context, including tasks and threads spawned
+    from it, since asyncio copies context variables into them.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled",
+                 "attributes", "_start", "_end", "_status", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8) if sampled else "0" * 16
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes) if sampled and attributes else {}
+        self._start = 0
+        self._end = 0
+        self._status = "ok"
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """The W3C `traceparent` header value that continues this trace."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        if self.sampled:
+            self._start = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if not self.sampled or _exporter is None:
+            return False
+        self._end = time.time_ns()
+        if exc_type is not None:
+            self._status = "error"
+            self.attributes["error.type"] = exc_type.__name__
+        _exporter.export({
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self._start,
+            "duration_ms": round((self._end - self._start) / 1e6, 3),
+            "status": self._status,
+            "attributes": self.attributes
+        })
+        return False
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_exporter: Optional[SpanExporter] = None
+_sample_ratio = 0.0
+
+def configure(exporter: Optional[SpanExporter], sample_ratio: float):
+    """
+    Sets where spans are exported and what fraction of traces is recorded.
+
+    Args:
+        exporter (Optional[SpanExporter]): The exporter, or None to disable tracing.
+        sample_ratio (float): The fraction of new traces to record, from 0 to 1.
+    """
+    global _exporter, _sample_ratio
+    _exporter = exporter
+    _sample_ratio = max(0.0, min(1.0, sample_ratio)) if exporter else 0.0
+
+def shutdown():
+    """Flushes the exporter and disables tracing."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+    configure(None, 0.0)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def parse_traceparent(header: Optional[str]):
+    """Returns the trace id, parent span id and sampled flag from a `traceparent` header, or None."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, traceparent: Optional[str] = None) -> Span:
+    """
+    Creates a span as a child of the current span.
+
+    Without a current span a new trace is started. It continues the remote
+    trace given by `traceparent`, if valid, and is otherwise sampled at the
+    configured ratio. Unsampled spans record nothing.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+        sampled = sampled and _exporter is not None
+    else:
+        trace_id, parent_id = None, None
+        sampled = _sample_ratio > 0 and random.random() < _sample_ratio
+    if sampled and trace_id is None:
+        trace_id = secrets.token_hex(16)
+    return Span(name, trace_id or "0" * 32, parent_id, sampled, attributes)
+
+def traced(name: Optional[str] = None, **attributes):
+    """
+    Decorates a function so that every call runs inside a span.
+
+    Attributes must be static descriptions of the work, such as the Redis
+    command or key prefix, never argument values that may identify a student.
+    """
+    def decorator(func: Callable):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with start_span(span_name, attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(span_name, attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator